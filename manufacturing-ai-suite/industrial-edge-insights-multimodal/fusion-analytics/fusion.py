@@ -23,10 +23,15 @@ import paho.mqtt.client as mqtt
 import pandas as pd
 from collections import deque
 import os
-from collections import deque
+from bisect import bisect_left
+import threading
 from typing import Dict, Optional, Any, Literal
 import json
 import time
+import re
+from datetime import date
+from functools import lru_cache
+import numpy as np
 from influxdb import InfluxDBClient as Influx1Client
 import logging
 
@@ -60,6 +65,24 @@ FUSION_TOPIC = os.getenv("FUSION_TOPIC", "fusion/anomaly_detection_results")
 # Timestamp Matching Configuration
 # 50 ms tolerance (in nanoseconds) for matching messages by timestamp
 TOLERANCE_NS = int(float(os.getenv("TOLERANCE_NS", 50e6)))
+# Messages older than the newest received timestamp by more than this are dropped
+# without waiting for a match, 0 disables expiry
+EXPIRY_NS = int(float(os.getenv("EXPIRY_NS") or 0))
+
+# InfluxDB Write Configuration
+# Points are written in batches from a background thread, when INFLUX_BATCH_SIZE points
+# are buffered or every INFLUX_FLUSH_INTERVAL seconds
+INFLUX_BATCH_SIZE = int(os.getenv("INFLUX_BATCH_SIZE") or 500)
+INFLUX_FLUSH_INTERVAL = float(os.getenv("INFLUX_FLUSH_INTERVAL") or 1.0)
+# Oldest points are dropped beyond this, e.g. while InfluxDB is unreachable
+INFLUX_MAX_BUFFERED_POINTS = int(os.getenv("INFLUX_MAX_BUFFERED_POINTS") or 100000)
+
+# Fusion Loop Configuration
+# The loop runs as soon as a message arrives, and at least every FUSION_IDLE_TIMEOUT
+# seconds to expire old messages
+FUSION_IDLE_TIMEOUT = float(os.getenv("FUSION_IDLE_TIMEOUT") or 1.0)
+# Seconds between two logs of the fused-pair latency percentiles
+LATENCY_LOG_INTERVAL = float(os.getenv("LATENCY_LOG_INTERVAL") or 60.0)
 # Fusion Logic Configuration
 # "AND" means both systems must detect anomaly to raise alert
 # "OR" means either system detecting anomaly raises alert
@@ -70,37 +93,326 @@ if FUSION_MODE not in ["AND", "OR"]:
     raise ValueError(f"FUSION_MODE must be 'AND' or 'OR' given value is {FUSION_MODE}")
 
 influx_client = None
+influx_writer = None
 # ===================== UTILITY FUNCTIONS =====================
 
-def find_nearest(buf, ts, type):
+class TimeOrderedBuffer:
     """
-    Find message in buffer with nearest timestamp within tolerance.
-    
+    Messages kept sorted by timestamp for nearest-timestamp matching.
+
+    Lookups are binary searches, and matched messages are removed in O(1) by leaving
+    an empty slot behind, the slots are compacted once they outnumber the messages.
+    Thread-safe: messages are appended from the MQTT thread and fused in the main thread.
+    """
+
+    def __init__(self, maxlen: int):
+        """
+        Args:
+            maxlen: Maximum number of messages, the oldest is dropped when full
+        """
+        self.maxlen = maxlen
+        self._times = []     # sorted timestamps in nanoseconds
+        self._entries = []   # message of each timestamp, None once removed
+        self._start = 0      # slots before it are all removed
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, ts: int, entry: Dict[str, Any]):
+        with self._lock:
+            if not self._times or ts >= self._times[-1]:
+                self._times.append(ts)
+                self._entries.append(entry)
+            else:
+                # out of order message, keep the slots sorted
+                index = bisect_left(self._times, ts, lo=self._start)
+                self._times.insert(index, ts)
+                self._entries.insert(index, entry)
+            self._count += 1
+            if self._count > self.maxlen:
+                self._pop_oldest()
+
+    def peek_oldest(self):
+        """
+        Returns:
+            (timestamp, message) of the oldest message, None if empty
+        """
+        with self._lock:
+            index = self._first()
+            return None if index is None else (self._times[index], self._entries[index])
+
+    def popleft(self):
+        """
+        Returns:
+            (timestamp, message) of the oldest message, removed from the buffer, None if empty
+        """
+        with self._lock:
+            return self._pop_oldest()
+
+    def pop_nearest(self, ts: int, tolerance: int) -> Optional[Dict[str, Any]]:
+        """
+        Remove and return the message with the timestamp nearest to ts.
+
+        Args:
+            ts: Target timestamp in nanoseconds
+            tolerance: Maximum timestamp difference in nanoseconds
+
+        Returns:
+            The nearest message if within tolerance, None otherwise
+        """
+        with self._lock:
+            index = bisect_left(self._times, ts, lo=self._start)
+            # nearest live slot on each side of ts
+            after = index
+            while after < len(self._entries) and self._entries[after] is None:
+                after += 1
+            before = index - 1
+            while before >= self._start and self._entries[before] is None:
+                before -= 1
+
+            candidates = []
+            if before >= self._start:
+                candidates.append(before)
+            if after < len(self._entries):
+                candidates.append(after)
+            if not candidates:
+                return None
+            # on equal distance the older message wins
+            nearest = min(candidates, key=lambda i: abs(self._times[i] - ts))
+            if abs(self._times[nearest] - ts) > tolerance:
+                return None
+            return self._remove(nearest)
+
+    def expire(self, oldest_ts: int) -> int:
+        """
+        Drop the messages with a timestamp before oldest_ts.
+
+        Returns:
+            Number of dropped messages
+        """
+        with self._lock:
+            dropped = 0
+            index = self._first()
+            while index is not None and self._times[index] < oldest_ts:
+                self._remove(index)
+                dropped += 1
+                index = self._first()
+            return dropped
+
+    def _first(self):
+        while self._start < len(self._entries) and self._entries[self._start] is None:
+            self._start += 1
+        return self._start if self._start < len(self._entries) else None
+
+    def _pop_oldest(self):
+        index = self._first()
+        if index is None:
+            return None
+        ts = self._times[index]
+        return ts, self._remove(index)
+
+    def _remove(self, index: int) -> Dict[str, Any]:
+        entry = self._entries[index]
+        self._entries[index] = None
+        self._count -= 1
+        if len(self._entries) > 2 * self._count + 64:
+            self._compact()
+        return entry
+
+    def _compact(self):
+        live = [i for i in range(self._start, len(self._entries)) if self._entries[i] is not None]
+        self._times = [self._times[i] for i in live]
+        self._entries = [self._entries[i] for i in live]
+        self._start = 0
+
+class InfluxBatchWriter:
+    """
+    Buffers InfluxDB points and writes them in batches from a background thread.
+
+    write() never blocks on InfluxDB, so it can be called from the MQTT callbacks.
+    Failed batches are kept and retried with a growing delay, and the buffer is bounded:
+    the oldest points are dropped once it holds max_points.
+    """
+
+    def __init__(self, client, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_points: int = 100000, max_retry_interval: float = 30.0):
+        """
+        Args:
+            client: InfluxDB client the batches are written with
+            batch_size: Number of buffered points that triggers a write
+            flush_interval: Maximum seconds a point waits before being written
+            max_points: Maximum number of buffered points
+            max_retry_interval: Maximum seconds between two retries of a failed write
+        """
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retry_interval = max_retry_interval
+        self._points = deque(maxlen=max_points)
+        self._condition = threading.Condition()
+        self._stopped = False
+        self.dropped = 0
+        self.written = 0
+        self.requests = 0
+        self._thread = threading.Thread(target=self._run, name="influx-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, points):
+        """Buffer points (list of InfluxDB json points) for writing."""
+        with self._condition:
+            overflow = len(self._points) + len(points) - self._points.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+                logger.warning(f"InfluxDB write buffer full, dropped {self.dropped} points so far")
+            self._points.extend(points)
+            if len(self._points) >= self.batch_size:
+                self._condition.notify()
+
+    def close(self, timeout: float = 10.0):
+        """Write the buffered points and stop the writer thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def _take(self):
+        with self._condition:
+            if not self._stopped and len(self._points) < self.batch_size:
+                self._condition.wait(self.flush_interval)
+            batch = list(self._points)
+            self._points.clear()
+            return batch
+
+    def _put_back(self, batch):
+        with self._condition:
+            # failed points go before the new ones, the oldest are dropped if it is full
+            room = self._points.maxlen - len(self._points)
+            if room < len(batch):
+                self.dropped += len(batch) - room
+                batch = batch[len(batch) - room:] if room > 0 else []
+            self._points.extendleft(reversed(batch))
+
+    def _run(self):
+        retry_interval = 0.0
+        while True:
+            stopped = self._stopped
+            batch = self._take()
+            if batch:
+                try:
+                    self.client.write_points(batch, batch_size=self.batch_size)
+                    self.requests += (len(batch) + self.batch_size - 1) // self.batch_size
+                    self.written += len(batch)
+                    retry_interval = 0.0
+                except Exception as e:
+                    if stopped:
+                        logger.error(f"Failed to write {len(batch)} points to InfluxDB on shutdown: {e}")
+                        return
+                    retry_interval = min(max(retry_interval * 2, 0.5), self.max_retry_interval)
+                    logger.error(f"Failed to write {len(batch)} points to InfluxDB, retrying in {retry_interval:.1f}s: {e}")
+                    self._put_back(batch)
+                    time.sleep(retry_interval)
+            if stopped:
+                return
+
+
+class LatencyStats:
+    """
+    Fused-pair latencies, with their percentiles logged periodically.
+
+    fusion latency: from the arrival of the later message of the pair to the fused result
+    end-to-end latency: from the timestamp of the later message of the pair to the fused result
+    """
+
+    def __init__(self, interval: float = 60.0):
+        self.interval = interval
+        self._fusion_ms = []
+        self._e2e_ms = []
+        self._last_log = time.monotonic()
+
+    def add(self, fusion_ms: float, e2e_ms: float):
+        self._fusion_ms.append(fusion_ms)
+        self._e2e_ms.append(e2e_ms)
+
+    def log_if_due(self):
+        now = time.monotonic()
+        if now - self._last_log < self.interval:
+            return
+        self._last_log = now
+        if not self._fusion_ms:
+            return
+        fusion_ms, e2e_ms = np.array(self._fusion_ms), np.array(self._e2e_ms)
+        logger.info(
+            f"Fused {fusion_ms.size} pairs, fusion latency ms p50 {np.percentile(fusion_ms, 50):.2f} "
+            f"p99 {np.percentile(fusion_ms, 99):.2f} max {fusion_ms.max():.2f}, end-to-end latency ms "
+            f"p50 {np.percentile(e2e_ms, 50):.1f} p99 {np.percentile(e2e_ms, 99):.1f} max {e2e_ms.max():.1f}"
+        )
+        self._fusion_ms.clear()
+        self._e2e_ms.clear()
+
+
+# ===================== TIMESTAMP HELPERS =====================
+# ISO 8601 / RFC 3339 timestamps as sent by Kapacitor, e.g. "2025-01-01 12:00:00.123456789 +0000"
+# or "2025-01-01T12:00:00.123Z", a missing offset is UTC
+ISO_TIMESTAMP = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,9}))?"
+    r"\s*(?:(Z)|([+-])(\d{2}):?(\d{2}))?$"
+)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=64)
+def _day_epoch_s(year: int, month: int, day: int) -> int:
+    return (date(year, month, day).toordinal() - EPOCH_ORDINAL) * 86400
+
+
+@lru_cache(maxsize=64)
+def _second_isoformat(epoch_s: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch_s))
+
+
+def parse_ts_ns(ts) -> int:
+    """
+    Convert a timestamp to nanosecond epoch, without pandas for the common formats.
+
     Args:
-        buf: Buffer (deque) containing messages
-        ts: Target timestamp in nanoseconds
-        type: Message type ("vision" or "timeseries") for field access
-        
+        ts: Nanosecond epoch number, or timestamp string
+
     Returns:
-        Index of nearest message if within tolerance, None otherwise
+        Nanosecond epoch timestamp, same as pd.to_datetime(ts).value
     """
-    if not buf: 
-        return None
-    
-    # Find the message with minimum timestamp difference
-    if type == "vision":
-        # Vision messages have timestamp in metadata.time
-        nearest_index, nearest_item = min(enumerate(buf), key=lambda x: abs(x[1]["metadata"]["time"] - ts))
-        diff = abs(nearest_item["metadata"]["time"] - ts)
-    elif type == "timeseries":
-        # Time-series messages have timestamp in time field
-        nearest_index, nearest_item =  min(enumerate(buf), key=lambda x: abs(x[1]["time"] - ts))
-        diff = abs(nearest_item["time"] - ts)
-
-    # Check if the difference is within acceptable tolerance
-    if diff > TOLERANCE_NS:
-        return None
-    return nearest_index
+    if isinstance(ts, (int, float)):
+        return int(ts)
+    match = ISO_TIMESTAMP.match(ts.replace(" UTC", ""))
+    if match is None:
+        # Other formats are left to pandas
+        return pd.to_datetime(ts.replace(" UTC", "")).value
+    year, month, day, hour, minute, second, fraction, _, sign, offset_h, offset_m = match.groups()
+    epoch_s = _day_epoch_s(int(year), int(month), int(day)) + int(hour) * 3600 + int(minute) * 60 + int(second)
+    if sign:
+        offset_s = int(offset_h) * 3600 + int(offset_m) * 60
+        epoch_s += -offset_s if sign == "+" else offset_s
+    return epoch_s * 1_000_000_000 + (int(fraction.ljust(9, "0")) if fraction else 0)
+
+
+def format_ts_ns(ts_ns: int) -> str:
+    """
+    Format a nanosecond epoch timestamp as ISO 8601 for InfluxDB.
+
+    Args:
+        ts_ns: Nanosecond epoch timestamp
+
+    Returns:
+        Timestamp string, same as pd.to_datetime(ts_ns, unit="ns").isoformat()
+    """
+    epoch_s, ns = divmod(int(ts_ns), 1_000_000_000)
+    if ns == 0:
+        return _second_isoformat(epoch_s)
+    if ns % 1000 == 0:
+        return f"{_second_isoformat(epoch_s)}.{ns // 1000:06d}"
+    return f"{_second_isoformat(epoch_s)}.{ns:09d}"
+
 
 def diff_timestamps_ns(t1: int, t2: int) -> dict:
     """
@@ -129,9 +441,18 @@ def diff_timestamps_ns(t1: int, t2: int) -> dict:
 # Queues for incoming messages from different sources
 # Each queue maintains a rolling buffer of recent messages for fusion
 queues = {
-    "ts": deque(maxlen=1000),      # Time-series anomaly detection messages
-    "vision": deque(maxlen=1000)   # Vision-based defect detection messages
+    "ts": TimeOrderedBuffer(maxlen=1000),      # Time-series anomaly detection messages
+    "vision": TimeOrderedBuffer(maxlen=1000)   # Vision-based defect detection messages
 }
+# Newest message timestamp received from either source, for message expiry
+latest_ts = 0
+# Set by on_message when a message is queued, wakes up the fusion loop
+message_event = threading.Event()
+
+def update_latest_ts(ts: int):
+    global latest_ts
+    if ts > latest_ts:
+        latest_ts = ts
 
 # ===================== MQTT CALLBACKS =====================
 
@@ -161,53 +482,54 @@ def on_message(client, userdata, msg):
     """
     try:
         payload = json.loads(msg.payload.decode())
-        
+        # Arrival time, for the fused-pair latency
+        payload["_received_ns"] = time.time_ns()
+
         if msg.topic == TS_TOPIC:
             # Process time-series anomaly detection message
-            ts_str = payload["time"]
-            ts_str = ts_str.replace(" UTC", "")  # Clean timestamp format
-            
             # Convert timestamp string to nanosecond epoch
-            ts_epoch = pd.to_datetime(ts_str).value
+            ts_epoch = parse_ts_ns(payload["time"])
             payload["time"] = ts_epoch
-            queues["ts"].append(payload)
+            queues["ts"].append(ts_epoch, payload)
+            update_latest_ts(ts_epoch)
+            message_event.set()
             
             # Debug: uncomment to see incoming messages
             # logger.info(f"Received from TS: {payload}")
             
         elif msg.topic == VISION_TOPIC:
             # Process vision-based defect detection message
-            queues["vision"].append(payload)
+            metadata = payload["metadata"]
+            vision_time = metadata["time"]
+            queues["vision"].append(vision_time, payload)
+            update_latest_ts(vision_time)
+            message_event.set()
             
             # Debug: uncomment to see incoming messages
             # logger.info(f"Received from Vision: {payload}")
 
             # Write vision weld classification results to InfluxDB
-            time = payload["metadata"]["time"]
             json_body = [{
                 "measurement": "vision-weld-classification-results",
-                "time": pd.to_datetime(time, unit="ns").isoformat(),
+                "time": format_ts_ns(vision_time),
                 "fields": {
-                    "frame_id": int(payload["metadata"]["frame_id"]),
-                    "height": int(payload["metadata"]["height"]),
-                    "width": int(payload["metadata"]["width"]),
-                    "channels": int(payload["metadata"]["channels"]),
-                    "caps": str(payload["metadata"]["caps"]),
-                    "img_handle": str(payload["metadata"]["img_handle"]),
-                    "objects": str(payload["metadata"]["objects"]),
-                    "img_format": str(payload["metadata"]["img_format"]),
-                    "pipeline": str(payload["metadata"]["pipeline"]),
-                    "gva_meta": str(payload["metadata"]["gva_meta"]),
-                    "resolution": str(payload["metadata"]["resolution"]),
-                    "tags": str(payload["metadata"]["tags"]),
-                    "metadata": str(payload["metadata"]),
-                    "timestamp": int(payload["metadata"]["timestamp"])
+                    "frame_id": int(metadata["frame_id"]),
+                    "height": int(metadata["height"]),
+                    "width": int(metadata["width"]),
+                    "channels": int(metadata["channels"]),
+                    "caps": str(metadata["caps"]),
+                    "img_handle": str(metadata["img_handle"]),
+                    "objects": str(metadata["objects"]),
+                    "img_format": str(metadata["img_format"]),
+                    "pipeline": str(metadata["pipeline"]),
+                    "gva_meta": str(metadata["gva_meta"]),
+                    "resolution": str(metadata["resolution"]),
+                    "tags": str(metadata["tags"]),
+                    "metadata": str(metadata),
+                    "timestamp": int(metadata["timestamp"])
                 }
             }]
-            try:
-                influx_client.write_points(json_body)
-            except Exception as e:
-                logger.error(f"Failed to write vision data to InfluxDB: {e}")
+            influx_writer.write(json_body)
 
     except Exception as e:
         logger.error(f"Error processing message on topic {msg.topic}: {e}")
@@ -236,30 +558,38 @@ def fuse_firstcome(mode: Literal["AND", "OR"] = "AND") -> Optional[Dict[str, Any
             "fused_decision": binary_result # Final fused decision (0/1)
         }
     """
+    if EXPIRY_NS > 0:
+        # Drop messages whose match would have arrived by now
+        for name, queue in queues.items():
+            dropped = queue.expire(latest_ts - EXPIRY_NS)
+            if dropped:
+                logger.debug(f"Dropped {dropped} expired {name} messages")
+
     # Check if both queues have messages available
     if not queues["ts"] or not queues["vision"]:
         return None  # No pair available for fusion
 
     # Get the front (oldest) message from each queue
-    front_ts = queues["ts"][0]
-    front_vision = queues["vision"][0]
+    front_ts = queues["ts"].peek_oldest()
+    front_vision = queues["vision"].peek_oldest()
+    if front_ts is None or front_vision is None:
+        return None
 
     # Determine which message came first based on timestamps
-    if front_ts["time"] <= front_vision["metadata"]["time"]:
+    if front_ts[0] <= front_vision[0]:
         # Time-series message is older, process it first
         source_queue = "ts"
         target_queue = "vision"
-        source_entry = queues[source_queue].popleft()
-        target_index = find_nearest(queues[target_queue], source_entry["time"], "vision")
     else:
         # Vision message is older, process it first
         source_queue = "vision"
         target_queue = "ts"
-        source_entry = queues[source_queue].popleft()
-        target_index = find_nearest(queues[target_queue], source_entry["metadata"]["time"], "timeseries")
+    source_time, source_entry = queues[source_queue].popleft()
+    # Find and remove the matching message from the target queue
+    target_entry = queues[target_queue].pop_nearest(source_time, TOLERANCE_NS)
 
     # Check if a matching message was found within tolerance
-    if target_index is None:
+    if target_entry is None:
         # No matching entry found, return partial result
         return {
             "from": source_entry, 
@@ -273,12 +603,6 @@ def fuse_firstcome(mode: Literal["AND", "OR"] = "AND") -> Optional[Dict[str, Any
             "vision_classification": ""
         }
 
-    logger.debug(f"Found nearest message at index: {target_index}")
-    
-    # Remove the matching message from the target queue
-    target_entry = queues[target_queue][target_index]
-    del queues[target_queue][target_index]
-
     vision_classification = "No Label"
 
     data_dict = {}
@@ -327,8 +651,59 @@ def fuse_firstcome(mode: Literal["AND", "OR"] = "AND") -> Optional[Dict[str, Any
 
 # ===================== MAIN EXECUTION =====================
 
+def publish_result(client, result: Dict[str, Any], latency_stats: LatencyStats):
+    """
+    Write a fused result to InfluxDB and publish it to FUSION_TOPIC.
+
+    Args:
+        client: MQTT client instance
+        result: Result of fuse_firstcome
+        latency_stats: Latencies of the fused pairs
+    """
+    logger.debug("=" * 60)
+    logger.debug("FUSED RESULT:", result)
+    logger.debug("=" * 60)
+    # Write fused result to InfluxDB (InfluxDB v1.11.8)
+
+    if result["fused_decision"] is None:
+        return
+
+    ts = result["from"]["time"] if "time" in result["from"] else result["from"]["metadata"]["time"]
+    nearest_ts = result["nearest"]["time"] if "time" in result["nearest"] else result["nearest"]["metadata"]["time"]
+
+    # Latency from the moment the pair was complete
+    now_ns = time.time_ns()
+    fusion_latency_ms = (now_ns - max(result["from"]["_received_ns"], result["nearest"]["_received_ns"])) / 1e6
+    e2e_latency_ms = (now_ns - max(ts, nearest_ts)) / 1e6
+    latency_stats.add(fusion_latency_ms, e2e_latency_ms)
+
+    json_body = [{
+        "measurement": "fusion_result",
+        "time": format_ts_ns(ts),
+        "fields": {
+            "fused_decision": int(result["fused_decision"]),
+            "mode": str(result["mode"]),
+            "vision_classification": result["vision_classification"],
+            "ts_anomaly": (
+                str(result["nearest"]["anomaly_status"])
+                if "anomaly_status" in result["nearest"]
+                else str(result["from"]["anomaly_status"])
+            ),
+            "vision_anomaly": int(result["vision_anomaly"]),
+            "timeseries_anomaly": int(result["timeseries_anomaly"]),
+            "fusion_latency_ms": float(fusion_latency_ms),
+            "e2e_latency_ms": float(e2e_latency_ms)
+        }
+    }]
+    influx_writer.write(json_body)
+
+    json_body[0]["fields"]["time"] = json_body[0]["time"]
+    # Publish fused result to FUSION_TOPIC if needed
+    client.publish(FUSION_TOPIC, json.dumps(json_body[0]["fields"]))
+
+
 def main():
-    global influx_client
+    global influx_client, influx_writer
     # Initialize MQTT client and configure callbacks
     client = mqtt.Client()
     client.on_connect = on_connect
@@ -347,6 +722,7 @@ def main():
         INFLUX_USER = os.getenv("INFLUXDB_USERNAME")
         INFLUX_PASS = os.getenv("INFLUXDB_PASSWORD")
         influx_client = Influx1Client(host=INFLUX_HOST, port=INFLUX_PORT, username=INFLUX_USER, password=INFLUX_PASS, database=INFLUX_DB)
+        influx_writer = InfluxBatchWriter(influx_client, INFLUX_BATCH_SIZE, INFLUX_FLUSH_INTERVAL, INFLUX_MAX_BUFFERED_POINTS)
     except Exception as e:
         logger.info(f"Failed to connect to MQTT broker: {e}")
         exit(1)
@@ -354,47 +730,26 @@ def main():
     # Start MQTT message processing in background
     client.loop_start()
 
+    latency_stats = LatencyStats(LATENCY_LOG_INTERVAL)
+
     # Main fusion processing loop
     try:
         while True:
-            # Small delay to prevent excessive CPU usage
-            time.sleep(1e-3)  # 1 millisecond
-            
-            # Attempt to fuse available messages
-            result = fuse_firstcome(mode=FUSION_MODE)  # Can also try mode="OR"
-            if result:
-                logger.debug("=" * 60)
-                logger.debug("FUSED RESULT:", result)
-                logger.debug("=" * 60)
-                # Write fused result to InfluxDB (InfluxDB v1.11.8)
-
-                if result["fused_decision"] is not None:
-                    ts = result["from"]["time"] if "time" in result["from"] else result["from"]["metadata"]["time"]
-                    
-                    json_body = [{
-                        "measurement": "fusion_result",
-                        "time": pd.to_datetime(ts, unit="ns").isoformat(),
-                        "fields": {
-                            "fused_decision": int(result["fused_decision"]),
-                            "mode": str(result["mode"]),
-                            "vision_classification": result["vision_classification"],
-                            "ts_anomaly": (
-                                str(result["nearest"]["anomaly_status"])
-                                if "anomaly_status" in result["nearest"]
-                                else str(result["from"]["anomaly_status"])
-                            ),
-                            "vision_anomaly": int(result["vision_anomaly"]),
-                            "timeseries_anomaly": int(result["timeseries_anomaly"])
-                        }
-                    }]
-                    influx_client.write_points(json_body)
-
-                    json_body[0]["fields"]["time"] = json_body[0]["time"]
-                    # Publish fused result to FUSION_TOPIC if needed
-                    client.publish(FUSION_TOPIC, json.dumps(json_body[0]["fields"]))
+            # Wait until on_message queues a message, the timeout lets old messages expire when idle
+            message_event.wait(FUSION_IDLE_TIMEOUT)
+            message_event.clear()
+
+            # Fuse all the messages available
+            while True:
+                result = fuse_firstcome(mode=FUSION_MODE)  # Can also try mode="OR"
+                if result is None:
+                    break
+                publish_result(client, result, latency_stats)
+            latency_stats.log_if_due()
 
     except KeyboardInterrupt:
         logger.info("\nShutting down Fusion Analytics...")
+        influx_writer.close()
         influx_client.close()
         client.loop_stop()
         client.disconnect()
@@ -31,6 +31,9 @@ warnings.filterwarnings(
 log_level = os.getenv('KAPACITOR_LOGGING_LEVEL', 'INFO').upper()
 enable_benchmarking = os.getenv('ENABLE_BENCHMARKING', 'false').upper() == 'TRUE'
 total_no_pts = int(os.getenv('BENCHMARK_TOTAL_PTS', "0"))
+# batch mode takes the windows of a TICKscript window() node and scores each window with
+# a single model call, stream mode scores point by point
+batch_mode = os.getenv('UDF_BATCH_MODE', 'false').upper() == 'TRUE'
 logging_level = getattr(logging, log_level, logging.INFO)
 
 # Configure logging
@@ -77,11 +80,15 @@ class AnomalyDetectorHandler(Handler):
         global total_no_pts
         self.max_points = int(total_no_pts)
 
+        # points of the current batch, None outside of a batch
+        self.batch_points = None
+
     def info(self):
         """ Return the InfoResponse. Describing the properties of this Handler
         """
         response = udf_pb2.Response()
-        response.info.wants = udf_pb2.STREAM
+        global batch_mode
+        response.info.wants = udf_pb2.BATCH if batch_mode else udf_pb2.STREAM
         response.info.provides = udf_pb2.STREAM
         return response
 
@@ -110,116 +117,169 @@ class AnomalyDetectorHandler(Handler):
     def begin_batch(self, begin_req):
         """ A batch has begun.
         """
-        raise Exception("not supported")
+        self.batch_points = []
 
-    def point(self, point):
-        """ A point has arrived.
+    @staticmethod
+    def point_source(point):
+        """ Return the source of the point, None if not tagged.
         """
-        start_time = time.time_ns()
-        check_for_anomalies = 1
-        x = None
-        y = None
-
-        stream_src = None
         if "source" in point.tags:
-            stream_src = point.tags["source"]
-        elif "source" in point.fieldsString:
-            stream_src = point.fieldsString["source"]
-
-
+            return point.tags["source"]
+        if "source" in point.fieldsString:
+            return point.fieldsString["source"]
+        return None
+
+    def accept_point(self, stream_src):
+        """ Count the point for the benchmark, False once the benchmark has
+        received all its points for the source.
+        """
         global enable_benchmarking
         if enable_benchmarking:
             if stream_src not in self.points_received:
                 self.points_received[stream_src] = 0
             if self.points_received[stream_src] >= self.max_points:
-                return
+                return False
             self.points_received[stream_src] += 1
-        logger.info("Processing point %s %s for source %s", point.time, time.time(), stream_src)
+        return True
 
-        def process_the_point(x,y):
-            if (math.isnan(x) or math.isnan(y)):
-                self.last_states.append(0)
-                return 0
-
-            if ((x<=self.cut_in_speed) or (x>self.cut_in_speed and y<self.min_power_th)
-                 or (x>self.cut_out_speed)):
-                self.last_states.append(0)
-                return 0
-
-            return 1
-
-        if self.x_name in point.fieldsDouble:
-            x = point.fieldsDouble[self.x_name]
-
-        if self.y_name in point.fieldsDouble:
-            y = point.fieldsDouble[self.y_name]
-
-        if x is not None and y is not None:
-            # check if the current point is an anomalous point
-            check_for_anomalies = process_the_point(x,y)
-            point.fieldsDouble["analytic"] = True
-
-            if check_for_anomalies:
-                y_pred = self.rf.predict(np.reshape(x,(-1,1)))
-                error = (y_pred[0]-y)/(y)
-                if error>self.error_threshold:
-                    self.last_states.append(1)
-                    self.last_anomalies.append((x,y))
-                else:
-                    self.last_states.append(0)
-
-                # check if there are consecutive 3 anomalies, and then filter out
-                # any false positives
-                if sum(self.last_states) == self.n_steps:
-                    x_feat = list(zip(*self.last_anomalies))[0]
-                    x_feat = np.reshape(x_feat, (-1,1))
-                    y_feat = list(zip(*self.last_anomalies))[1]
-
-                    with config_context(target_offload=self.device, allow_fallback_to_host=True):
-                        lm = LinearRegression()
-                        lm.fit(x_feat, y_feat)
-
-                    if abs(lm.coef_)<200:
-                        self.anomalies.append((x,y))
-                        if error<0.3:
-                            point.fieldsDouble["anomaly_status"] = 0.3
-                            # anomaly_type="LOW"
-                        elif error<0.6:
-                            # anomaly_type = "MEDIUM"
-                            point.fieldsDouble["anomaly_status"] = 0.6
-                        else:
-                            # anomaly_type = "HIGH"
-                            point.fieldsDouble["anomaly_status"] = 1.0
-                    else:
-                        self.last_states.append(0)
-        else:
+    def read_point(self, point):
+        """ Return the wind speed and the active power of the point, None if missing.
+        """
+        x = point.fieldsDouble.get(self.x_name)
+        y = point.fieldsDouble.get(self.y_name)
+        if x is None or y is None:
             logger.error("No input received for %s %s, %s %s. Skipping anomaly detection."
                          , self.x_name, x, self.y_name, y)
             point.fieldsDouble["analytic"] = False
+            return None
+        point.fieldsDouble["analytic"] = True
+        return x, y
 
+    def is_checked(self, x, y):
+        """ Whether the turbine is in its power generation range, so the point
+        is checked for anomalies.
+        """
+        if math.isnan(x) or math.isnan(y):
+            return False
+        return not ((x<=self.cut_in_speed) or (x>self.cut_in_speed and y<self.min_power_th)
+                    or (x>self.cut_out_speed))
+
+    def detect(self, point, x, y, y_pred):
+        """ Classify a point from its predicted power, y_pred is None if the point
+        is not checked. Points have to be classified in time order, the classification depends on the
+        previous points.
+        """
+        if y_pred is None:
+            self.last_states.append(0)
+            return
+
+        error = (y_pred-y)/(y)
+        if error>self.error_threshold:
+            self.last_states.append(1)
+            self.last_anomalies.append((x,y))
+        else:
+            self.last_states.append(0)
+
+        # check if there are consecutive 3 anomalies, and then filter out
+        # any false positives
+        if sum(self.last_states) == self.n_steps:
+            x_feat = list(zip(*self.last_anomalies))[0]
+            x_feat = np.reshape(x_feat, (-1,1))
+            y_feat = list(zip(*self.last_anomalies))[1]
+
+            with config_context(target_offload=self.device, allow_fallback_to_host=True):
+                lm = LinearRegression()
+                lm.fit(x_feat, y_feat)
+
+            if abs(lm.coef_)<200:
+                self.anomalies.append((x,y))
+                if error<0.3:
+                    point.fieldsDouble["anomaly_status"] = 0.3
+                    # anomaly_type="LOW"
+                elif error<0.6:
+                    # anomaly_type = "MEDIUM"
+                    point.fieldsDouble["anomaly_status"] = 0.6
+                else:
+                    # anomaly_type = "HIGH"
+                    point.fieldsDouble["anomaly_status"] = 1.0
+            else:
+                self.last_states.append(0)
+
+    def write_point(self, point, processing_time):
+        """ Write the point back with its anomaly status and timings.
+        """
         # write data back to db if it is an anomaly point or there is an alarm for the point
         response = udf_pb2.Response()
         # Check if anomaly_status field exists, if not add it with default value
         if "anomaly_status" not in point.fieldsDouble:
             point.fieldsDouble["anomaly_status"] = 0.0
 
-        time_now = time.time_ns()
-        processing_time = time_now - start_time
-        end_end_time = time_now - point.time
+        end_end_time = time.time_ns() - point.time
         point.fieldsDouble["processing_time"] = processing_time
         point.fieldsDouble["end_end_time"] = end_end_time
         response.point.CopyFrom(point)
 
         self._agent.write_response(response, True)
 
+    def point(self, point):
+        """ A point has arrived.
+        """
+        start_time = time.time_ns()
+        if self.batch_points is not None:
+            # scored with the rest of the batch in end_batch
+            if self.accept_point(self.point_source(point)):
+                self.batch_points.append(point)
+            return
+
+        stream_src = self.point_source(point)
+        if not self.accept_point(stream_src):
+            return
+        logger.info("Processing point %s %s for source %s", point.time, time.time(), stream_src)
+
+        values = self.read_point(point)
+        if values is not None:
+            x, y = values
+            # check if the current point is an anomalous point
+            y_pred = None
+            if self.is_checked(x, y):
+                y_pred = self.rf.predict(np.reshape(x,(-1,1)))[0]
+            self.detect(point, x, y, y_pred)
+
+        self.write_point(point, time.time_ns() - start_time)
+
         end_time = time.time_ns()
         process_time = (end_time - start_time)/1000
         logger.debug("Function point took %.4f milliseconds to complete.", process_time)
 
     def end_batch(self, end_req):
-        """ The batch is complete.
+        """ The batch is complete, score all its points with one model call
+        and write them back as a stream.
         """
-        raise Exception("not supported")
+        start_time = time.time_ns()
+        points, self.batch_points = self.batch_points or [], None
+        if not points:
+            return
+        logger.info("Processing batch %s of %d points %s", end_req.name, len(points), time.time())
+
+        values = [self.read_point(point) for point in points]
+        checked = [i for i, value in enumerate(values) if value is not None and self.is_checked(*value)]
+        y_preds = [None] * len(points)
+        if checked:
+            x_checked = np.array([values[i][0] for i in checked]).reshape(-1, 1)
+            for i, y_pred in zip(checked, self.rf.predict(x_checked)):
+                y_preds[i] = y_pred
+
+        for point, value, y_pred in zip(points, values, y_preds):
+            if value is not None:
+                self.detect(point, value[0], value[1], y_pred)
+
+        # each point gets its share of the batch processing time
+        processing_time = (time.time_ns() - start_time) / len(points)
+        for point in points:
+            self.write_point(point, processing_time)
+
+        process_time = (time.time_ns() - start_time)/1000
+        logger.debug("Function end_batch took %.4f milliseconds to complete.", process_time)
 
 
 if __name__ == '__main__':
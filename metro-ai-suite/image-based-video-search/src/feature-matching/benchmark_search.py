@@ -0,0 +1,176 @@
+"""
+Recall and latency benchmark for the feature-matching Milvus collection.
+
+Synthetic embeddings are inserted into a scratch collection, the collection
+is indexed with each requested index type, and every search configuration is
+compared against an exact brute-force NumPy top-k.
+
+Example:
+    python benchmark_search.py --uri http://localhost:19530 --num-vectors 200000 \
+        --index IVF_FLAT:nprobe=8,16,64 --index HNSW:ef=32,64,128
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from milvus_utils import (
+    create_collection,
+    get_milvus_client,
+    rebuild_index,
+    search_vectors,
+)
+
+LABELS = ["person", "car", "bus", "truck", "bicycle"]
+
+
+def make_dataset(num_vectors: int, num_queries: int, dim: int, seed: int):
+    """
+    Generate clustered unit vectors, which is closer to real embeddings than
+    uniform noise and makes the IVF partitioning meaningful.
+    """
+    rng = np.random.default_rng(seed)
+    num_clusters = max(1, num_vectors // 1000)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, num_clusters, size=num_vectors)
+    data = centers[assignment] + 0.3 * rng.standard_normal((num_vectors, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+
+    query_ids = rng.choice(num_vectors, size=num_queries, replace=False)
+    queries = data[query_ids] + 0.05 * rng.standard_normal((num_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return data, queries
+
+
+def brute_force_topk(data: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """
+    Exact cosine top-k on unit vectors, computed in query blocks to bound memory.
+    """
+    topk = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), 256):
+        scores = queries[start : start + 256] @ data.T
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(scores, part, axis=1).argsort(axis=1)[:, ::-1]
+        topk[start : start + 256] = np.take_along_axis(part, order, axis=1)
+    return topk
+
+
+def insert_dataset(milvus_client, collection_name: str, data: np.ndarray, batch_size: int):
+    for start in range(0, len(data), batch_size):
+        batch = data[start : start + batch_size]
+        milvus_client.insert(
+            collection_name=collection_name,
+            data=[
+                {
+                    "vector": vector.tolist(),
+                    "row": start + offset,
+                    "label": LABELS[(start + offset) % len(LABELS)],
+                    "timestamp": start + offset,
+                }
+                for offset, vector in enumerate(batch)
+            ],
+        )
+    milvus_client.flush(collection_name=collection_name)
+
+
+def parse_index_spec(spec: str):
+    """
+    Parse ``TYPE[:param=v1,v2,...]`` into the index type and the list of
+    search parameter dicts to sweep.
+    """
+    index_type, _, sweep = spec.partition(":")
+    if not sweep:
+        return index_type.upper(), [{}]
+    name, _, values = sweep.partition("=")
+    return index_type.upper(), [{name: int(value)} for value in values.split(",")]
+
+
+def run_config(milvus_client, collection_name, index_type, search_params, queries, truth, args):
+    latencies = []
+    hits = 0
+    for start in range(0, len(queries), args.batch):
+        batch = queries[start : start + args.batch]
+        began = time.perf_counter()
+        results = search_vectors(
+            milvus_client,
+            collection_name,
+            batch,
+            output_fields=["row"],
+            limit=args.top_k,
+            index_type=index_type,
+            search_params=search_params,
+            consistency_level="Strong",
+        )
+        latencies.append((time.perf_counter() - began) / len(batch))
+        for offset, result in enumerate(results):
+            found = {hit["entity"]["row"] for hit in result}
+            hits += len(found.intersection(truth[start + offset].tolist()))
+    latencies_ms = np.asarray(latencies) * 1000.0
+    return {
+        "index_type": index_type,
+        "search_params": search_params,
+        "recall": hits / float(truth.size),
+        "latency_ms_p50": float(np.percentile(latencies_ms, 50)),
+        "latency_ms_p95": float(np.percentile(latencies_ms, 95)),
+        "qps": float(1000.0 / latencies_ms.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="http://localhost:19530", help="Milvus endpoint")
+    parser.add_argument("--token", default=None, help="Milvus token")
+    parser.add_argument("--collection", default="ibvs_benchmark", help="Scratch collection, dropped on start")
+    parser.add_argument("--dim", type=int, default=1000, help="Embedding dimension")
+    parser.add_argument("--num-vectors", type=int, default=100000, help="Number of vectors to insert")
+    parser.add_argument("--num-queries", type=int, default=500, help="Number of query vectors")
+    parser.add_argument("--top-k", type=int, default=10, help="Number of hits per query")
+    parser.add_argument("--batch", type=int, default=1, help="Query vectors per search request")
+    parser.add_argument("--insert-batch", type=int, default=5000, help="Vectors per insert request")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--index",
+        action="append",
+        help="Index spec TYPE[:param=v1,v2], e.g. HNSW:ef=32,64. Repeatable.",
+    )
+    parser.add_argument("--output", default=None, help="Write the report as JSON to this file")
+    args = parser.parse_args()
+    specs = args.index or ["IVF_FLAT:nprobe=8,16,64", "HNSW:ef=32,64,128"]
+
+    data, queries = make_dataset(args.num_vectors, args.num_queries, args.dim, args.seed)
+    began = time.perf_counter()
+    truth = brute_force_topk(data, queries, args.top_k)
+    print(f"Brute-force NumPy baseline: {(time.perf_counter() - began) * 1000.0 / len(queries):.3f} ms/query")
+
+    milvus_client = get_milvus_client(uri=args.uri, token=args.token)
+    create_collection(milvus_client, args.collection, dim=args.dim, drop_old=True)
+    began = time.perf_counter()
+    insert_dataset(milvus_client, args.collection, data, args.insert_batch)
+    print(f"Inserted {len(data)} vectors in {time.perf_counter() - began:.1f} s")
+
+    report = []
+    try:
+        for spec in specs:
+            index_type, sweep = parse_index_spec(spec)
+            began = time.perf_counter()
+            rebuild_index(milvus_client, args.collection, index_type)
+            print(f"Built {index_type} index in {time.perf_counter() - began:.1f} s")
+            for search_params in sweep:
+                row = run_config(milvus_client, args.collection, index_type, search_params, queries, truth, args)
+                report.append(row)
+                print(
+                    f"{index_type:<10} {json.dumps(search_params):<18} recall@{args.top_k}={row['recall']:.4f} "
+                    f"p50={row['latency_ms_p50']:.2f} ms p95={row['latency_ms_p95']:.2f} ms qps={row['qps']:.0f}"
+                )
+    finally:
+        milvus_client.drop_collection(args.collection)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
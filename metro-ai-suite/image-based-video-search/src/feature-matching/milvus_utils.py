@@ -1,16 +1,52 @@
+import json
+
+import numpy as np
 from pymilvus import MilvusClient
 
+VECTOR_FIELD = "vector"
+METRIC_TYPE = "COSINE"
+
+# Build-time parameters used when an index is created without explicit params
+INDEX_BUILD_DEFAULTS = {
+    "FLAT": {},
+    "IVF_FLAT": {"nlist": 1024},
+    "IVF_SQ8": {"nlist": 1024},
+    "HNSW": {"M": 16, "efConstruction": 200},
+    "AUTOINDEX": {},
+}
+
+# Query-time parameters used when a search is issued without explicit params
+INDEX_SEARCH_DEFAULTS = {
+    "FLAT": {},
+    "IVF_FLAT": {"nprobe": 16},
+    "IVF_SQ8": {"nprobe": 16},
+    "HNSW": {"ef": 64},
+    "AUTOINDEX": {},
+}
+
+# Milvus rejects requests with more than this many query vectors
+MAX_QUERY_BATCH = 16384
+
 
 class CollectionExists(RuntimeError):
     pass
 
 
+class UnsupportedIndex(ValueError):
+    pass
+
+
 def get_milvus_client(uri: str, token: str = None) -> MilvusClient:
     return MilvusClient(uri=uri, token=token)
 
 
 def create_collection(
-    milvus_client: MilvusClient, collection_name: str, dim: int, drop_old: bool = True
+    milvus_client: MilvusClient,
+    collection_name: str,
+    dim: int,
+    drop_old: bool = True,
+    index_type: str = None,
+    index_params: dict = None,
 ):
     if milvus_client.has_collection(collection_name) and drop_old:
         milvus_client.drop_collection(collection_name)
@@ -18,13 +54,170 @@ def create_collection(
         raise CollectionExists(
             f"Collection {collection_name} already exists. Set drop_old=True to create a new one instead."
         )
-    return milvus_client.create_collection(
+    result = milvus_client.create_collection(
         collection_name=collection_name,
         dimension=dim,
-        metric_type="COSINE",
+        metric_type=METRIC_TYPE,
         consistency_level="Strong",
         auto_id=True,
     )
+    # The quick-setup collection comes with an AUTOINDEX; swap it for the
+    # requested index when the caller wants explicit control
+    if index_type:
+        rebuild_index(
+            milvus_client,
+            collection_name,
+            index_type=index_type,
+            index_params=index_params,
+        )
+    return result
+
+
+def build_index_params(
+    milvus_client: MilvusClient, index_type: str, index_params: dict = None
+):
+    """
+    Prepare the index description for the vector field.
+
+    Args:
+        milvus_client (MilvusClient): The Milvus client.
+        index_type (str): One of the keys of INDEX_BUILD_DEFAULTS.
+        index_params (dict): Build parameters overriding the defaults.
+
+    Returns:
+        IndexParams: The index description accepted by ``create_index``.
+    """
+    index_type = index_type.upper()
+    if index_type not in INDEX_BUILD_DEFAULTS:
+        raise UnsupportedIndex(
+            f"Index type {index_type} is not supported. Use one of {sorted(INDEX_BUILD_DEFAULTS)}."
+        )
+    params = {**INDEX_BUILD_DEFAULTS[index_type], **(index_params or {})}
+    prepared = milvus_client.prepare_index_params()
+    prepared.add_index(
+        field_name=VECTOR_FIELD,
+        index_name=VECTOR_FIELD,
+        index_type=index_type,
+        metric_type=METRIC_TYPE,
+        params=params,
+    )
+    return prepared
+
+
+def create_index(
+    milvus_client: MilvusClient,
+    collection_name: str,
+    index_type: str,
+    index_params: dict = None,
+):
+    prepared = build_index_params(milvus_client, index_type, index_params)
+    return milvus_client.create_index(
+        collection_name=collection_name, index_params=prepared
+    )
+
+
+def describe_index(milvus_client: MilvusClient, collection_name: str):
+    """
+    Return the description of the vector index, or None if there is none.
+    """
+    if VECTOR_FIELD not in milvus_client.list_indexes(collection_name=collection_name):
+        return None
+    return milvus_client.describe_index(
+        collection_name=collection_name, index_name=VECTOR_FIELD
+    )
+
+
+def drop_index(milvus_client: MilvusClient, collection_name: str):
+    if VECTOR_FIELD in milvus_client.list_indexes(collection_name=collection_name):
+        milvus_client.release_collection(collection_name=collection_name)
+        milvus_client.drop_index(
+            collection_name=collection_name, index_name=VECTOR_FIELD
+        )
+
+
+def rebuild_index(
+    milvus_client: MilvusClient,
+    collection_name: str,
+    index_type: str,
+    index_params: dict = None,
+):
+    """
+    Replace the vector index with a new one and load the collection again.
+
+    Milvus only allows dropping an index on a released collection, so the
+    collection is unavailable for search until the new index is loaded.
+    """
+    # Validate before touching the existing index
+    build_index_params(milvus_client, index_type, index_params)
+    drop_index(milvus_client, collection_name)
+    create_index(milvus_client, collection_name, index_type, index_params)
+    milvus_client.load_collection(collection_name=collection_name)
+
+
+def ensure_index(
+    milvus_client: MilvusClient,
+    collection_name: str,
+    index_type: str,
+    index_params: dict = None,
+) -> bool:
+    """
+    Rebuild the vector index only if it differs from the requested one.
+
+    Returns:
+        bool: True if the index was rebuilt.
+    """
+    index_type = index_type.upper()
+    wanted = {**INDEX_BUILD_DEFAULTS.get(index_type, {}), **(index_params or {})}
+    current = describe_index(milvus_client, collection_name) or {}
+    current_params = {
+        key: value
+        for key, value in current.get("params", current).items()
+        if key in wanted
+    }
+    if current.get("index_type") == index_type and all(
+        str(current_params.get(key)) == str(value) for key, value in wanted.items()
+    ):
+        return False
+    rebuild_index(milvus_client, collection_name, index_type, index_params)
+    return True
+
+
+def build_search_params(index_type: str = None, params: dict = None) -> dict:
+    """
+    Build the ``search_params`` argument for a search.
+
+    Args:
+        index_type (str): Index type of the collection, used to pick defaults
+            such as ``nprobe`` for IVF or ``ef`` for HNSW.
+        params (dict): Query parameters overriding the defaults.
+
+    Returns:
+        dict: The search parameters.
+    """
+    defaults = INDEX_SEARCH_DEFAULTS.get((index_type or "").upper(), {})
+    return {"metric_type": METRIC_TYPE, "params": {**defaults, **(params or {})}}
+
+
+def build_filter_expr(labels=None, start_time: int = None, end_time: int = None) -> str:
+    """
+    Build a boolean filter expression on the label and timestamp fields.
+
+    Args:
+        labels (list[str]): Keep only results with one of these labels.
+        start_time (int): Keep only results with a timestamp >= start_time.
+        end_time (int): Keep only results with a timestamp <= end_time.
+
+    Returns:
+        str: The filter expression, empty if no condition was given.
+    """
+    clauses = []
+    if labels:
+        clauses.append(f"label in {json.dumps(list(labels))}")
+    if start_time is not None:
+        clauses.append(f"timestamp >= {int(start_time)}")
+    if end_time is not None:
+        clauses.append(f"timestamp <= {int(end_time)}")
+    return " and ".join(clauses)
 
 
 def get_search_results(milvus_client, collection_name, query_vector, output_fields):
@@ -35,3 +228,57 @@ def get_search_results(milvus_client, collection_name, query_vector, output_fiel
         output_fields=output_fields,
     )
     return search_res
+
+
+def search_vectors(
+    milvus_client: MilvusClient,
+    collection_name: str,
+    query_vectors,
+    output_fields: list,
+    limit: int = 10,
+    index_type: str = None,
+    search_params: dict = None,
+    labels=None,
+    start_time: int = None,
+    end_time: int = None,
+    consistency_level: str = "Bounded",
+):
+    """
+    Search the collection with one or more query vectors in as few requests as possible.
+
+    Args:
+        milvus_client (MilvusClient): The Milvus client.
+        collection_name (str): Name of the collection to search.
+        query_vectors (array-like): A single vector or a (n, dim) batch of vectors.
+        output_fields (list[str]): Fields to return with each hit.
+        limit (int): Number of hits returned per query vector.
+        index_type (str): Index type of the collection, used to pick search defaults.
+        search_params (dict): Query parameters such as ``nprobe`` or ``ef``.
+        labels (list[str]): Optional label filter.
+        start_time (int): Optional lower bound on the timestamp.
+        end_time (int): Optional upper bound on the timestamp.
+        consistency_level (str): Milvus consistency level for the search.
+
+    Returns:
+        list: One list of hits per query vector, in query order.
+    """
+    vectors = np.asarray(query_vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+
+    kwargs = {
+        "collection_name": collection_name,
+        "limit": limit,
+        "search_params": build_search_params(index_type, search_params),
+        "output_fields": output_fields,
+        "consistency_level": consistency_level,
+    }
+    filter_expr = build_filter_expr(labels, start_time, end_time)
+    if filter_expr:
+        kwargs["filter"] = filter_expr
+
+    results = []
+    for start in range(0, len(vectors), MAX_QUERY_BATCH):
+        batch = vectors[start : start + MAX_QUERY_BATCH]
+        results.extend(milvus_client.search(data=batch.tolist(), **kwargs))
+    return results
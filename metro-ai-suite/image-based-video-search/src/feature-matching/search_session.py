@@ -0,0 +1,237 @@
+"""
+Warm session with the DL Streamer pipeline server for query image embedding
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from encoder import Base64ImageProcessor
+
+
+class EmbeddingError(RuntimeError):
+    pass
+
+
+class SearchSession:
+    """
+    Keeps a search_image pipeline running on the pipeline server and reuses
+    one pooled HTTP client for every request made against it.
+
+    The pipeline ID is cached and only re-validated once every
+    ``health_interval`` seconds, so a search normally costs a single POST.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pipeline_name: str = "user_defined_pipelines",
+        pipeline_version: str = "search_image",
+        health_interval: float = 30.0,
+        timeout: float = 30.0,
+        max_connections: int = 16,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pipeline_name = pipeline_name
+        self.pipeline_version = pipeline_version
+        self.health_interval = health_interval
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+        self._pipeline_id = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def invalidate(self):
+        """
+        Forget the cached pipeline so the next call discovers or starts one.
+        """
+        self._pipeline_id = None
+        self._checked_at = 0.0
+
+    async def _is_running(self, pipeline_id: str) -> bool:
+        try:
+            response = await self.client.get(f"/pipelines/{pipeline_id}/status")
+            response.raise_for_status()
+            return response.json().get("state") == "RUNNING"
+        except httpx.HTTPError as e:
+            logging.warning(f"Health check of pipeline {pipeline_id} failed: {str(e)}")
+            return False
+
+    async def _discover(self):
+        try:
+            response = await self.client.get("/pipelines/status")
+            response.raise_for_status()
+            for pipeline in response.json():
+                # Ignore the pipelines that are not running
+                if pipeline["state"] != "RUNNING":
+                    continue
+                details = await self.client.get(f"/pipelines/{pipeline['id']}")
+                details.raise_for_status()
+                if details.json()["request"]["pipeline"]["version"] == self.pipeline_version:
+                    return pipeline["id"]
+        except httpx.HTTPError as e:
+            # Ignore the error and try to start a new pipeline instead
+            logging.error(f"An error occurred while making the status request: {str(e)}")
+        return None
+
+    async def _start(self) -> str:
+        response = await self.client.post(
+            f"/pipelines/{self.pipeline_name}/{self.pipeline_version}",
+            json={"sync": True},
+        )
+        response.raise_for_status()
+        return response.text.strip().strip('"').strip()
+
+    async def pipeline_id(self) -> str:
+        """
+        Return the ID of a running search pipeline, starting one if needed.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            if self._pipeline_id and now - self._checked_at < self.health_interval:
+                return self._pipeline_id
+            if self._pipeline_id and await self._is_running(self._pipeline_id):
+                self._checked_at = now
+                return self._pipeline_id
+            self._pipeline_id = await self._discover() or await self._start()
+            self._checked_at = time.monotonic()
+            return self._pipeline_id
+
+    async def infer(self, base64_image: str) -> dict:
+        """
+        Run one image through the search pipeline and return its metadata.
+        """
+        pipeline_id = await self.pipeline_id()
+        body = {
+            "source": {"data": base64_image, "type": "base64_image"},
+            "include_feature_vector": True,
+            "publish_frame": True,
+        }
+        endpoint = f"/pipelines/{self.pipeline_name}/{self.pipeline_version}/{pipeline_id}"
+        response = await self.client.post(endpoint, json=body)
+        if response.status_code in (400, 404):
+            # The pipeline went away between health checks, start over once
+            self.invalidate()
+            pipeline_id = await self.pipeline_id()
+            endpoint = f"/pipelines/{self.pipeline_name}/{self.pipeline_version}/{pipeline_id}"
+            response = await self.client.post(endpoint, json=body)
+        response.raise_for_status()
+        result = response.json()
+        # The pipeline server returns the metadata as a JSON encoded string
+        if isinstance(result, str):
+            result = json.loads(result)
+        return result
+
+
+def extract_feature_vector(result: dict, layer_name: str = "prob"):
+    """
+    Return the first tensor of the given layer found in the pipeline metadata.
+    """
+    for obj in result.get("metadata", {}).get("objects", []):
+        for tensor in obj.get("tensors", []):
+            if tensor.get("layer_name") == layer_name and tensor.get("data"):
+                return tensor["data"]
+    return None
+
+
+class PipelineEmbedder:
+    """
+    Embed query images through the search_image pipeline of the pipeline server.
+
+    All images of a request are sent concurrently over the session's pooled client.
+    """
+
+    def __init__(self, session: SearchSession, size=(224, 224)):
+        self.session = session
+        self.processor = Base64ImageProcessor(size=size)
+
+    async def embed(self, images: list) -> list:
+        encoded = await asyncio.to_thread(
+            lambda: [self.processor.process_image_to_base64(image) for image in images]
+        )
+        results = await asyncio.gather(*(self.session.infer(data) for data in encoded))
+        vectors = [extract_feature_vector(result) for result in results]
+        if any(vector is None for vector in vectors):
+            raise EmbeddingError("The search pipeline returned no feature vector")
+        return vectors
+
+    async def close(self):
+        await self.session.close()
+
+
+class OpenVINOEmbedder:
+    """
+    Embed query images in-process with the same model as the search_image
+    pipeline, skipping the pipeline server entirely.
+
+    Requires the ``openvino`` package and the model IR to be mounted into
+    the container.
+    """
+
+    def __init__(self, model_path: str, device: str = "CPU", output_name: str = "prob"):
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise EmbeddingError(
+                "The openvino package is required for the in-process embedding path"
+            ) from e
+
+        core = ov.Core()
+        model = core.read_model(model_path)
+        _, channels, height, width = model.input(0).get_partial_shape()
+        self.size = (width.get_length(), height.get_length())
+        # Allow any batch size so one request embeds all query images at once
+        model.reshape({model.input(0): ov.PartialShape([-1, channels, height, width])})
+        self.compiled_model = core.compile_model(model, device)
+        names = {name for output in self.compiled_model.outputs for name in output.get_names()}
+        self.output = self.compiled_model.output(output_name if output_name in names else 0)
+        self._lock = asyncio.Lock()
+
+    def preprocess(self, images: list) -> np.ndarray:
+        """
+        Resize like the pipeline path and lay out as an NCHW BGR batch, the
+        input format gvainference feeds to the model.
+        """
+        batch = np.stack(
+            [
+                np.asarray(image.convert("RGB").resize(self.size, Image.LANCZOS))[:, :, ::-1]
+                for image in images
+            ]
+        )
+        return np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32)
+
+    def _infer(self, images: list) -> list:
+        result = self.compiled_model(self.preprocess(images))[self.output]
+        return result.reshape(len(images), -1).tolist()
+
+    async def embed(self, images: list) -> list:
+        # The compiled model is shared, serialize batches to avoid oversubscribing the CPU
+        async with self._lock:
+            return await asyncio.to_thread(self._infer, images)
+
+    async def close(self):
+        pass
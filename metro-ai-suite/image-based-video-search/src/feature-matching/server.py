@@ -2,11 +2,13 @@
 FastAPI server for search
 """
 
+import asyncio
 import base64
 import io
 import json
 import logging
 import os
+from contextlib import asynccontextmanager
 from typing import Annotated
 
 import httpx  # For sending HTTP requests
@@ -19,14 +21,20 @@ from marshmallow import ValidationError
 from PIL import Image
 from pymilvus import Collection, CollectionSchema, DataType, FieldSchema
 
-from encoder import Base64ImageProcessor
 from milvus_utils import (
     CollectionExists,
     create_collection,
+    ensure_index,
     get_milvus_client,
-    get_search_results,
+    search_vectors,
 )
 from schemas import PayloadSchema, TensorSchema
+from search_session import (
+    EmbeddingError,
+    OpenVINOEmbedder,
+    PipelineEmbedder,
+    SearchSession,
+)
 
 load_dotenv()
 
@@ -35,9 +43,28 @@ COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 MILVUS_ENDPOINT = os.getenv("MILVUS_ENDPOINT")
 MILVUS_TOKEN = os.getenv("MILVUS_TOKEN")
 
+# Milvus Index Settings (unset keeps the collection's AUTOINDEX)
+MILVUS_INDEX_TYPE = os.getenv("MILVUS_INDEX_TYPE")
+MILVUS_INDEX_PARAMS = json.loads(os.getenv("MILVUS_INDEX_PARAMS") or "{}")
+
+# Search Settings
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", 10))
+MILVUS_SEARCH_PARAMS = json.loads(os.getenv("MILVUS_SEARCH_PARAMS") or "{}")
+
 # Model Settings
 MODEL_DIM = os.getenv("MODEL_DIM")
 
+# Query Embedding Settings ("pipeline" or "openvino")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "pipeline").lower()
+EMBEDDING_MODEL_PATH = os.getenv(
+    "EMBEDDING_MODEL_PATH", "/models/resnet50/FP32/resnet-50-pytorch.xml"
+)
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "CPU")
+PIPELINE_SERVER_URL = os.getenv(
+    "PIPELINE_SERVER_URL", "http://ibvs-dlstreamer-pipeline-server:8080"
+)
+PIPELINE_HEALTH_INTERVAL = float(os.getenv("PIPELINE_HEALTH_INTERVAL", 30))
+
 # MQTT Settings
 MQTT_BROKER = os.getenv("MQTT_BROKER")
 MQTT_PORT = int(os.getenv("MQTT_PORT", 1883))
@@ -59,9 +86,15 @@ try:
         collection_name=COLLECTION_NAME,
         dim=int(MODEL_DIM),
         drop_old=False,
+        index_type=MILVUS_INDEX_TYPE,
+        index_params=MILVUS_INDEX_PARAMS,
     )
 except CollectionExists:
     print(f"Collection {COLLECTION_NAME} already exists. Will not create a new one.")
+    if MILVUS_INDEX_TYPE and ensure_index(
+        milvus_client, COLLECTION_NAME, MILVUS_INDEX_TYPE, MILVUS_INDEX_PARAMS
+    ):
+        print(f"Rebuilt {MILVUS_INDEX_TYPE} index on collection {COLLECTION_NAME}.")
 
 
 # Define the on_connect callback
@@ -151,131 +184,56 @@ mqtt_client.loop_start()
 # Create static folder if it doesn't exist
 os.makedirs("static", exist_ok=True)
 
-app = FastAPI()
+# Create the query image embedder. The in-process OpenVINO path skips the
+# pipeline server entirely; the pipeline path keeps a warm search_image session.
+if EMBEDDING_BACKEND == "openvino":
+    embedder = OpenVINOEmbedder(
+        model_path=EMBEDDING_MODEL_PATH, device=EMBEDDING_DEVICE
+    )
+else:
+    embedder = PipelineEmbedder(
+        SearchSession(
+            base_url=PIPELINE_SERVER_URL,
+            health_interval=PIPELINE_HEALTH_INTERVAL,
+        )
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await embedder.close()
+
 
-# Initialize the Base64ImageProcessor with the desired size
-processor = Base64ImageProcessor(size=(224, 224))
+app = FastAPI(lifespan=lifespan)
 
 
 @app.post("/search/")
 async def search(
     images: Annotated[list[UploadFile], File(description="Upload an image")]
 ):
-    # Step 0: Check if a search_image pipeline is already running
-    pipeline_id = None
-    try:
-        async with httpx.AsyncClient() as client:
-            # Fetch pipelines status
-            response = await client.get("http://ibvs-dlstreamer-pipeline-server:8080/pipelines/status")
-            response.raise_for_status()
-            pipelines = response.json()
-            
-            # Check if a search_image pipeline is already running
-            for pipeline in pipelines:
-
-                # Ignore the pipelines that are not running
-                if pipeline["state"] != "RUNNING":
-                    continue
-
-                _pipeline_response = await client.get(f"http://ibvs-dlstreamer-pipeline-server:8080/pipelines/{pipeline['id']}")
-                _pipeline_response.raise_for_status()
-                _pipeline_response_json = _pipeline_response.json()
-
-                # If the pipeline is search_image, save the pipeline_id and break
-                if _pipeline_response_json["request"]["pipeline"]["version"] == "search_image":
-                    pipeline_id = pipeline['id']
-                    break
-
-    except httpx.RequestError as e:
-        # Ignore the error and continue
-        logging.error(f"An error occurred while making the status request: {str(e)}")
-
-    # Step 1: When the search_image pipeline is not running, start the pipeline with sync mode as true
-    if not pipeline_id:
-        pipeline_endpoint = "http://ibvs-dlstreamer-pipeline-server:8080/pipelines/user_defined_pipelines/search_image"
-        body = {"sync": True}
-
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(pipeline_endpoint, json=body)
-                response.raise_for_status()  # Raise HTTP error for non-2xx responses
-
-                pipeline_id = (
-                    response.text.strip()
-                )  # Use `.strip()` to remove any extra whitespace
-
-        except httpx.RequestError as e:
-            return {
-                "error": f"An error occurred while making the pipeline request: {str(e)}"
-            }
-
-    # Step 2: Process the uploaded images
-    # Process the uploaded images
-    results = []
-    for image in images:
-        # Read the uploaded image
-        _bytes = await image.read()
-
-        # Convert bytes to a PIL image
-        img = Image.open(io.BytesIO(_bytes))
-
-        # Process the image using the Base64ImageProcessor
-        base64_image = processor.process_image_to_base64(img)
-
-        # Append the Base64 string to the results
-        results.append({"base64_image": base64_image})
-    # Extract the Base64 string
-    base64_image = results[0]["base64_image"]  # Access the value of "base64_image"
-
-    # Step 3: Send data to the second pipeline
-    # Ensure pipeline_id has no extra quotes
-    pipeline_id = pipeline_id.strip('"').strip()  # Remove surrounding quotes, if any
-    second_pipeline_endpoint = (
-        f"http://ibvs-dlstreamer-pipeline-server:8080/pipelines/user_defined_pipelines/search_image/{pipeline_id}"
-    )
-
-    second_pipeline_body = {
-        "source": {"data": base64_image, "type": "base64_image"},
-        "include_feature_vector": True,
-        "publish_frame": True,
-    }
+    # Step 1: Read all uploaded images
+    query_images = [Image.open(io.BytesIO(await image.read())) for image in images]
 
+    # Step 2: Embed all query images in one batch
     try:
-        async with httpx.AsyncClient() as client:
-            second_response = await client.post(
-                second_pipeline_endpoint, json=second_pipeline_body
-            )
-            second_response.raise_for_status()  # Raise HTTP error for non-2xx responses
-
-            second_pipeline_result = second_response.json()  # Parse the response
-            second_pipeline_result_parsed = json.loads(second_pipeline_result)
-            objects = second_pipeline_result_parsed.get("metadata", {}).get("objects", [])
-
-            # Initialize a list to store tensor data
-            tensor_data_list = []
-
-            # Iterate through objects and extract tensor data
-            for obj in objects:
-                tensors = obj.get("tensors", [])
-                for tensor in tensors:
-                    if tensor.get("layer_name") == "prob":  # Filter by layer_name
-                        tensor_data = tensor.get("data", [])
-                        if tensor_data:
-                            tensor_data_list.append(tensor_data)
-            # Print the extracted tensor data
-            print("Extracted Tensor Data:", tensor_data_list[0])
-
-    except httpx.RequestError as e:
+        query_vectors = await embedder.embed(query_images)
+    except (httpx.HTTPError, EmbeddingError) as e:
         return {
-            "error": f"An error occurred while making the second pipeline request: {str(e)}"
+            "error": f"An error occurred while embedding the query images: {str(e)}"
         }
-    
+
+    # Step 3: Search all query vectors in one multi-vector Milvus query
     try:
-        results = get_search_results(
-            milvus_client=milvus_client,
-            collection_name=COLLECTION_NAME,
-            query_vector=tensor_data_list[0],
+        results = await asyncio.to_thread(
+            search_vectors,
+            milvus_client,
+            COLLECTION_NAME,
+            query_vectors,
             output_fields=["filename", "label", "timestamp"],
+            limit=SEARCH_TOP_K,
+            index_type=MILVUS_INDEX_TYPE,
+            search_params=MILVUS_SEARCH_PARAMS,
         )
         return results
     except Exception as e:
@@ -304,6 +262,8 @@ async def clear():
         collection_name=COLLECTION_NAME,
         dim=int(MODEL_DIM),
         drop_old=True,
+        index_type=MILVUS_INDEX_TYPE,
+        index_params=MILVUS_INDEX_PARAMS,
     )
 
     for file in os.listdir("static"):
@@ -3,6 +3,7 @@
 import sys
 import os
 from pathlib import Path
+import numpy as np
 import pytest
 from unittest.mock import MagicMock, patch, call
 
@@ -13,9 +14,16 @@ sys.path.insert(0, str(src_path))
 # Import the module to test
 from milvus_utils import (
     CollectionExists,
+    UnsupportedIndex,
     get_milvus_client,
     create_collection,
-    get_search_results
+    get_search_results,
+    build_filter_expr,
+    build_search_params,
+    ensure_index,
+    rebuild_index,
+    search_vectors,
+    MAX_QUERY_BATCH,
 )
 
 
@@ -469,6 +477,146 @@ class TestGetSearchResults:
             assert len(call_kwargs['data'][0]) == dim
 
 
+class TestIndexLifecycle:
+    """Test cases for index creation, rebuild and reconciliation"""
+    
+    def test_create_collection_without_index_type_keeps_autoindex(self):
+        """Test that no index call is made when index_type is not given"""
+        mock_client = MagicMock()
+        mock_client.has_collection.return_value = False
+        
+        create_collection(milvus_client=mock_client, collection_name="test", dim=512)
+        
+        mock_client.create_index.assert_not_called()
+        mock_client.drop_index.assert_not_called()
+    
+    def test_create_collection_with_hnsw_index(self):
+        """Test that the AUTOINDEX is replaced by the requested index"""
+        mock_client = MagicMock()
+        mock_client.has_collection.return_value = False
+        mock_client.list_indexes.return_value = ["vector"]
+        index_params = mock_client.prepare_index_params.return_value
+        
+        create_collection(
+            milvus_client=mock_client,
+            collection_name="test",
+            dim=512,
+            index_type="hnsw",
+            index_params={"M": 32},
+        )
+        
+        mock_client.release_collection.assert_called_once_with(collection_name="test")
+        mock_client.drop_index.assert_called_once_with(collection_name="test", index_name="vector")
+        index_params.add_index.assert_called_with(
+            field_name="vector",
+            index_name="vector",
+            index_type="HNSW",
+            metric_type="COSINE",
+            params={"M": 32, "efConstruction": 200},
+        )
+        mock_client.create_index.assert_called_once_with(collection_name="test", index_params=index_params)
+        mock_client.load_collection.assert_called_once_with(collection_name="test")
+    
+    def test_rebuild_index_rejects_unknown_type_before_dropping(self):
+        """Test that an invalid index type leaves the existing index alone"""
+        mock_client = MagicMock()
+        mock_client.list_indexes.return_value = ["vector"]
+        
+        with pytest.raises(UnsupportedIndex):
+            rebuild_index(mock_client, "test", index_type="NOT_AN_INDEX")
+        
+        mock_client.drop_index.assert_not_called()
+    
+    def test_ensure_index_skips_matching_index(self):
+        """Test that a matching index is not rebuilt"""
+        mock_client = MagicMock()
+        mock_client.list_indexes.return_value = ["vector"]
+        mock_client.describe_index.return_value = {
+            "index_type": "IVF_FLAT",
+            "metric_type": "COSINE",
+            "nlist": "1024",
+        }
+        
+        assert ensure_index(mock_client, "test", "IVF_FLAT") is False
+        mock_client.drop_index.assert_not_called()
+    
+    def test_ensure_index_rebuilds_on_param_change(self):
+        """Test that a changed build parameter triggers a rebuild"""
+        mock_client = MagicMock()
+        mock_client.list_indexes.return_value = ["vector"]
+        mock_client.describe_index.return_value = {"index_type": "IVF_FLAT", "nlist": "1024"}
+        
+        assert ensure_index(mock_client, "test", "IVF_FLAT", {"nlist": 4096}) is True
+        mock_client.create_index.assert_called_once()
+
+
+class TestSearchVectors:
+    """Test cases for the tunable, batched search"""
+    
+    def test_build_search_params_defaults_per_index(self):
+        """Test that nprobe/ef defaults follow the index type"""
+        assert build_search_params("IVF_FLAT") == {"metric_type": "COSINE", "params": {"nprobe": 16}}
+        assert build_search_params("hnsw", {"ef": 128}) == {"metric_type": "COSINE", "params": {"ef": 128}}
+        assert build_search_params() == {"metric_type": "COSINE", "params": {}}
+    
+    def test_build_filter_expr(self):
+        """Test label and time range filter expressions"""
+        assert build_filter_expr() == ""
+        assert build_filter_expr(labels=["car", "person"]) == 'label in ["car", "person"]'
+        assert (
+            build_filter_expr(labels=["car"], start_time=10, end_time=20)
+            == 'label in ["car"] and timestamp >= 10 and timestamp <= 20'
+        )
+    
+    def test_search_vectors_single_vector(self):
+        """Test that a single vector is sent as a batch of one with bounded staleness"""
+        mock_client = MagicMock()
+        mock_client.search.return_value = [["hit"]]
+        
+        result = search_vectors(mock_client, "test", [0.5, 0.25], output_fields=["filename"], limit=5)
+        
+        mock_client.search.assert_called_once_with(
+            data=[[0.5, 0.25]],
+            collection_name="test",
+            limit=5,
+            search_params={"metric_type": "COSINE", "params": {}},
+            output_fields=["filename"],
+            consistency_level="Bounded",
+        )
+        assert result == [["hit"]]
+    
+    def test_search_vectors_with_filter_and_params(self):
+        """Test that filters and search params are forwarded"""
+        mock_client = MagicMock()
+        mock_client.search.return_value = [[], []]
+        
+        search_vectors(
+            mock_client,
+            "test",
+            [[0.1, 0.2], [0.3, 0.4]],
+            output_fields=["label"],
+            index_type="HNSW",
+            search_params={"ef": 256},
+            labels=["car"],
+            start_time=100,
+        )
+        
+        call_kwargs = mock_client.search.call_args[1]
+        assert len(call_kwargs["data"]) == 2
+        assert call_kwargs["search_params"]["params"] == {"ef": 256}
+        assert call_kwargs["filter"] == 'label in ["car"] and timestamp >= 100'
+    
+    def test_search_vectors_splits_large_batches(self):
+        """Test that batches above the Milvus query limit are split in order"""
+        mock_client = MagicMock()
+        mock_client.search.side_effect = lambda data, **kwargs: [len(data)]
+        
+        result = search_vectors(mock_client, "test", np.zeros((MAX_QUERY_BATCH + 3, 2)), output_fields=[])
+        
+        assert mock_client.search.call_count == 2
+        assert result == [MAX_QUERY_BATCH, 3]
+
+
 class TestIntegration:
     """Integration tests for milvus_utils functions"""
     
@@ -0,0 +1,132 @@
+# tests/test_search_session.py
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+
+# Add the src directory to Python path
+src_path = Path(__file__).parent.parent / "src" / "feature-matching"
+sys.path.insert(0, str(src_path))
+
+from search_session import (
+    EmbeddingError,
+    PipelineEmbedder,
+    SearchSession,
+    extract_feature_vector,
+)
+
+
+def make_response(json_value=None, text="", status_code=200):
+    response = MagicMock()
+    response.status_code = status_code
+    response.text = text
+    response.json.return_value = json_value
+    return response
+
+
+def make_metadata(values):
+    return json.dumps({"metadata": {"objects": [{"tensors": [{"layer_name": "prob", "data": values}]}]}})
+
+
+@pytest.fixture
+def mock_client():
+    client = AsyncMock()
+    client.is_closed = False
+    with patch('httpx.AsyncClient', return_value=client):
+        yield client
+
+
+class TestSearchSession:
+    """Test cases for the warm search pipeline session"""
+
+    def test_pipeline_id_cached_within_health_interval(self, mock_client):
+        """Test that the pipeline is only discovered once while it is fresh"""
+        mock_client.get.return_value = make_response([])
+        mock_client.post.return_value = make_response(text='"abc"\n')
+        session = SearchSession("http://pipeline-server:8080/", health_interval=60)
+
+        async def run():
+            return [await session.pipeline_id(), await session.pipeline_id()]
+
+        assert asyncio.run(run()) == ["abc", "abc"]
+        mock_client.get.assert_called_once_with("/pipelines/status")
+        mock_client.post.assert_called_once_with(
+            "/pipelines/user_defined_pipelines/search_image", json={"sync": True}
+        )
+
+    def test_pipeline_id_health_checked_after_interval(self, mock_client):
+        """Test that a stale pipeline ID is re-validated instead of rediscovered"""
+        mock_client.get.side_effect = [
+            make_response([]),
+            make_response({"state": "RUNNING"}),
+        ]
+        mock_client.post.return_value = make_response(text='"abc"')
+        session = SearchSession("http://pipeline-server:8080", health_interval=0)
+
+        async def run():
+            await session.pipeline_id()
+            return await session.pipeline_id()
+
+        assert asyncio.run(run()) == "abc"
+        assert mock_client.get.call_args_list[1].args == ("/pipelines/abc/status",)
+        mock_client.post.assert_called_once()
+
+    def test_infer_restarts_vanished_pipeline(self, mock_client):
+        """Test that a 404 from the pipeline server starts a new pipeline and retries"""
+        mock_client.get.return_value = make_response([])
+        mock_client.post.side_effect = [
+            make_response(text='"old"'),
+            make_response(status_code=404),
+            make_response(text='"new"'),
+            make_response(make_metadata([1.0, 2.0])),
+        ]
+        session = SearchSession("http://pipeline-server:8080")
+
+        result = asyncio.run(session.infer("aGVsbG8="))
+
+        assert extract_feature_vector(result) == [1.0, 2.0]
+        assert mock_client.post.call_args_list[3].args == (
+            "/pipelines/user_defined_pipelines/search_image/new",
+        )
+
+    def test_close_releases_client(self, mock_client):
+        """Test that closing the session closes the pooled client"""
+        session = SearchSession("http://pipeline-server:8080")
+        session.client
+
+        asyncio.run(session.close())
+
+        mock_client.aclose.assert_awaited_once()
+
+
+class TestPipelineEmbedder:
+    """Test cases for the pipeline server embedder"""
+
+    def test_embed_returns_vectors_in_order(self):
+        """Test that every image is embedded and returned in upload order"""
+        from PIL import Image
+
+        session = MagicMock()
+        session.infer = AsyncMock(side_effect=[
+            json.loads(make_metadata([0.1])),
+            json.loads(make_metadata([0.2])),
+        ])
+        embedder = PipelineEmbedder(session)
+        images = [Image.new('RGB', (32, 32), color) for color in ('red', 'blue')]
+
+        assert asyncio.run(embedder.embed(images)) == [[0.1], [0.2]]
+        assert session.infer.await_count == 2
+
+    def test_embed_without_feature_vector_raises(self):
+        """Test that a missing prob tensor is reported as an embedding error"""
+        from PIL import Image
+
+        session = MagicMock()
+        session.infer = AsyncMock(return_value={"metadata": {"objects": []}})
+        embedder = PipelineEmbedder(session)
+
+        with pytest.raises(EmbeddingError):
+            asyncio.run(embedder.embed([Image.new('RGB', (32, 32))]))
@@ -48,6 +48,17 @@ def client():
     return TestClient(server.app)
 
 
+@pytest.fixture(autouse=True)
+def reset_search_session():
+    """Drop the cached pipeline and pooled client between tests"""
+    session = server.embedder.session
+    session.invalidate()
+    session._client = None
+    yield
+    session.invalidate()
+    session._client = None
+
+
 @pytest.fixture
 def mock_image():
     """Create a mock image for testing"""
@@ -138,10 +149,10 @@ class TestSearchEndpoint:
         mock_client_instance = AsyncMock()
         mock_client_instance.get.side_effect = [mock_status_response, mock_details_response]
         mock_client_instance.post.return_value = mock_second_response
-        mock_httpx.return_value.__aenter__.return_value = mock_client_instance
+        mock_httpx.return_value = mock_client_instance
         
         # Mock milvus search results
-        with patch.object(server, 'get_search_results') as mock_search:
+        with patch.object(server, 'search_vectors') as mock_search:
             mock_search.return_value = [
                 {"filename": "test.jpg", "label": "person", "timestamp": 123456}
             ]
@@ -186,9 +197,9 @@ class TestSearchEndpoint:
         mock_client_instance = AsyncMock()
         mock_client_instance.get.return_value = mock_status_response
         mock_client_instance.post.side_effect = [mock_create_response, mock_second_response]
-        mock_httpx.return_value.__aenter__.return_value = mock_client_instance
+        mock_httpx.return_value = mock_client_instance
         
-        with patch.object(server, 'get_search_results') as mock_search:
+        with patch.object(server, 'search_vectors') as mock_search:
             mock_search.return_value = []
             
             resp = client.post('/search/', files={"images": ("test.jpg", mock_image, "image/jpeg")})
@@ -202,7 +213,7 @@ class TestSearchEndpoint:
         
         mock_client_instance = AsyncMock()
         mock_client_instance.get.side_effect = httpx.RequestError("Connection failed")
-        mock_httpx.return_value.__aenter__.return_value = mock_client_instance
+        mock_httpx.return_value = mock_client_instance
         
         # Mock successful pipeline creation
         mock_create_response = MagicMock()
@@ -229,7 +240,7 @@ class TestSearchEndpoint:
         # Reconfigure for post requests
         mock_client_instance.post.side_effect = [mock_create_response, mock_second_response]
         
-        with patch.object(server, 'get_search_results') as mock_search:
+        with patch.object(server, 'search_vectors') as mock_search:
             mock_search.return_value = []
             
             resp = client.post('/search/', files={"images": ("test.jpg", mock_image, "image/jpeg")})
@@ -257,7 +268,7 @@ class TestSearchEndpoint:
             mock_create_response,
             httpx.RequestError("Second pipeline failed")
         ]
-        mock_httpx.return_value.__aenter__.return_value = mock_client_instance
+        mock_httpx.return_value = mock_client_instance
         
         resp = client.post('/search/', files={"images": ("test.jpg", mock_image, "image/jpeg")})
         
@@ -296,10 +307,10 @@ class TestSearchEndpoint:
         mock_client_instance = AsyncMock()
         mock_client_instance.get.return_value = mock_status_response
         mock_client_instance.post.side_effect = [mock_create_response, mock_second_response]
-        mock_httpx.return_value.__aenter__.return_value = mock_client_instance
+        mock_httpx.return_value = mock_client_instance
         
         # Make search fail
-        with patch.object(server, 'get_search_results') as mock_search:
+        with patch.object(server, 'search_vectors') as mock_search:
             mock_search.side_effect = Exception("Milvus connection error")
             
             resp = client.post('/search/', files={"images": ("test.jpg", mock_image, "image/jpeg")})
@@ -309,6 +320,84 @@ class TestSearchEndpoint:
             assert resp.json()["error"] == "Search failed"
 
 
+    @patch('httpx.AsyncClient')
+    def test_search_endpoint_multiple_images_single_query(self, mock_httpx, client, mock_image):
+        """Test that all uploaded images are embedded and searched in one Milvus query"""
+        mock_status_response = MagicMock()
+        mock_status_response.json.return_value = []
+        
+        mock_create_response = MagicMock()
+        mock_create_response.text = '"pipeline222"'
+        
+        def make_second_response(value):
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = json.dumps({
+                "metadata": {"objects": [{"tensors": [{"layer_name": "prob", "data": [value] * 4}]}]}
+            })
+            return response
+        
+        mock_client_instance = AsyncMock()
+        mock_client_instance.is_closed = False
+        mock_client_instance.get.return_value = mock_status_response
+        mock_client_instance.post.side_effect = [
+            mock_create_response,
+            make_second_response(0.1),
+            make_second_response(0.2),
+        ]
+        mock_httpx.return_value = mock_client_instance
+        
+        with patch.object(server, 'search_vectors') as mock_search:
+            mock_search.return_value = [[], []]
+            
+            resp = client.post('/search/', files=[
+                ("images", ("a.jpg", mock_image, "image/jpeg")),
+                ("images", ("b.jpg", mock_image, "image/jpeg")),
+            ])
+            
+            assert resp.status_code == 200
+            assert resp.json() == [[], []]
+            mock_search.assert_called_once()
+            assert mock_search.call_args[0][2] == [[0.1] * 4, [0.2] * 4]
+    
+    @patch('httpx.AsyncClient')
+    def test_search_endpoint_reuses_pipeline_and_client(self, mock_httpx, client, mock_image):
+        """Test that a second search skips pipeline discovery and reuses the pooled client"""
+        mock_status_response = MagicMock()
+        mock_status_response.json.return_value = []
+        
+        mock_create_response = MagicMock()
+        mock_create_response.text = '"pipeline333"'
+        
+        mock_second_response = MagicMock()
+        mock_second_response.status_code = 200
+        mock_second_response.json.return_value = json.dumps({
+            "metadata": {"objects": [{"tensors": [{"layer_name": "prob", "data": [0.5] * 4}]}]}
+        })
+        
+        mock_client_instance = AsyncMock()
+        mock_client_instance.is_closed = False
+        mock_client_instance.get.return_value = mock_status_response
+        mock_client_instance.post.side_effect = [
+            mock_create_response,
+            mock_second_response,
+            mock_second_response,
+        ]
+        mock_httpx.return_value = mock_client_instance
+        
+        with patch.object(server, 'search_vectors') as mock_search:
+            mock_search.return_value = [[]]
+            
+            for _ in range(2):
+                resp = client.post('/search/', files={"images": ("test.jpg", mock_image, "image/jpeg")})
+                assert resp.status_code == 200
+        
+        mock_httpx.assert_called_once()
+        mock_client_instance.get.assert_called_once()
+        endpoints = [call.args[0] for call in mock_client_instance.post.call_args_list]
+        assert endpoints[1:] == ["/pipelines/user_defined_pipelines/search_image/pipeline333"] * 2
+
+
 class TestClearEndpoint:
     """Tests for the clear endpoint"""
     
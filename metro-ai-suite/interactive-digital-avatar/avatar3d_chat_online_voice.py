@@ -20,6 +20,7 @@ def main(args):
     from da.llm.qwen_client import QwenLocalClient
     from da.speak.tts_worker import TTSWorker
     from da.util.log import logger
+    from da.util.pipeline_stats import FirstFrameProbe
 
     # load EC-RAG client
     # llm_client = QwenLocalClient()
@@ -36,7 +37,8 @@ def main(args):
     tts_worker = TTSWorker(config.tts.male_voice, answer_text_queue, audio_queue)
 
     # Load avatar render.
-    avatar = RenderIntegrator(audio_queue)
+    lip_probe = FirstFrameProbe("Question to first lip frame")
+    avatar = RenderIntegrator(audio_queue, lip_probe)
 
     avatar.start()
     tts_worker.start()
@@ -54,8 +56,12 @@ def main(args):
             if len(question.strip()) == 0:
                 continue
 
+            lip_probe.arm()
             for answer in llm_client.generate_text_complete_sentences(question):
                 answer_text_queue.put(answer)
+                if not question_text_queue.empty():
+                    # barge-in, stop generating this answer and take the new question
+                    break
     except KeyboardInterrupt:
         logger.info("Exit...")
         listener.stop()
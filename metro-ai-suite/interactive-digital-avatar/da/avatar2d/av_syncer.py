@@ -1,5 +1,6 @@
 from queue import Queue, Empty
 
+from da.speak.audio_data import release_queued_audio
 from da.util.woker import PipelineWorker, WorkerType
 
 
@@ -25,11 +26,13 @@ class AVSyncer(PipelineWorker):
     def _run(self):
         while self._is_running():
             try:
-                audio_path, chunks_size = self.audio_input_queue.get(timeout=1)
+                audio, chunks_size = self.audio_input_queue.get(timeout=1)
             except Empty:
                 continue
 
-            self.audio_output_queue.put(audio_path)
+            self.audio_output_queue.put(audio)
             for _ in range(chunks_size):
                 chunks = self.chunk_input_queue.get()
                 self.chunk_output_queue.put(chunks)
+
+        release_queued_audio(self.audio_input_queue)
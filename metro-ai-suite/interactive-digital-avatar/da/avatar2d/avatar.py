@@ -13,8 +13,10 @@ import numpy as np
 import torch
 from tqdm import tqdm
 
+from da.avatar2d.avatar_assets import PackedAvatarAssets, is_packed, mirror_cycle, save_packed
+from da.avatar2d.face_blender import FaceBlender
 from da.util.log import logger
-from ext.musetalk.utils.blending import get_image_prepare_material, get_image_blending
+from ext.musetalk.utils.blending import get_image_prepare_material
 from ext.musetalk.utils.preprocessing import read_imgs, get_landmark_and_bbox
 from ext.musetalk.utils.utils import load_all_model, datagen
 
@@ -56,6 +58,7 @@ class Avatar:
         self.mask_out_path = f"{self.avatar_path}/mask"
         self.mask_coords_path = f"{self.avatar_path}/mask_coords.pkl"
         self.avatar_info_path = f"{self.avatar_path}/avator_info.json"
+        self.packed_path = f"{self.avatar_path}/packed"
         self.avatar_info = {
             "avatar_id": avatar_id,
             "video_path": video_path,
@@ -83,7 +86,7 @@ class Avatar:
                 shutil.rmtree(self.avatar_path)
 
             logger.info(f"creating 2D avator: {self.avatar_id}")
-            osmakedirs([self.avatar_path, self.full_imgs_path, self.video_out_path, self.mask_out_path])
+            osmakedirs([self.avatar_path, self.full_imgs_path, self.video_out_path])
             self.prepare_material()
 
         else:
@@ -93,17 +96,46 @@ class Avatar:
 
             logger.info(f"Loading Avatar {self.avatar_id} from {self.avatar_path}")
 
-            self.input_latent_list_cycle = torch.load(self.latents_out_path)
-            with open(self.coords_path, 'rb') as f:
-                self.coord_list_cycle = pickle.load(f)
-            input_img_list = glob.glob(os.path.join(self.full_imgs_path, '*.[jpJP][pnPN]*[gG]'))
-            input_img_list = sorted(input_img_list, key=lambda x: int(os.path.splitext(os.path.basename(x))[0]))
-            self.frame_list_cycle = read_imgs(input_img_list)
-            with open(self.mask_coords_path, 'rb') as f:
-                self.mask_coords_list_cycle = pickle.load(f)
-            input_mask_list = glob.glob(os.path.join(self.mask_out_path, '*.[jpJP][pnPN]*[gG]'))
-            input_mask_list = sorted(input_mask_list, key=lambda x: int(os.path.splitext(os.path.basename(x))[0]))
-            self.mask_list_cycle = read_imgs(input_mask_list)
+            if not is_packed(self.packed_path):
+                self.pack_legacy_material()
+            self.load_packed()
+
+    def load_packed(self):
+        self.assets = PackedAvatarAssets(self.packed_path)
+        self.frame_list_cycle = self.assets.frame_list_cycle
+        self.coord_list_cycle = self.assets.coord_list_cycle
+        self.mask_list_cycle = self.assets.mask_list_cycle
+        self.mask_coords_list_cycle = self.assets.mask_coords_list_cycle
+        self.input_latent_list_cycle = self.assets.input_latent_list_cycle
+        self.blender = FaceBlender(self)
+
+    def pack_legacy_material(self):
+        """Convert an avatar prepared as PNG and pickle files to the packed format, once."""
+        logger.info(f"Packing avatar {self.avatar_id} assets to {self.packed_path}")
+
+        input_latent_list_cycle = torch.load(self.latents_out_path)
+        with open(self.coords_path, 'rb') as f:
+            coord_list_cycle = pickle.load(f)
+        input_img_list = glob.glob(os.path.join(self.full_imgs_path, '*.[jpJP][pnPN]*[gG]'))
+        input_img_list = sorted(input_img_list, key=lambda x: int(os.path.splitext(os.path.basename(x))[0]))
+        frame_list_cycle = read_imgs(input_img_list)
+        with open(self.mask_coords_path, 'rb') as f:
+            mask_coords_list_cycle = pickle.load(f)
+        input_mask_list = glob.glob(os.path.join(self.mask_out_path, '*.[jpJP][pnPN]*[gG]'))
+        input_mask_list = sorted(input_mask_list, key=lambda x: int(os.path.splitext(os.path.basename(x))[0]))
+        mask_list_cycle = read_imgs(input_mask_list)
+
+        # legacy files hold the whole cycle already
+        save_packed(
+            self.packed_path,
+            frame_list_cycle,
+            coord_list_cycle,
+            mask_list_cycle,
+            mask_coords_list_cycle,
+            input_latent_list_cycle,
+            frame_cycle=np.arange(len(frame_list_cycle)),
+            latent_cycle=np.arange(len(input_latent_list_cycle)),
+        )
 
     def prepare_material(self):
         with open(self.avatar_info_path, "w") as f:
@@ -137,29 +169,26 @@ class Avatar:
             latents = self.vae.get_latents_for_unet(resized_crop_frame)
             input_latent_list.append(latents)
 
-        self.frame_list_cycle = frame_list + frame_list[::-1]
-        self.coord_list_cycle = coord_list + coord_list[::-1]
-        self.input_latent_list_cycle = input_latent_list + input_latent_list[::-1]
-        self.mask_coords_list_cycle = []
-        self.mask_list_cycle = []
-
-        # extract mask
-        for i, frame in enumerate(tqdm(self.frame_list_cycle, desc="get muse mask")):
-            cv2.imwrite(f"{self.full_imgs_path}/{str(i).zfill(8)}.png", frame)
-
-            face_box = self.coord_list_cycle[i]
+        # extract mask, the backward half of the cycle reuses the forward masks
+        mask_list = []
+        mask_coords_list = []
+        for frame, face_box in tqdm(zip(frame_list, coord_list), total=len(frame_list), desc="get muse mask"):
             mask, crop_box = get_image_prepare_material(frame, face_box)
-            cv2.imwrite(f"{self.mask_out_path}/{str(i).zfill(8)}.png", mask)
-            self.mask_coords_list_cycle += [crop_box]
-            self.mask_list_cycle.append(mask)
-
-        with open(self.mask_coords_path, 'wb') as f:
-            pickle.dump(self.mask_coords_list_cycle, f)
-
-        with open(self.coords_path, 'wb') as f:
-            pickle.dump(self.coord_list_cycle, f)
-
-        torch.save(self.input_latent_list_cycle, os.path.join(self.latents_out_path))
+            mask_list.append(mask)
+            mask_coords_list.append(crop_box)
+
+        save_packed(
+            self.packed_path,
+            frame_list,
+            coord_list,
+            mask_list,
+            mask_coords_list,
+            input_latent_list,
+            frame_cycle=mirror_cycle(len(frame_list)),
+            latent_cycle=mirror_cycle(len(input_latent_list)),
+        )
+        del frame_list, mask_list
+        self.load_packed()
 
         logger.info(f"2D avatar saved to {self.avatar_path}")
 
@@ -187,18 +216,13 @@ class Avatar:
             face_frame = input_face_frames.get()
 
             frame_idx = self.idx % (len(self.coord_list_cycle))
-            bbox = self.coord_list_cycle[frame_idx]
-            ori_frame = self.frame_list_cycle[frame_idx].copy()
 
             try:
-                x1, y1, x2, y2 = bbox
-                res_frame = cv2.resize(face_frame.astype(np.uint8), (x2 - x1, y2 - y1))
-            except:
+                combine_frame = self.blender.blend(frame_idx, face_frame)
+            except Exception as e:
+                logger.error(f"Error blending frame: {e}")
                 continue
 
-            mask = self.mask_list_cycle[frame_idx]
-            mask_crop_box = self.mask_coords_list_cycle[frame_idx]
-            combine_frame = get_image_blending(ori_frame, res_frame, bbox, mask, mask_crop_box)
             output_frame_queue.put(combine_frame)
 
             self.idx += 1
@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+from typing import Sequence
+
+import numpy as np
+import torch
+
+PACKED_VERSION = 1
+
+
+class CycleView(Sequence):
+    """
+    Read-only sequence over stored items through an index mapping.
+
+    The avatar loops its frames forward then backward, the mapping gives the
+    stored item for each position of that cycle so nothing is duplicated.
+    """
+
+    def __init__(self, data, cycle: np.ndarray, convert=None):
+        self.data = data
+        self.cycle = cycle
+        self.convert = convert
+
+    def __len__(self):
+        return len(self.cycle)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        item = self.data[self.cycle[idx]]
+        return self.convert(item) if self.convert else item
+
+    def take(self, idxs) -> np.ndarray:
+        """Stack the items at the given cycle positions into one array."""
+        return np.asarray(self.data[self.cycle[np.asarray(idxs)]])
+
+
+class RaggedArrays(Sequence):
+    """
+    2D arrays of different shapes packed in one flat buffer.
+    """
+
+    def __init__(self, flat: np.ndarray, offsets: np.ndarray, shapes: np.ndarray):
+        self.flat = flat
+        self.offsets = offsets
+        self.shapes = shapes
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def __getitem__(self, idx):
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return np.asarray(self.flat[start:end]).reshape(self.shapes[idx])
+
+
+def _frame(item):
+    # plain ndarray view of the memory-mapped frame
+    return np.asarray(item)
+
+
+def _latent(item):
+    return torch.from_numpy(np.asarray(item, dtype=np.float32)[None])
+
+
+def mirror_cycle(count: int) -> np.ndarray:
+    """Indices of a forward then backward loop over ``count`` items."""
+    forward = np.arange(count, dtype=np.int32)
+    return np.concatenate([forward, forward[::-1]])
+
+
+def save_packed(path, frames, coords, masks, mask_coords, latents, frame_cycle, latent_cycle):
+    """
+    Write avatar assets as arrays that can be memory-mapped on load.
+
+    Args:
+        path: Output directory, replaced if it exists.
+        frames: Sequence of equally sized BGR uint8 frames.
+        coords: Face bbox (x1, y1, x2, y2) per frame.
+        masks: Blending mask per frame, 2D uint8 arrays of varying shape.
+        mask_coords: Mask crop box (x1, y1, x2, y2) per frame.
+        latents: VAE latents, one (1, C, H, W) tensor or array per entry.
+        frame_cycle: Stored frame index for each position of the frame cycle.
+        latent_cycle: Stored latent index for each position of the latent cycle.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    frame_store = np.lib.format.open_memmap(
+        f"{tmp_path}/frames.npy", mode="w+", dtype=np.uint8, shape=(len(frames), *frames[0].shape)
+    )
+    for i, frame in enumerate(frames):
+        frame_store[i] = frame
+    frame_store.flush()
+    del frame_store
+
+    masks = [np.asarray(mask) for mask in masks]
+    # masks are stored gray, the blending converts them to gray anyway
+    masks = [mask[:, :, 0] if mask.ndim == 3 else mask for mask in masks]
+    offsets = np.zeros(len(masks) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([mask.size for mask in masks])
+    np.save(f"{tmp_path}/masks.npy", np.concatenate([mask.ravel() for mask in masks]))
+    np.save(f"{tmp_path}/mask_offsets.npy", offsets)
+    np.save(f"{tmp_path}/mask_shapes.npy", np.array([mask.shape for mask in masks], dtype=np.int32))
+
+    np.save(f"{tmp_path}/coords.npy", np.asarray(coords, dtype=np.int32).reshape(-1, 4))
+    np.save(f"{tmp_path}/mask_coords.npy", np.asarray(mask_coords, dtype=np.int32).reshape(-1, 4))
+    latents = [latent.cpu().numpy() if torch.is_tensor(latent) else np.asarray(latent) for latent in latents]
+    np.save(f"{tmp_path}/latents.npy", np.concatenate(latents).astype(np.float16))
+    np.save(f"{tmp_path}/frame_cycle.npy", np.asarray(frame_cycle, dtype=np.int32))
+    np.save(f"{tmp_path}/latent_cycle.npy", np.asarray(latent_cycle, dtype=np.int32))
+
+    with open(f"{tmp_path}/info.json", "w") as f:
+        json.dump({"version": PACKED_VERSION, "frames": len(frames), "latents": len(latents)}, f)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+def is_packed(path) -> bool:
+    info_path = f"{path}/info.json"
+    if not os.path.isfile(info_path):
+        return False
+    with open(info_path) as f:
+        return json.load(f).get("version") == PACKED_VERSION
+
+
+class PackedAvatarAssets:
+    """
+    Memory-mapped avatar assets, pages are only read when frames are touched.
+    """
+
+    def __init__(self, path):
+        frame_cycle = np.load(f"{path}/frame_cycle.npy")
+        latent_cycle = np.load(f"{path}/latent_cycle.npy")
+
+        self.frames = np.load(f"{path}/frames.npy", mmap_mode="r")
+        self.coords = np.load(f"{path}/coords.npy")
+        self.mask_coords = np.load(f"{path}/mask_coords.npy")
+        self.masks = RaggedArrays(
+            np.load(f"{path}/masks.npy", mmap_mode="r"),
+            np.load(f"{path}/mask_offsets.npy"),
+            np.load(f"{path}/mask_shapes.npy"),
+        )
+        self.latents = np.load(f"{path}/latents.npy")
+
+        self.frame_list_cycle = CycleView(self.frames, frame_cycle, _frame)
+        self.coord_list_cycle = CycleView(self.coords, frame_cycle, lambda c: tuple(int(v) for v in c))
+        self.mask_list_cycle = CycleView(self.masks, frame_cycle)
+        self.mask_coords_list_cycle = CycleView(self.mask_coords, frame_cycle, lambda c: [int(v) for v in c])
+        self.input_latent_list_cycle = CycleView(self.latents, latent_cycle, _latent)
@@ -3,6 +3,7 @@ from queue import Queue
 import numpy as np
 import openvino as ov
 
+from da import config
 from da.avatar2d.avatar import Avatar
 from ext.musetalk.utils.utils import datagen
 
@@ -23,7 +24,11 @@ def pad_array_to_batch_size(input_array, target_batch_size):
 
 
 def load_ov_model(ov_path, device):
-    return ov.compile_model(ov_path, device)
+    core = ov.Core()
+    if config.ov.cache_dir:
+        # reuse compiled blobs across runs instead of compiling at every start
+        core.set_property({"CACHE_DIR": config.ov.cache_dir})
+    return core.compile_model(ov_path, device)
 
 
 class AvatarOV(Avatar):
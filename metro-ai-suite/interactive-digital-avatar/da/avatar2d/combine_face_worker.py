@@ -1,51 +1,77 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from queue import Queue, Empty
 
-import cv2
-import numpy as np
-
 from da.avatar2d.avatar_ov import AvatarOV
+from da.avatar2d.face_blender import FramePool
 from da.util.log import logger
+from da.util.pipeline_stats import StageStats
 from da.util.woker import PipelineWorker, WorkerType
-from ext.musetalk.utils.blending import get_image_blending
 
 
 class CombineFaceWorker(PipelineWorker):
-    def __init__(self, avatar: AvatarOV, face_input_queue: Queue, frame_output_queue: Queue):
+    def __init__(
+            self,
+            avatar: AvatarOV,
+            face_input_queue: Queue,
+            frame_output_queue: Queue,
+            stats: StageStats = None,
+            workers: int = 1
+    ):
+        """
+        :param workers: number of threads blending faces, frames are still output in order
+        """
 
         self.avatar = avatar
         self.face_input_queue = face_input_queue
         self.frame_output_queue = frame_output_queue
+        self.stats = stats or StageStats(self.__class__.__name__, face_input_queue)
+        self.workers = max(workers, 1)
 
         super().__init__(self.__class__.__name__, WorkerType.Thread)
 
     def _init(self):
-        pass
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix=self.name)
+        # A pooled frame may be reused once it left the output queue and the display,
+        # frames being blended and waiting for their turn are counted in as well.
+        pool_size = self.frame_output_queue.maxsize + 2 * self.workers + 3
+        self.frame_pool = FramePool(self.avatar.frame_list_cycle[0].shape, pool_size)
+
+    def _blend(self, face_frame, frame_idx):
+        try:
+            return self.avatar.blender.blend(frame_idx, face_frame, self.frame_pool.get())
+        except Exception as e:
+            logger.error(f"Error blending frame: {e}")
+            return None
+
+    def _submit(self, face_frame, frame_idx) -> Future:
+        if face_frame is None:
+            # No face generated, pass the cached original img as is, it is only read downstream.
+            future = Future()
+            future.set_result(self.avatar.frame_list_cycle[frame_idx])
+            return future
+
+        # Face generated
+        return self.executor.submit(self._blend, face_frame, frame_idx)
 
     def _run(self):
+        pending = deque()
+
         while self._is_running():
             try:
-                face_frame, frame_idx = self.face_input_queue.get(timeout=1)
+                item = self.face_input_queue.get(timeout=0.005 if pending else 1)
             except Empty:
-                continue
+                item = None
 
-            if face_frame is None:
-                # No face generated, use original img.
-                ori_frame = self.avatar.frame_list_cycle[frame_idx].copy()
-                self.frame_output_queue.put(ori_frame)
-                continue
+            if item is not None:
+                pending.append(self._submit(*item))
 
-            # Face generated
-            bbox = self.avatar.coord_list_cycle[frame_idx]
-            ori_frame = self.avatar.frame_list_cycle[frame_idx].copy()
+            # Output finished frames in order, wait for the oldest one when all workers
+            # are busy or no more faces are coming for now.
+            while pending and (pending[0].done() or len(pending) > self.workers or item is None):
+                frame = pending.popleft().result()
+                if frame is not None:
+                    self.frame_output_queue.put(frame)
+                    self.stats.count()
 
-            try:
-                x1, y1, x2, y2 = bbox
-                res_frame = cv2.resize(face_frame.astype(np.uint8), (x2 - x1, y2 - y1))
-            except Exception as e:
-                logger.error(f"Error resizing frame: {e}")
-                continue
-
-            mask = self.avatar.mask_list_cycle[frame_idx]
-            mask_crop_box = self.avatar.mask_coords_list_cycle[frame_idx]
-            combine_frame = get_image_blending(ori_frame, res_frame, bbox, mask, mask_crop_box)
-            self.frame_output_queue.put(combine_frame)
+        self.executor.shutdown(wait=True)
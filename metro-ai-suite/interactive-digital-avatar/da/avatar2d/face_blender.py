@@ -0,0 +1,123 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+class FramePool:
+    """
+    Round-robin pool of preallocated output frames.
+
+    A buffer is handed out again after ``size`` other frames, so the pool must be
+    larger than the number of frames that can be alive downstream at once.
+    """
+
+    def __init__(self, shape, size: int, dtype=np.uint8):
+        self._buffers = [np.empty(shape, dtype=dtype) for _ in range(size)]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def get(self) -> np.ndarray:
+        with self._lock:
+            buffer = self._buffers[self._next]
+            self._next = (self._next + 1) % len(self._buffers)
+        return buffer
+
+
+class BlendRegion:
+    """
+    Precomputed blending of the generated face into one avatar frame.
+
+    Compositing the face over the frame with the MuseTalk mask only changes the
+    face bbox, so only that region (clipped to the frame) and its part of the
+    mask are kept, the mask as float alpha.
+    """
+
+    def __init__(self, frame_shape, bbox, mask, mask_crop_box):
+        x1, y1, x2, y2 = bbox
+        x_s, y_s = mask_crop_box[:2]
+        height, width = frame_shape[:2]
+
+        self.face_size = (x2 - x1, y2 - y1)
+        # bbox clipped to the frame, in frame and in face coordinates
+        fx1, fy1, fx2, fy2 = max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)
+        self.frame_slice = (slice(fy1, fy2), slice(fx1, fx2))
+        self.face_slice = (slice(fy1 - y1, fy2 - y1), slice(fx1 - x1, fx2 - x1))
+
+        # mask covers the crop box, which may extend out of the frame
+        mask = np.asarray(mask)
+        if mask.ndim == 3:
+            mask = mask[:, :, 0]
+        alpha = np.zeros((fy2 - fy1, fx2 - fx1), dtype=np.float32)
+        my1, mx1 = fy1 - y_s, fx1 - x_s
+        src = mask[max(my1, 0):max(my1 + alpha.shape[0], 0), max(mx1, 0):max(mx1 + alpha.shape[1], 0)]
+        alpha[max(-my1, 0):max(-my1, 0) + src.shape[0], max(-mx1, 0):max(-mx1, 0) + src.shape[1]] = src
+        self.alpha = (alpha / 255.0)[:, :, None]
+
+    @property
+    def empty(self) -> bool:
+        return self.alpha.size == 0
+
+
+class FaceBlender:
+    """
+    Blends generated faces into avatar frames, touching only the face region.
+    """
+
+    def __init__(self, avatar):
+        """
+        :param avatar: loaded Avatar, its frame, coord and mask cycles are used
+        """
+        self.avatar = avatar
+        self._regions = {}
+
+    def _stored_index(self, frame_idx: int) -> int:
+        # frames of the backward half of the cycle share the regions of the forward half
+        cycle = getattr(self.avatar.mask_list_cycle, "cycle", None)
+        return int(cycle[frame_idx]) if cycle is not None else frame_idx
+
+    def region(self, frame_idx: int) -> BlendRegion:
+        key = self._stored_index(frame_idx)
+        region = self._regions.get(key)
+        if region is None:
+            region = BlendRegion(
+                self.avatar.frame_list_cycle[frame_idx].shape,
+                self.avatar.coord_list_cycle[frame_idx],
+                self.avatar.mask_list_cycle[frame_idx],
+                self.avatar.mask_coords_list_cycle[frame_idx],
+            )
+            self._regions[key] = region
+        return region
+
+    def blend(self, frame_idx: int, face: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Blend a generated face into the avatar frame.
+
+        :param frame_idx: index of the frame in the avatar cycle
+        :param face: generated face, resized here to the frame's face bbox
+        :param out: buffer to write the frame to, a new frame is allocated if not given
+        :return: the blended frame
+        """
+        frame = self.avatar.frame_list_cycle[frame_idx]
+        if out is None:
+            out = frame.copy()
+        else:
+            np.copyto(out, frame)
+
+        region = self.region(frame_idx)
+        if region.empty:
+            return out
+
+        face = cv2.resize(face.astype(np.uint8, copy=False), region.face_size)
+        face = face[region.face_slice].astype(np.float32)
+        roi = out[region.frame_slice]
+        # roi += alpha * (face - roi), in place on the output frame
+        face -= roi
+        face *= region.alpha
+        face += roi
+        np.rint(face, out=face)
+        roi[...] = face
+        return out
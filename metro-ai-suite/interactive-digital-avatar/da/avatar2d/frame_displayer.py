@@ -3,20 +3,25 @@ from queue import Queue, Empty
 import cv2
 
 from da.util.da_time import RateLimiter
+from da.util.pipeline_stats import StageStats
 from da.util.woker import PipelineWorker, WorkerType
 
 
 class FrameDisplayer(PipelineWorker):
-    def __init__(self, fps: int, frame_input_queue: Queue):
+    def __init__(self, fps: int, frame_input_queue: Queue, rate_limiter: RateLimiter = None, stats: StageStats = None):
 
         self.fps = fps
         self.frame_input_queue = frame_input_queue
         self.window_name = "2D Digital Avatar"
+        # The display clock, may be shared with producers that pace to it
+        self.rate_limiter = rate_limiter
+        self.stats = stats or StageStats(self.__class__.__name__, frame_input_queue)
 
         super().__init__(self.__class__.__name__, WorkerType.Thread)
 
     def _init(self):
-        self.rate_limiter = RateLimiter(self.fps)
+        if self.rate_limiter is None:
+            self.rate_limiter = RateLimiter(self.fps)
 
     def _run(self):
         cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
@@ -29,6 +34,7 @@ class FrameDisplayer(PipelineWorker):
 
             cv2.imshow(self.window_name, img)
             cv2.waitKey(1)
+            self.stats.count()
 
             self.rate_limiter.wait()
 
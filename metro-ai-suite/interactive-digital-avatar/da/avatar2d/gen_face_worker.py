@@ -3,15 +3,35 @@ from queue import Queue, Empty
 import numpy as np
 
 from da.avatar2d.avatar_ov import AvatarOV, pad_array_to_batch_size
+from da.util.da_time import RateLimiter
+from da.util.pipeline_stats import FirstFrameProbe, StageStats
 from da.util.woker import PipelineWorker, WorkerType
 
 
 class GenFaceWorker(PipelineWorker):
-    def __init__(self, avatar: AvatarOV, whisper_input_queue: Queue, face_output_queue: Queue):
+    def __init__(
+            self,
+            avatar: AvatarOV,
+            whisper_input_queue: Queue,
+            face_output_queue: Queue,
+            display_clock: RateLimiter,
+            stats: StageStats = None,
+            idle_lead: int = 2,
+            lip_probe: FirstFrameProbe = None
+    ):
+        """
+        :param display_clock: rate limiter of the frame displayer, idle frames are paced to its ticks
+        :param idle_lead: number of idle frames allowed ahead of the display
+        :param lip_probe: marked when speaking faces are generated
+        """
 
         self.avatar = avatar
         self.whisper_input_queue = whisper_input_queue
         self.face_output_queue = face_output_queue
+        self.display_clock = display_clock
+        self.stats = stats or StageStats(self.__class__.__name__, whisper_input_queue)
+        self.idle_lead = idle_lead
+        self.lip_probe = lip_probe
 
         super().__init__(self.__class__.__name__, WorkerType.Thread)
 
@@ -21,17 +41,25 @@ class GenFaceWorker(PipelineWorker):
     def _run(self):
         idx = 0
         idx_len = len(self.avatar.input_latent_list_cycle)
+        # Frames sent downstream, compared with the display ticks to pace the idle stream
+        emitted = self.display_clock.ticks
 
         while self._is_running():
             try:
-                whisper_batch = self.whisper_input_queue.get_nowait()
+                # Sleep until whisper chunks arrive, waking up once per display frame
+                whisper_batch = self.whisper_input_queue.get(timeout=self.display_clock.interval)
             except Empty:
                 whisper_batch = None
 
             if whisper_batch is None:
                 # No audio input, tell combine face worker output original img by set face to None.
-                self.face_output_queue.put((None, idx))
-                idx = (idx + 1) % idx_len
+                # Only send as many as the display consumes, so idle frames never pile up in the
+                # queues and delay the first generated face.
+                while emitted - self.display_clock.ticks < self.idle_lead:
+                    self.face_output_queue.put((None, idx))
+                    idx = (idx + 1) % idx_len
+                    emitted += 1
+                    self.stats.count()
                 continue
 
             # Get audio input, generate face
@@ -40,7 +68,7 @@ class GenFaceWorker(PipelineWorker):
                 src_idxs.append(idx)
                 idx = (idx + 1) % idx_len
 
-            latent_batch = np.concatenate([self.avatar.input_latent_list_cycle[i].numpy() for i in src_idxs])
+            latent_batch = self.avatar.input_latent_list_cycle.take(src_idxs).astype(np.float32)
 
             # Pad to batch size
             actual_batch_size = whisper_batch.shape[0]
@@ -56,3 +84,7 @@ class GenFaceWorker(PipelineWorker):
 
             for face_frame, i in zip(recon, src_idxs):
                 self.face_output_queue.put((face_frame, i))
+            emitted += actual_batch_size
+            self.stats.count(actual_batch_size)
+            if self.lip_probe is not None:
+                self.lip_probe.mark()
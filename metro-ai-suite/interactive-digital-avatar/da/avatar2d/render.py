@@ -9,14 +9,18 @@ from da.avatar2d.frame_displayer import FrameDisplayer
 from da.avatar2d.gen_face_worker import GenFaceWorker
 from da.avatar2d.whisper_worker import WhisperWorker
 from da.speak.audio_player import AudioPlayer
+from da.util.da_time import RateLimiter
+from da.util.log import logger
+from da.util.pipeline_stats import FirstFrameProbe, PipelineStats
 from da.util.woker import PipelineWorker, WorkerType
 
 
 class AvatarRender(PipelineWorker):
-    def __init__(self, avatar_id: str, fps: int, audio_input_queue: Queue):
+    def __init__(self, avatar_id: str, fps: int, audio_input_queue: Queue, lip_probe: FirstFrameProbe = None):
         self.fps = fps
         self.avatar_id = avatar_id
         self.audio_input_queue = audio_input_queue
+        self.lip_probe = lip_probe
 
         super().__init__(self.__class__.__name__, WorkerType.Thread)
 
@@ -32,13 +36,18 @@ class AvatarRender(PipelineWorker):
             ov_device=config.ov.device,
         )
 
+        self.stats = PipelineStats()
+        # The display clock, idle frames are generated at its pace
+        self.display_clock = RateLimiter(self.fps)
+
         self.audio_queue_from_whisper = Queue(1)
         self.chunks_queue_from_whisper = Queue(self.avatar.fps * 10)  # 10s buffer
         self.whisper = WhisperWorker(
             self.avatar,
             self.audio_input_queue,
             self.chunks_queue_from_whisper,
-            self.audio_queue_from_whisper
+            self.audio_queue_from_whisper,
+            self.stats.add("whisper", self.audio_input_queue)
         )
 
         self.chunks_queue_to_gen_face = Queue(1)
@@ -46,11 +55,26 @@ class AvatarRender(PipelineWorker):
         self.av_syncer = AVSyncer(self.chunks_queue_from_whisper, self.chunks_queue_to_gen_face, self.audio_queue_from_whisper, self.audio_queue_to_player)
 
         self.face_queue = Queue(1)
-        self.gen_face = GenFaceWorker(self.avatar, self.chunks_queue_to_gen_face, self.face_queue)
+        self.gen_face = GenFaceWorker(
+            self.avatar,
+            self.chunks_queue_to_gen_face,
+            self.face_queue,
+            self.display_clock,
+            self.stats.add("gen-face", self.chunks_queue_to_gen_face),
+            lip_probe=self.lip_probe
+        )
 
         self.frame_queue = Queue(self.avatar.batch_size + 1)
-        self.combine_face = CombineFaceWorker(self.avatar, self.face_queue, self.frame_queue)
-        self.displayer = FrameDisplayer(self.fps, self.frame_queue)
+        self.combine_face = CombineFaceWorker(
+            self.avatar,
+            self.face_queue,
+            self.frame_queue,
+            self.stats.add("combine", self.face_queue),
+            config.avatar2d.combine_workers
+        )
+        self.displayer = FrameDisplayer(
+            self.fps, self.frame_queue, self.display_clock, self.stats.add("display", self.frame_queue)
+        )
 
         self.audio_player = AudioPlayer(self.audio_queue_to_player)
 
@@ -62,7 +86,12 @@ class AvatarRender(PipelineWorker):
         self.av_syncer.start()
         self.whisper.start()
 
-        self._stop_event.wait()
+        stats_interval = config.avatar2d.stats_interval
+        if stats_interval > 0:
+            while not self._stop_event.wait(stats_interval):
+                logger.info(f"2D avatar pipeline: {self.stats.summary()}")
+        else:
+            self._stop_event.wait()
 
         self.whisper.stop()
         self.av_syncer.stop()
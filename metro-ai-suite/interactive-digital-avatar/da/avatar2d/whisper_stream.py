@@ -0,0 +1,82 @@
+import numpy as np
+import torch
+
+from da.speak.audio_data import AudioData
+from ext.musetalk.whisper.whisper.audio import HOP_LENGTH, N_FRAMES, SAMPLE_RATE, log_mel_spectrogram, pad_or_trim
+
+# whisper features per second, and features each side of a video frame (Audio2Feature's audio_feat_length)
+FEATURES_PER_SEC = 50
+FEAT_LENGTH = (2, 2)
+
+
+def feature_length(num_samples: int) -> int:
+    """Number of whisper features Audio2Feature.audio2feat gives for 16 kHz audio."""
+    mel_frames = num_samples // HOP_LENGTH
+    full, rest = divmod(mel_frames, N_FRAMES)
+    return full * (N_FRAMES // 2) + rest // 2
+
+
+def chunk_count(num_features: int, fps: int) -> int:
+    """Number of chunks Audio2Feature.feature2chunks gives for the features."""
+    multiplier = FEATURES_PER_SEC / fps
+    i = 0
+    while int(i * multiplier) <= num_features:
+        i += 1
+    return i + 1
+
+
+class WhisperChunkStream:
+    """
+    Whisper chunks of an audio, computed window by window as they are iterated.
+
+    Gives the same chunks as Audio2Feature.audio2feat + feature2chunks, but the first
+    chunks are available once the first 30s whisper window is encoded, and the number
+    of chunks is known before any encoding.
+
+    The whisper encoder only takes full 30s windows, so a window costs the same however
+    short the audio is. Sentences shorter than 30s are a single window: their first
+    chunk comes after the whole sentence is encoded, only longer audio is streamed.
+    Encoding a shorter leading window first would not give it earlier, it is padded to
+    30s as well.
+    """
+
+    def __init__(self, audio_processor, audio: AudioData, fps: int):
+        self.model = audio_processor.model
+        self.pcm = audio.resample(SAMPLE_RATE).pcm
+        self.fps = fps
+        self.num_features = feature_length(len(self.pcm))
+        self.count = chunk_count(self.num_features, fps)
+
+    def __len__(self):
+        return self.count
+
+    def _features(self):
+        mel = log_mel_spectrogram(torch.from_numpy(self.pcm))
+        num_frames = mel.shape[-1]
+        dtype = next(self.model.parameters()).dtype
+        with torch.no_grad():
+            for seek in range(0, num_frames, N_FRAMES):
+                end_seek = min(seek + N_FRAMES, num_frames)
+                segment = pad_or_trim(mel[:, seek:end_seek], N_FRAMES).to(self.model.device).to(dtype)
+                _, embeddings = self.model.encoder(segment.unsqueeze(0), include_embeddings=True)
+                embeddings = embeddings.transpose(0, 2, 1, 3).squeeze(0)
+                yield embeddings[:(end_seek - seek) // 2]
+
+    def __iter__(self):
+        if self.num_features == 0:
+            return
+
+        multiplier = FEATURES_PER_SEC / self.fps
+        left, right = FEAT_LENGTH[0] * 2, (FEAT_LENGTH[1] + 1) * 2
+        features = None
+        i = 0
+        for window in self._features():
+            features = window if features is None else np.concatenate([features, window])
+            available = len(features)
+            while i < self.count:
+                center = int(i * multiplier)
+                idxs = np.clip(np.arange(center - left, center + right), 0, self.num_features - 1)
+                if idxs[-1] >= available:
+                    break
+                yield features[idxs].reshape(-1, features.shape[-1])
+                i += 1
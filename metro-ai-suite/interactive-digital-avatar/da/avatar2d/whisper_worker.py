@@ -5,44 +5,92 @@ from queue import Queue, Empty
 import numpy as np
 
 from da.avatar2d.avatar_ov import AvatarOV
+from da.avatar2d.whisper_stream import WhisperChunkStream
+from da.speak.audio_data import AudioData, audio_name, load_audio, release_queued_audio
 from da.util.log import logger
+from da.util.pipeline_stats import StageStats
 from da.util.woker import PipelineWorker, WorkerType
 
 
 class WhisperWorker(PipelineWorker):
-    def __init__(self, avatar: AvatarOV, audio_input_queue: Queue, whisper_output_queue: Queue, audio_output_queue: Queue):
+    def __init__(
+            self,
+            avatar: AvatarOV,
+            audio_input_queue: Queue,
+            whisper_output_queue: Queue,
+            audio_output_queue: Queue,
+            stats: StageStats = None
+    ):
 
         self.avatar = avatar
         self.audio_input_queue = audio_input_queue
         self.audio_output_queue = audio_output_queue
         self.whisper_output_queue = whisper_output_queue
+        self.stats = stats or StageStats(self.__class__.__name__, audio_input_queue)
 
         super().__init__(self.__class__.__name__, WorkerType.Thread)
 
     def _init(self):
         pass
 
-    def _run(self):
-        def generate_batches(lst, batch_size):
-            for i in range(0, len(lst), batch_size):
-                yield lst[i:i + batch_size]
+    def _load(self, audio):
+        if isinstance(audio, str) and not Path(audio).exists():
+            logger.error(f"{audio} not exist.")
+            return None
+        try:
+            return load_audio(audio)
+        except Exception as e:
+            logger.error(f"Could not load {audio_name(audio)}: {e}")
+            return None
 
+    def _run(self):
         while self._is_running():
             try:
-                audio_path = self.audio_input_queue.get(timeout=1)
+                audio_item = self.audio_input_queue.get(timeout=1)
             except Empty:
                 continue
 
-            if not Path(audio_path).exists():
-                logger.error(f"{audio_path} not exist.")
+            audio = self._load(audio_item)
+            if audio is None:
                 continue
 
-            logger.info(f"whisper predicting {audio_path}")
-            whisper_chunks = self.avatar.audio2chunks(audio_path, self.avatar.fps)
-            logger.info(f"whisper chunks from {audio_path}")
+            name = audio_name(audio_item)
+            logger.info(f"whisper predicting {name}")
+            whisper_chunks = WhisperChunkStream(self.avatar.audio_processor, audio, self.avatar.fps)
+            if whisper_chunks.num_features == 0:
+                logger.warning(f"{name} is too short for whisper.")
+                continue
 
+            # The player gets the audio as soon as the first batch is ready. For audio longer
+            # than a 30s whisper window, the next windows are featurized while the first faces
+            # are generated, shorter audio is featurized in one window before the first batch.
             chunks_size = math.ceil(len(whisper_chunks) / self.avatar.batch_size)
-            self.audio_output_queue.put((audio_path, chunks_size))
-            for chunks in generate_batches(whisper_chunks, self.avatar.batch_size):
-                chunks = np.stack(chunks)
-                self.whisper_output_queue.put(chunks)
+            batch = []
+            announced = False
+            for chunk in whisper_chunks:
+                batch.append(chunk)
+                if len(batch) < self.avatar.batch_size:
+                    continue
+                if not announced:
+                    self._announce(audio_item, audio, chunks_size)
+                    announced = True
+                self._put_batch(batch)
+                batch = []
+
+            if not announced:
+                self._announce(audio_item, audio, chunks_size)
+            if batch:
+                self._put_batch(batch)
+            logger.info(f"whisper chunks from {name}")
+
+        release_queued_audio(self.audio_input_queue)
+
+    def _announce(self, audio_item, audio: AudioData, chunks_size: int):
+        # File paths are played from the file, audio in memory goes to the player process via shared memory
+        player_audio = audio_item if isinstance(audio_item, str) else audio.share()
+        self.audio_output_queue.put((player_audio, chunks_size))
+
+    def _put_batch(self, batch):
+        chunks = np.stack(batch)
+        self.whisper_output_queue.put(chunks)
+        self.stats.count(len(chunks))
@@ -1,6 +1,7 @@
 from multiprocessing import Queue as p_Queue
 from queue import Queue, Empty
 
+from da.speak.audio_data import release_queued_audio
 from da.util.woker import PipelineWorker, WorkerType
 
 
@@ -26,11 +27,13 @@ class AVSyncer(PipelineWorker):
     def _run(self):
         while self._is_running():
             try:
-                audio_path, lips_len = self.audio_input_queue.get(timeout=1)
+                audio, lips_len = self.audio_input_queue.get(timeout=1)
             except Empty:
                 continue
 
-            self.audio_output_queue.put(audio_path)
+            self.audio_output_queue.put(audio)
             for _ in range(lips_len):
                 chunks = self.lip_input_queue.get()
                 self.lip_output_queue.put(chunks)
+
+        release_queued_audio(self.audio_input_queue)
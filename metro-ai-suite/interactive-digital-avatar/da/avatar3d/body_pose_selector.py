@@ -1,6 +1,10 @@
 import json
 import random
 
+import numpy as np
+
+from da.avatar3d.pose_frame import body_pose_to_npy
+
 
 def jsonl_to_body_pose(file: str) -> list[dict]:
     with open(file, 'r', encoding='utf-8') as f:
@@ -35,3 +39,12 @@ def select_random_pose(is_speaking: bool) -> list[dict]:
     prob = speaking_probabilities if is_speaking else idle_probabilities
     items, probabilities = zip(*prob)
     return random.choices(items, probabilities, k=1)[0]
+
+
+# the same clips as arrays, for senders working on flat pose frames
+_clips = {id(clip): body_pose_to_npy(clip) for clip in (idle, show, speak01, speak02, speak03, think01, think02, wave)}
+
+
+def select_random_clip(is_speaking: bool) -> np.ndarray:
+    """(frames, bone channels) array of a random body pose clip."""
+    return _clips[id(select_random_pose(is_speaking))]
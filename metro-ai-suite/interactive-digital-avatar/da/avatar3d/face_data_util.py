@@ -1,5 +1,3 @@
-import copy
-
 import numpy as np
 
 face_channels = [
@@ -57,22 +55,26 @@ face_channels = [
 ]
 
 
-def npy_to_face_pose(datas: np.array) -> list[dict]:
-    arkit_info_template = {"face_data": {"Parameter": []}}
-    for name in face_channels:
-        arkit_info_template["face_data"]['Parameter'].append({"Name": name, "Value": 0.0})
+def face_pose(values) -> dict:
+    return {"face_data": {"Parameter": [{"Name": name, "Value": value} for name, value in zip(face_channels, values)]}}
+
 
-    face_frames = [arkit_info_template, ]
+def npy_to_face_frames(datas: np.array) -> list[dict]:
+    """Face pose of each row of render ordered face data."""
+    datas = np.asarray(datas, dtype=np.float64)
+    if datas.shape[1] < len(face_channels):
+        # missing trailing channels stay at rest
+        datas = np.pad(datas, ((0, 0), (0, len(face_channels) - datas.shape[1])))
+    return [face_pose(values) for values in datas.tolist()]
 
-    for i in range(datas.shape[0]):
-        arkit_info = copy.deepcopy(arkit_info_template)
-        for j in range(datas.shape[1]):
-            arkit_info['face_data']['Parameter'][j]['Value'] = float(datas[i][j])
-        face_frames.append(arkit_info)
 
-    face_frames.append(arkit_info_template)
+def rest_face_pose() -> dict:
+    return face_pose([0.0] * len(face_channels))
 
-    return face_frames
+
+def npy_to_face_pose(datas: np.array) -> list[dict]:
+    arkit_info_template = rest_face_pose()
+    return [arkit_info_template, *npy_to_face_frames(datas), arkit_info_template]
 
 
 mouth_key = {
@@ -1,37 +1,114 @@
-import json
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Iterator
 
 import numpy as np
-import pandas as pd
 import requests
-from scipy.interpolate import interp1d
 
-from da.avatar3d.face_data_util import said_order_to_render_order, npy_to_face_pose
+from da.avatar3d.face_data_util import face_channels, npy_to_face_frames, rest_face_pose, said_order, \
+    said_order_to_face_channels_index
 from da.util.log import logger
 
+# SAiD predicts 32 of the ARKit channels: said_order[14:41] and said_order[46:51], the others stay 0.
+said_output_order = said_order[14:41] + said_order[46:51]
+said_scale = 1.2
+
+# gather SAiD output columns straight into render order
+_said_position = {name: i for i, name in enumerate(said_output_order)}
+_render_columns = np.array([j for j, name in enumerate(face_channels) if name in _said_position])
+_said_columns = np.array([_said_position[face_channels[j]] for j in _render_columns])
+assert [said_order[i] for i in said_order_to_face_channels_index] == face_channels
+
 
 class LipSyncClient:
-    def __init__(self, said_addr: str, said_fps: int, pose_sync_fps: int):
+    def __init__(self, said_addr: str, said_fps: int, pose_sync_fps: int, chunk_secs: float = 0):
+        """
+        :param said_addr: SAiD server endpoint
+        :param said_fps: frame rate of the SAiD predictions
+        :param pose_sync_fps: frame rate of the returned face poses
+        :param chunk_secs: audio longer than this is sent in chunks of this length, 0 to send it at once
+        """
         self.said_fps = said_fps
         self.said_addr = said_addr
         self.pose_sync_fps = pose_sync_fps
+        self.chunk_secs = chunk_secs
+        self.session = requests.Session()
+        # one request in flight while the previous chunk is consumed
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="LipSyncClient")
+
+    def predict(self, audio_data: np.array, sample_rate: int) -> list[dict]:
+        return [pose for poses in self.predict_chunks(audio_data, sample_rate) for pose in poses]
+
+    def frame_count(self, num_samples: int, sample_rate: int) -> int:
+        """Number of face poses predict_chunks gives for the audio, rest frames included."""
+        return sum(self.chunk_frames(end - start, sample_rate) for start, end in self.chunks(num_samples, sample_rate)) + 2
+
+    def chunk_frames(self, num_samples: int, sample_rate: int) -> int:
+        return max(int(num_samples * self.pose_sync_fps / sample_rate), 1)
+
+    def chunks(self, num_samples: int, sample_rate: int) -> list[tuple]:
+        chunk_size = int(self.chunk_secs * sample_rate)
+        if chunk_size <= 0 or num_samples <= chunk_size:
+            return [(0, num_samples)]
+        starts = range(0, num_samples, chunk_size)
+        return [(start, min(start + chunk_size, num_samples)) for start in starts]
+
+    def predict_chunks(self, audio_data: np.array, sample_rate: int) -> Iterator[list[dict]]:
+        """
+        Face poses of the audio chunk by chunk, the first ones come back as soon as the first chunk is predicted.
+
+        The poses start and end with a rest face, and add up to frame_count().
+        """
+        data = self.normalize_audio(audio_data).astype(np.float32, copy=False)
+        chunks = self.chunks(len(data), sample_rate)
+
+        futures = [self.executor.submit(self.request_said, data[start:end], sample_rate) for start, end in chunks[:1]]
+        for i, (start, end) in enumerate(chunks):
+            if i + 1 < len(chunks):
+                next_start, next_end = chunks[i + 1]
+                futures.append(self.executor.submit(self.request_said, data[next_start:next_end], sample_rate))
+
+            face_data = futures[i].result()
+            frames = self.chunk_frames(end - start, sample_rate)
+            if face_data is None:
+                # keep the frame count the audio was announced with
+                face_data = np.zeros((frames, len(face_channels)))
+            else:
+                face_data = self.resample_to_frames(self.postprocess_said(face_data), frames)
+
+            poses = npy_to_face_frames(face_data)
+            if i == 0:
+                poses.insert(0, rest_face_pose())
+            if i == len(chunks) - 1:
+                poses.append(rest_face_pose())
+            yield poses
+
+    def request_said(self, data: np.ndarray, sample_rate: int):
+        """
+        Post float32 audio as .npy to the SAiD server.
+
+        :return: SAiD output, None if the request failed
+        """
+        buffer = BytesIO()
+        np.save(buffer, data)
+        logger.info("Sending audio frames to said server.")
+        try:
+            said_response = self.session.post(
+                self.said_addr,
+                params={"audio_fs": sample_rate},
+                data=buffer.getvalue(),
+                headers={"Content-Type": "application/x-npy"},
+            )
+        except requests.RequestException as e:
+            logger.error(f"Failed to send audio to said server. {e}")
+            return None
 
-    def predict(self, audio_data: np.array, sample_rate: int):
-        data = self.normalize_audio(audio_data)
-        said_data = json.dumps({"audio": data.tolist(), "audio_fs": sample_rate})
-        logger.info("Sending audio frames to siad server.")
-        said_response = requests.post(self.said_addr, json=said_data)
         if said_response.status_code != 200:
             logger.error(f"Failed to send audio to said server. {said_response.status_code}")
-        else:
-            logger.info("200 OK from said server")
+            return None
 
-        response_data = said_response.json()
-        face_data_said = np.array(response_data["arkit_points"])
-        face_data_said = self.postprocess_said(face_data_said)
-        face_data_said = self.resample_to_fps(face_data_said, self.said_fps, self.pose_sync_fps)
-        face_data_said = said_order_to_render_order(face_data_said)
-        face_data_said = npy_to_face_pose(face_data_said)
-        return face_data_said
+        logger.info("200 OK from said server")
+        return np.load(BytesIO(said_response.content), allow_pickle=False)
 
     def normalize_audio(self, data):
         # Check the data type to normalize accordingly
@@ -52,24 +129,19 @@ class LipSyncClient:
 
         return data
 
-    def postprocess_said(self, face_data_group):
-        df = pd.DataFrame(face_data_group)
-        num_rows = df.shape[0]
-        new_cols_start = pd.DataFrame(np.zeros((num_rows, 14)), columns=[f'new_col_{i + 1}' for i in range(14)])
-        new_cols_end = pd.DataFrame(np.zeros((num_rows, 5)), columns=[f'new_col_{i + 15}' for i in range(5)])
-        df = pd.concat([new_cols_start, df], axis=1)
-        df = pd.concat([df.iloc[:, :41], new_cols_end, df.iloc[:, 41:]], axis=1)
-        data_array = df.to_numpy()
-        return data_array * 1.2
-
-    def resample_to_fps(self, data, original_fps, target_fps):
-        # Calculate original and target timestamps
-        num_samples = data.shape[0]
-        original_timestamps = np.linspace(0, num_samples / original_fps, num_samples)
-        target_timestamps = np.linspace(0, num_samples / original_fps, int(num_samples * target_fps / original_fps))
+    def postprocess_said(self, face_data_said):
+        """SAiD output to scaled face data in render order, channels SAiD doesn't predict are 0."""
+        face_data = np.zeros((face_data_said.shape[0], len(face_channels)))
+        face_data[:, _render_columns] = face_data_said[:, _said_columns] * said_scale
+        return face_data
 
-        # Create an interpolation function and apply it
-        interpolator = interp1d(original_timestamps, data, axis=0, kind='linear')
-        resampled_data = interpolator(target_timestamps)
+    def resample_to_frames(self, data, num_frames):
+        """Linearly resample the frames of data to num_frames, keeping the first and last frame."""
+        num_samples = data.shape[0]
+        if num_samples == 1 or num_frames == 1:
+            return np.repeat(data[:1], num_frames, axis=0)
 
-        return resampled_data
+        positions = np.linspace(0, num_samples - 1, num_frames)
+        left = np.minimum(positions.astype(np.int64), num_samples - 2)
+        weight = (positions - left)[:, None]
+        return data[left] * (1 - weight) + data[left + 1] * weight
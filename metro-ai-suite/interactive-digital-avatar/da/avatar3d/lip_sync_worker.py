@@ -1,9 +1,11 @@
+import itertools
 from pathlib import Path
 from queue import Queue, Empty
 
 from scipy.io import wavfile
 
 from da.avatar3d.lip_sync_client import LipSyncClient
+from da.speak.audio_data import audio_name, load_audio, release_queued_audio
 from da.util.log import logger
 from da.util.woker import PipelineWorker, WorkerType
 
@@ -24,19 +26,33 @@ class LipSyncWorker(PipelineWorker):
     def _run(self):
         while self._is_running():
             try:
-                audio_path = self.audio_input_queue.get(timeout=1)
+                audio_item = self.audio_input_queue.get(timeout=1)
             except Empty:
                 continue
 
-            if not Path(audio_path).exists():
-                logger.error(f"{audio_path} not exist.")
-                continue
-
-            logger.info(f"Processing {audio_path}")
-            fs, data = wavfile.read(audio_path)
-            face_pose_with_synced_lip = self.client.predict(data, fs)
-            logger.info(f"Get lip data from {audio_path}")
-
-            self.audio_output_queue.put((audio_path, len(face_pose_with_synced_lip)))
-            for pose in face_pose_with_synced_lip:
-                self.lip_output_queue.put(pose)
+            name = audio_name(audio_item)
+            logger.info(f"Processing {name}")
+            if isinstance(audio_item, str):
+                if not Path(audio_item).exists():
+                    logger.error(f"{audio_item} not exist.")
+                    continue
+                fs, data = wavfile.read(audio_item)
+                player_audio = audio_item
+            else:
+                audio = load_audio(audio_item)
+                fs, data = audio.sample_rate, audio.pcm
+            lip_chunks = self.client.predict_chunks(data, fs)
+            first_chunk = next(lip_chunks)
+            logger.info(f"Get lip data from {name}")
+            if not isinstance(audio_item, str):
+                # Audio in memory from TTS, passed on to the player process via shared memory.
+                # Shared once the lip data is back, so a failed prediction leaves no block behind.
+                player_audio = audio.share()
+
+            # start playing once the first chunk is back, the rest is predicted meanwhile
+            self.audio_output_queue.put((player_audio, self.client.frame_count(len(data), fs)))
+            for poses in itertools.chain([first_chunk], lip_chunks):
+                for pose in poses:
+                    self.lip_output_queue.put(pose)
+
+        release_queued_audio(self.audio_input_queue)
@@ -0,0 +1,147 @@
+import json
+from itertools import chain
+
+import numpy as np
+
+from da.avatar3d.face_data_util import face_channels, mouth_key
+
+# float channels of a bone, in the order they are sent
+bone_fields = (("Location", 3), ("Rotation", 4), ("Scale", 3))
+bone_channels = sum(size for _, size in bone_fields)
+
+mouth_channels = np.array([i for i, name in enumerate(face_channels) if name in mouth_key])
+
+# placeholder for the values when laying out the json text, never a real channel value
+_value_marker = -1.2345678901234567e-300
+
+
+def body_pose_to_npy(body_pose: list[dict], character: str = "huazhibing_default") -> np.ndarray:
+    """(frames, bones * bone_channels) array of a body pose clip."""
+    return np.array([
+        [value for bone in frame[character]["Bone"] for field, _ in bone_fields for value in bone[field]]
+        for frame in body_pose
+    ])
+
+
+def face_pose_to_npy(face_pose) -> np.ndarray:
+    """Render ordered face channels of a face pose dict, arrays are returned as they are."""
+    if isinstance(face_pose, np.ndarray):
+        return face_pose
+    return np.array([parameter["Value"] for parameter in face_pose["face_data"]["Parameter"]])
+
+
+class PoseLayout:
+    """
+    Static part of a pose frame: bones and face channels, with the order of their values.
+
+    A frame is a flat array, the bone channels of every bone then the face channels.
+    """
+
+    def __init__(self, bones: list[dict], name: str = "FaceData", prefix: str = "0|"):
+        """
+        :param bones: Name and Parent of each bone, other keys are ignored
+        :param name: socket.io event the renderer listens to
+        :param prefix: prefix of the renderer message
+        """
+        self.bones = [{"Name": bone["Name"], "Parent": bone["Parent"]} for bone in bones]
+        self.name = name
+        self.prefix = prefix
+        self.face_offset = len(self.bones) * bone_channels
+        self.size = self.face_offset + len(face_channels)
+
+    @classmethod
+    def from_body_pose(cls, body_frame: dict, character: str = "huazhibing_default") -> "PoseLayout":
+        return cls(body_frame[character]["Bone"])
+
+    def to_message(self) -> dict:
+        return {"name": self.name, "prefix": self.prefix, "bones": self.bones}
+
+    @classmethod
+    def from_message(cls, message: dict) -> "PoseLayout":
+        return cls(message["bones"], message["name"], message["prefix"])
+
+    def text_fragments(self) -> list[str]:
+        """
+        Pieces of the renderer json text around the values of a frame.
+
+        Joined with the values in between, gives the same text as json.dumps of the pose dict.
+        """
+        bones = [
+            {**bone, **{field: [_value_marker] * size for field, size in bone_fields}}
+            for bone in self.bones
+        ]
+        parameters = [{"Name": name, "Value": _value_marker} for name in face_channels]
+        # face values come after the bones in a frame, but before them in the text
+        text = json.dumps({"face_data": {"Parameter": parameters, "Bone": bones}})
+        fragments = text.split(repr(_value_marker))
+        assert len(fragments) == self.size + 1
+        return fragments
+
+    def text_order(self) -> np.ndarray:
+        """Frame index of each value in text order."""
+        return np.concatenate([np.arange(self.face_offset, self.size), np.arange(self.face_offset)])
+
+
+class PoseDeltaEncoder:
+    """
+    Encodes pose frames as the channels that changed since the last sent frame.
+
+    A channel is sent when it moved more than ``tolerance`` from the value last sent for it,
+    so the renderer is never further than that from the real pose. Frames without such
+    a change are skipped.
+    """
+
+    def __init__(self, layout: PoseLayout, tolerance: float = 0.0):
+        self.layout = layout
+        self.tolerance = tolerance
+        self.sent = np.zeros(layout.size)
+        self._diff = np.empty(layout.size)
+        self._changed = np.empty(layout.size, dtype=bool)
+        self._key = True
+
+    def reset(self):
+        """Send the next frame whole, e.g. after reconnecting."""
+        self._key = True
+
+    def encode(self, frame: np.ndarray):
+        """
+        :return: message for the frame, None if nothing changed
+        """
+        if self._key:
+            self._key = False
+            self.sent[:] = frame
+            return {"key": True, "value": self.sent.tobytes()}
+
+        np.subtract(frame, self.sent, out=self._diff)
+        np.abs(self._diff, out=self._diff)
+        np.greater(self._diff, self.tolerance, out=self._changed)
+        index = np.flatnonzero(self._changed)
+        if index.size == 0:
+            return None
+
+        value = frame[index]
+        self.sent[index] = value
+        return {"key": False, "index": index.astype(np.uint16).tobytes(), "value": value.tobytes()}
+
+
+class PoseDecoder:
+    """
+    Rebuilds the renderer message from encoded pose frames.
+    """
+
+    def __init__(self, layout: PoseLayout):
+        self.layout = layout
+        self.frame = np.zeros(layout.size)
+        self._fragments = layout.text_fragments()
+        self._text_order = layout.text_order()
+
+    def decode(self, message: dict) -> str:
+        value = np.frombuffer(message["value"], dtype=np.float64)
+        if message["key"]:
+            self.frame[:] = value
+        else:
+            self.frame[np.frombuffer(message["index"], dtype=np.uint16)] = value
+
+        values = map(repr, self.frame[self._text_order].tolist())
+        text = "".join(chain.from_iterable(zip(self._fragments, values))) + self._fragments[-1]
+        return self.layout.prefix + text
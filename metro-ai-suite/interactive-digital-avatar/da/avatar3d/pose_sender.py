@@ -1,85 +1,120 @@
-import json
-from copy import deepcopy
 from queue import Queue, Empty
 
 import numpy as np
 import socketio
 
-from da.avatar3d.body_pose_selector import select_random_pose
-from da.avatar3d.face_data_util import npy_to_face_pose, merge_mouth_json
+from da.avatar3d.body_pose_selector import idle, select_random_clip
+from da.avatar3d.pose_frame import PoseDeltaEncoder, PoseLayout, face_pose_to_npy, mouth_channels
 from da.util.da_time import RateLimiter
+from da.util.pipeline_stats import FirstFrameProbe
 from da.util.woker import PipelineWorker, WorkerType
 
 
-class PoseSender(PipelineWorker):
-    def __init__(self, mouth_pose_input_queue: Queue, sio_addr: str, pose_sync_fps: int):
-
-        self.mouth_pose_input_queue = mouth_pose_input_queue
-        self.pose_sync_fps = pose_sync_fps
-        self.sio_addr = sio_addr
-
-        super().__init__(self.__class__.__name__, WorkerType.Thread)
+class PoseFrames:
+    """
+    Pose frame of each tick: random body clips, the idle face loop and the speaking mouth.
 
-    def _init(self):
-        self.rate_limiter = RateLimiter(self.pose_sync_fps)
+    The frame is one array updated in place.
+    """
 
-        self.sio = socketio.Client()
-        self.sio.connect(self.sio_addr)
+    def __init__(self, layout: PoseLayout):
+        self.frame = np.zeros(layout.size)
+        self.body_frame = self.frame[:layout.face_offset]
+        self.face_frame = self.frame[layout.face_offset:]
 
         self.body_frame_idx = 0
-        self.body_pose = []
+        self.body_pose = np.empty((0, layout.face_offset))
 
         self.idle_face_frame_idx = 0
         idle_face_pose_npy = np.load("resource/avatar3d/idle_face.npy")
-        self.idle_face_pose = npy_to_face_pose(idle_face_pose_npy)
-
-    def _run(self):
-        while self._is_running():
-            try:
-                speaking_mouth_pose = self.mouth_pose_input_queue.get_nowait()
-            except Empty:
-                speaking_mouth_pose = None
+        # rest face at both ends of the loop, as npy_to_face_pose gives
+        self.idle_face_pose = np.pad(idle_face_pose_npy, ((1, 1), (0, 0)))
 
-            body_pose = self.get_current_frame_body_pose(speaking_mouth_pose)
-            face_pose = self.get_current_frame_face_pose(speaking_mouth_pose)
-            merged_posed = self.merge_body_and_face_pose(body_pose, face_pose)
-            self.send_current_frame_pose(merged_posed)
+    def next(self, speaking_mouth_pose) -> np.ndarray:
+        self.update_body_pose(speaking_mouth_pose)
+        self.update_face_pose(speaking_mouth_pose)
+        return self.frame
 
-            self.rate_limiter.wait()
-
-    def get_current_frame_body_pose(self, speaking_mouth_pose):
+    def update_body_pose(self, speaking_mouth_pose):
         # random select a pose according to current state
         if self.body_frame_idx >= len(self.body_pose):
             is_speaking = speaking_mouth_pose is not None
-            random_pose = select_random_pose(is_speaking)
-            self.body_pose = random_pose
+            self.body_pose = select_random_clip(is_speaking)
             self.body_frame_idx = 0
 
-        body = self.body_pose[self.body_frame_idx]
+        self.body_frame[:] = self.body_pose[self.body_frame_idx]
         self.body_frame_idx += 1
-        body = deepcopy(body)
-
-        return body
 
-    def get_current_frame_face_pose(self, speaking_mouth_pose):
+    def update_face_pose(self, speaking_mouth_pose):
         if self.idle_face_frame_idx >= len(self.idle_face_pose):
             self.idle_face_frame_idx = 0
 
-        face = self.idle_face_pose[self.idle_face_frame_idx]
+        self.face_frame[:] = self.idle_face_pose[self.idle_face_frame_idx]
         self.idle_face_frame_idx += 1
-        face = deepcopy(face)
 
         # replace the idle mouth with speaking mouth
         if speaking_mouth_pose is not None:
-            face = merge_mouth_json(face, speaking_mouth_pose)
+            self.face_frame[mouth_channels] = face_pose_to_npy(speaking_mouth_pose)[mouth_channels]
+
+
+class PoseSender(PipelineWorker):
+    def __init__(
+            self,
+            mouth_pose_input_queue: Queue,
+            sio_addr: str,
+            pose_sync_fps: int,
+            delta_tolerance: float = 0.0,
+            lip_probe: FirstFrameProbe = None
+    ):
+        """
+        :param delta_tolerance: pose channels are only sent when they moved more than this, 0 sends every change
+        :param lip_probe: marked when speaking mouth poses are sent
+        """
 
-        return face
+        self.mouth_pose_input_queue = mouth_pose_input_queue
+        self.pose_sync_fps = pose_sync_fps
+        self.sio_addr = sio_addr
+        self.delta_tolerance = delta_tolerance
+        self.lip_probe = lip_probe
+
+        super().__init__(self.__class__.__name__, WorkerType.Thread)
+
+    def _init(self):
+        self.rate_limiter = RateLimiter(self.pose_sync_fps)
+
+        self.layout = PoseLayout.from_body_pose(idle[0])
+        self.frames = PoseFrames(self.layout)
+        self.encoder = PoseDeltaEncoder(self.layout, self.delta_tolerance)
+
+        self.layout_pending = True
+        self.sio = socketio.Client()
+        self.sio.on("connect", self.on_connect)
+        self.sio.connect(self.sio_addr)
+
+    def on_connect(self):
+        # (re)connected, the relay needs the layout and a whole frame before deltas
+        self.layout_pending = True
+
+    def _run(self):
+        while self._is_running():
+            try:
+                speaking_mouth_pose = self.mouth_pose_input_queue.get_nowait()
+            except Empty:
+                speaking_mouth_pose = None
+
+            self.send_current_frame_pose(self.frames.next(speaking_mouth_pose))
+            if speaking_mouth_pose is not None and self.lip_probe is not None:
+                self.lip_probe.mark()
+
+            self.rate_limiter.wait()
 
-    def merge_body_and_face_pose(self, body_pose, face_pose) -> dict:
-        face_pose['face_data']['Bone'] = body_pose['huazhibing_default']['Bone']
-        return face_pose
+    def send_current_frame_pose(self, frame: np.ndarray):
+        if self.layout_pending:
+            self.layout_pending = False
+            self.sio.emit("pose_layout", self.layout.to_message())
+            self.encoder.reset()
 
-    def send_current_frame_pose(self, frame_pose: dict):
-        frame_pose = json.dumps(frame_pose)
-        send_data = {"name": "FaceData", "text": '0|' + frame_pose.strip()}
-        self.sio.emit("cmd", send_data)
+        # unchanged frames are not sent, the renderer keeps showing the last one
+        message = self.encoder.encode(frame)
+        if message is not None:
+            self.sio.emit("pose", message)
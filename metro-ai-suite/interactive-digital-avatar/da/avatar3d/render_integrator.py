@@ -7,12 +7,14 @@ from da.avatar3d.lip_sync_client import LipSyncClient
 from da.avatar3d.lip_sync_worker import LipSyncWorker
 from da.avatar3d.pose_sender import PoseSender
 from da.speak.audio_player import AudioPlayer
+from da.util.pipeline_stats import FirstFrameProbe
 from da.util.woker import PipelineWorker, WorkerType
 
 
 class RenderIntegrator(PipelineWorker):
-    def __init__(self, audio_input_queue: Queue):
+    def __init__(self, audio_input_queue: Queue, lip_probe: FirstFrameProbe = None):
         self.audio_input_queue = audio_input_queue
+        self.lip_probe = lip_probe
 
         super().__init__(self.__class__.__name__, WorkerType.Thread)
 
@@ -21,7 +23,8 @@ class RenderIntegrator(PipelineWorker):
         self.lip_sync_client = LipSyncClient(
             config.avatar3d.said_addr,
             config.avatar3d.said_fps,
-            config.avatar3d.pose_sync_fps
+            config.avatar3d.pose_sync_fps,
+            config.avatar3d.said_chunk_secs,
         )
 
         self.lip_queue_from_said = Queue(config.avatar3d.pose_sync_fps * 10)  # 10s buffer
@@ -45,7 +48,9 @@ class RenderIntegrator(PipelineWorker):
         self.pose_sender = PoseSender(
             self.lip_queue_to_pose_sender,
             config.avatar3d.sio_addr,
-            config.avatar3d.pose_sync_fps
+            config.avatar3d.pose_sync_fps,
+            config.avatar3d.pose_delta_tolerance,
+            self.lip_probe,
         )
 
         self.audio_player = AudioPlayer(self.audio_queue_to_player)
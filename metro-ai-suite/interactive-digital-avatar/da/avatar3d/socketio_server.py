@@ -1,9 +1,14 @@
 import socketio
 import eventlet
 
+from da.avatar3d.pose_frame import PoseDecoder, PoseLayout
+
 sio = socketio.Server(async_mode='eventlet', ping_timeout=3600)
 app = socketio.Middleware(sio)
 
+# pose decoder of each sender, they send encoded pose frames that are relayed as the full message
+pose_decoders = {}
+
 @sio.event
 def connect(sid, environ):
     print('connect', sid)
@@ -12,8 +17,19 @@ def connect(sid, environ):
 def cmd(sid, msg):
     sio.emit(msg['name'], msg['text'])
 
+@sio.event
+def pose_layout(sid, msg):
+    pose_decoders[sid] = PoseDecoder(PoseLayout.from_message(msg))
+
+@sio.event
+def pose(sid, msg):
+    decoder = pose_decoders.get(sid)
+    if decoder is not None:
+        sio.emit(decoder.layout.name, decoder.decode(msg))
+
 @sio.event
 def disconnect(sid):
+    pose_decoders.pop(sid, None)
     print('disconnect', sid)
 
 def socket_server_start():
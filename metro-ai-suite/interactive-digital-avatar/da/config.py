@@ -1,6 +1,14 @@
 import yaml
 
 
+class llm:
+    """
+    Config for splitting LLM answers into sentences
+    """
+    first_sentence_min_length = int()
+    first_sentence_max_length = int()
+
+
 class qwen:
     """
     Config for qwen llm server
@@ -44,6 +52,7 @@ class ov:
     Config for OpenVINO models
     """
     device = str()
+    cache_dir = str()
 
 
 class mic:
@@ -61,6 +70,12 @@ class wake:
     Config for wake word
     """
     wake_words = set()
+    gate = bool()
+    gate_margin_db = float()
+    gate_min_db = float()
+    kws_model = str()
+    kws_threshold = float()
+    stats_interval = int()
 
 
 class tts:
@@ -72,13 +87,17 @@ class tts:
 
 class avatar2d:
     render_fps = int()
+    stats_interval = int()
+    combine_workers = int()
 
 
 class avatar3d:
     sio_addr = str()
     said_addr = str()
     said_fps = int()
+    said_chunk_secs = float()
     pose_sync_fps = int()
+    pose_delta_tolerance = float()
 
 
 def load_config(config: dict, predix=""):
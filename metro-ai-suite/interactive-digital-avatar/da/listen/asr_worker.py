@@ -1,4 +1,4 @@
-from collections import deque
+import time
 from enum import Enum, auto
 from queue import Empty, Queue
 
@@ -7,6 +7,8 @@ import numpy as np
 from da import config
 from da.listen.asr_client import AsrClient
 from da.listen.keyboard_watcher import KeyboardWatcher
+from da.listen.wake_detector import EnergyGate, OnnxKeywordSpotter, WakeStats
+from da.util.audio_ring import AudioRingBuffer
 from da.util.log import logger
 from da.util.woker import PipelineWorker, WorkerType
 
@@ -44,16 +46,25 @@ class AsrWorker(PipelineWorker):
     def _init(self):
         self.asr_client = AsrClient()
 
+        self.kws = None
+        if config.wake.kws_model:
+            self.kws = OnnxKeywordSpotter(config.wake.kws_model, config.wake.kws_threshold)
+            logger.info(f"KWS model loaded from {config.wake.kws_model}.")
+        self.gate = EnergyGate(config.mic.rate, config.wake.gate_margin_db, config.wake.gate_min_db)
+        self.wake_stats = WakeStats()
+        self.last_stats_secs = 0
+
         buffers_per_sec = config.mic.rate / config.mic.chunk_size
-        self.standby_buffer_size = int(self.max_buffer_secs * buffers_per_sec)
+        self.standby_buffer_size = int(self.max_buffer_secs * config.mic.rate)
         self.silent_buffer_size = int(self.silent_detect_secs * buffers_per_sec)
         self.min_asr_size = int(self.min_asr_interval_secs * buffers_per_sec)
-        self.min_question_size = int(self.min_question_secs * buffers_per_sec)
+        self.min_question_size = int(self.min_question_secs * config.mic.rate)
         self.chunks_received = 0
 
         self.state = AsrState.Standby
         self.recognize_buffer = list()
-        self.standby_buffer = deque(maxlen=self.standby_buffer_size)
+        self.recognize_samples = 0
+        self.standby_buffer = AudioRingBuffer(self.standby_buffer_size)
 
     def _run(self):
         while self._is_running():
@@ -75,24 +86,41 @@ class AsrWorker(PipelineWorker):
         assert self.state == AsrState.Standby
 
         self.standby_buffer.append(audio_data)
+        self.gate.update(audio_data)
 
         if self.manual_recognize_started():
             self.state = AsrState.ManualRecognizing
-            self.say_hello()
-            return
-
-        if self.auto_recognize_started():
+        elif self.auto_recognize_started():
             self.state = AsrState.AutoRecognizing
+            if self.gate.onset_time is not None:
+                self.wake_stats.woke(time.perf_counter() - self.gate.onset_time)
+
+        self.wake_stats.idle(len(audio_data) / config.mic.rate)
+        self.log_wake_stats()
+
+        if self.state != AsrState.Standby:
+            self.wake_stats.pause()
+            self.gate.reset()
             self.say_hello()
+
+    def log_wake_stats(self):
+        if config.wake.stats_interval <= 0:
             return
+        if self.wake_stats.idle_secs - self.last_stats_secs >= config.wake.stats_interval:
+            self.last_stats_secs = self.wake_stats.idle_secs
+            logger.info(f"Wake stats: {self.wake_stats.summary()}")
+
+    def move_standby_to_recognize(self):
+        self.recognize_buffer.append(self.standby_buffer.latest().copy())
+        self.recognize_samples += len(self.standby_buffer)
+        self.standby_buffer.clear()
 
     def manual_recognize_started(self) -> bool:
         if self.state != AsrState.Standby:
             return False
 
         if self.keyboard_watcher.is_recording():
-            self.recognize_buffer.extend(self.standby_buffer)
-            self.standby_buffer.clear()
+            self.move_standby_to_recognize()
             return True
 
         return False
@@ -101,30 +129,56 @@ class AsrWorker(PipelineWorker):
         if self.state != AsrState.Standby:
             return False
 
-        if self.chunks_received % self.min_asr_size == 0:
-            audio_input = np.concatenate(self.standby_buffer)
-            if self.is_silent(audio_input):
+        audio_input = self.wake_candidate()
+        if audio_input is None:
+            return False
+
+        if self.kws is not None:
+            self.wake_stats.kws_calls += 1
+            if not self.kws.detect(audio_input):
                 return False
 
-            text = self.asr_client.recognize(audio_input)
-            logger.info(f"Standby ASR: {text}")
+        self.wake_stats.asr_calls += 1
+        text = self.asr_client.recognize(audio_input)
+        logger.info(f"Standby ASR: {text}")
 
-            for word in config.wake.wake_words:
-                # Trigger by wake words
-                if word in text:
-                    logger.info(f"Wake by word: {word}")
-                    self.recognize_buffer.extend(self.standby_buffer)
-                    self.standby_buffer.clear()
-                    return True
+        for word in config.wake.wake_words:
+            # Trigger by wake words
+            if word in text:
+                logger.info(f"Wake by word: {word}")
+                self.move_standby_to_recognize()
+                return True
 
         return False
 
+    def wake_candidate(self):
+        """
+        Audio that may hold a wake word, None if not worth checking.
+
+        With the gate, only speech is checked: every min_asr_interval_secs during the first
+        max_buffer_secs of a speech segment, and once more when the segment ends.
+        """
+        interval_reached = self.chunks_received % self.min_asr_size == 0
+
+        if not config.wake.gate:
+            if not interval_reached:
+                return None
+            audio_input = self.standby_buffer.latest()
+            return None if self.is_silent(audio_input) else audio_input
+
+        if self.gate.ended:
+            return self.standby_buffer.latest(self.gate.segment_samples)
+        if self.gate.active and interval_reached and self.gate.segment_samples <= self.standby_buffer_size:
+            return self.standby_buffer.latest(self.gate.segment_samples)
+        return None
+
     def say_hello(self):
         self.audio_output_queue_to_player.put(self.hello_audio_path)
 
     def recognize(self, audio_data):
         assert self.is_recognizing()
         self.recognize_buffer.append(audio_data)
+        self.recognize_samples += len(audio_data)
 
         if self.manual_recognize_ended():
             self.state = AsrState.Standby
@@ -149,7 +203,7 @@ class AsrWorker(PipelineWorker):
             return False
 
         # recognize_buffer = standby_buffer + questions_buffer
-        if len(self.recognize_buffer) < self.standby_buffer_size + self.min_question_size:
+        if self.recognize_samples < self.standby_buffer_size + self.min_question_size:
             return False
 
         # End by mic silent input
@@ -185,3 +239,4 @@ class AsrWorker(PipelineWorker):
             self.text_output_queue.put(text)
 
         self.recognize_buffer.clear()
+        self.recognize_samples = 0
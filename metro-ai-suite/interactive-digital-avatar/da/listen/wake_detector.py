@@ -0,0 +1,171 @@
+import time
+
+import numpy as np
+import onnxruntime as ort
+
+
+class EnergyGate:
+    """
+    Cheap speech detector on short frame energies, against a tracked noise level.
+
+    Opens a speech segment after ``onset_secs`` of voiced audio and closes it
+    after ``hangover_secs`` of unvoiced audio.
+    """
+    frame_secs = 0.016
+    onset_secs = 0.1
+    hangover_secs = 0.3
+    noise_adapt = 0.05  # how fast the noise level follows unvoiced audio, voiced audio moves it 10x slower
+
+    def __init__(self, rate: int, margin_db: float, min_db: float):
+        """
+        :param rate: sample rate of the audio
+        :param margin_db: how far above the noise level a frame is voiced
+        :param min_db: frames below this level are never voiced
+        """
+        self.rate = rate
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.frame_size = int(rate * self.frame_secs)
+        self.onset_samples = int(rate * self.onset_secs)
+        self.hangover_samples = int(rate * self.hangover_secs)
+
+        self.noise_db = None
+        self.active = False  # inside a speech segment
+        self.ended = False  # the segment ended with the last chunk
+        self.onset_time = None  # perf_counter() at the start of the segment
+        self.segment_samples = 0
+        self._voiced_samples = 0
+        self._unvoiced_samples = 0
+
+    def frame_db(self, chunk: np.ndarray) -> np.ndarray:
+        """Energy in dB of each frame of the chunk."""
+        usable = len(chunk) // self.frame_size * self.frame_size
+        frames = chunk[:usable].reshape(-1, self.frame_size) if usable else chunk.reshape(1, -1)
+        energy = np.einsum("ij,ij->i", frames, frames) / frames.shape[1]
+        return 10 * np.log10(energy + 1e-12)
+
+    def update(self, chunk: np.ndarray) -> bool:
+        """
+        Feed the next chunk of the stream.
+
+        :return: whether the chunk is inside a speech segment
+        """
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if len(chunk) == 0:
+            return self.active
+
+        db = self.frame_db(chunk)
+        quietest = float(db.min())
+        if self.noise_db is None:
+            self.noise_db = quietest
+        threshold = max(self.noise_db + self.margin_db, self.min_db)
+        voiced = np.count_nonzero(db > threshold) * 2 >= len(db)
+
+        if quietest < self.noise_db:
+            self.noise_db = quietest
+        else:
+            adapt = self.noise_adapt if not voiced else self.noise_adapt / 10
+            self.noise_db += adapt * (quietest - self.noise_db)
+
+        n = len(chunk)
+        self.ended = False
+        if voiced:
+            self._voiced_samples += n
+            self._unvoiced_samples = 0
+        else:
+            self._unvoiced_samples += n
+            if not self.active:
+                self._voiced_samples = 0
+
+        if not self.active:
+            if self._voiced_samples >= self.onset_samples:
+                self.active = True
+                self.segment_samples = self._voiced_samples
+                self.onset_time = time.perf_counter() - self._voiced_samples / self.rate
+        else:
+            self.segment_samples += n
+            if self._unvoiced_samples >= self.hangover_samples:
+                self.active = False
+                self.ended = True
+                self._voiced_samples = 0
+
+        return self.active
+
+    def reset(self):
+        self.active = False
+        self.ended = False
+        self.onset_time = None
+        self.segment_samples = 0
+        self._voiced_samples = 0
+        self._unvoiced_samples = 0
+
+
+class OnnxKeywordSpotter:
+    """
+    Small keyword spotting model, run on gated audio before the full ASR.
+
+    The ONNX model takes a (1, samples) float32 waveform at the mic rate and
+    outputs keyword posteriors, the highest one is the score.
+    """
+
+    def __init__(self, model_path: str, threshold: float):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.threshold = threshold
+
+    def score(self, audio: np.ndarray) -> float:
+        outputs = self.session.run(None, {self.input_name: np.asarray(audio, dtype=np.float32)[None]})
+        return float(np.max(outputs[0]))
+
+    def detect(self, audio: np.ndarray) -> bool:
+        return self.score(audio) >= self.threshold
+
+
+class WakeStats:
+    """
+    CPU spent waiting for the wake word and time taken to wake up.
+    """
+
+    def __init__(self):
+        self.idle_secs = 0.0
+        self.idle_cpu_secs = 0.0
+        self.asr_calls = 0
+        self.kws_calls = 0
+        self.latencies = []
+        self._last_cpu = None
+
+    def idle(self, audio_secs: float):
+        """
+        Count a standby chunk, the process CPU time since the previous standby chunk is charged to standby.
+        """
+        cpu = time.process_time()
+        if self._last_cpu is not None:
+            self.idle_cpu_secs += cpu - self._last_cpu
+        self._last_cpu = cpu
+        self.idle_secs += audio_secs
+
+    def pause(self):
+        """Leave standby, the time until the next standby chunk is not charged."""
+        self._last_cpu = None
+
+    def woke(self, latency: float):
+        self.latencies.append(latency)
+
+    @property
+    def cpu_per_idle_hour(self) -> float:
+        """CPU seconds per hour of standby."""
+        return self.idle_cpu_secs / self.idle_secs * 3600 if self.idle_secs > 0 else 0.0
+
+    def summary(self) -> str:
+        summary = (
+            f"standby {self.idle_secs:.0f}s, cpu {self.cpu_per_idle_hour:.0f}s/idle hour, "
+            f"asr {self.asr_calls} calls, kws {self.kws_calls} calls"
+        )
+        if self.latencies:
+            summary += (
+                f", wake latency avg {np.mean(self.latencies):.2f}s max {np.max(self.latencies):.2f}s"
+                f" ({len(self.latencies)} wakes)"
+            )
+        return summary
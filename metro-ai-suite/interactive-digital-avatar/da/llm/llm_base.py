@@ -1,10 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import Generator, Set
+import threading
+from typing import Generator, Optional, Set
 
+from da import config
+from da.llm.llm_stream import GenerationStats, SentenceSplitter
 from da.util.log import logger
 
 
 class LLMBaseClient(ABC):
+    def __init__(self):
+        self._cancel_event = threading.Event()
+        # timings of the last answer from generate_text_complete_sentences
+        self.generation_stats: Optional[GenerationStats] = None
 
     @abstractmethod
     def generate_text(self, prompt: str) -> Generator[str, None, None]:
@@ -31,37 +38,52 @@ class LLMBaseClient(ABC):
     def generate_text_complete_sentences(self, prompt: str) -> Generator[str, None, None]:
         pass
 
+    def cancel(self):
+        """
+        Stop the answer being generated, e.g. when the user barges in. Safe to call from any thread.
+        """
+        self._cancel_event.set()
+
     def _generate_text_complete_sentences(
             self, prompt: str, min_length: int,
             end_punctuation: Set[str]) -> Generator[str, None, None]:
         """
         Generate text using the LLM, and wrap text Generator into multiple complete sentences.
 
+        The first sentence is cut short to start speaking early, see SentenceSplitter.
+        Timings of the answer are kept in generation_stats.
+
         Parameters:
         - prompt: The prompt to send to the LLM.
         - min_length: minimum length of the returned string.
         - end_punctuation: a set of characters used to determine sentence boundaries.
         """
+        self._cancel_event.clear()
+        stats = self.generation_stats = GenerationStats()
+        splitter = SentenceSplitter(
+            min_length, end_punctuation, config.llm.first_sentence_min_length, config.llm.first_sentence_max_length
+        )
         text_generator = self.generate_text(prompt)
 
         def generate_sentences():
-            buffer = []
-
             for text_piece in text_generator:
-                for c in text_piece:
-                    buffer.append(c)
-
-                    if c not in end_punctuation:
-                        continue
-
-                    if len(buffer) >= min_length:
-                        sentence = ''.join(buffer)
-                        buffer.clear()
-                        yield sentence
-
-            if len(buffer) > 0:
-                yield ''.join(buffer)
-
-        for answer in generate_sentences():
-            logger.info(f"Answer from LLM: {answer}")
-            yield answer
+                if self._cancel_event.is_set():
+                    logger.info("LLM answer cancelled.")
+                    return
+                stats.text()
+                yield from splitter.feed(text_piece)
+
+            rest = splitter.flush()
+            if rest is not None:
+                yield rest
+
+        try:
+            for answer in generate_sentences():
+                stats.sentence()
+                logger.info(f"Answer from LLM: {answer}")
+                yield answer
+        finally:
+            # stops a generation still running when the caller stops early
+            text_generator.close()
+            stats.finish()
+            logger.info(f"LLM stats: {stats.summary()}")
@@ -1,11 +1,11 @@
 from abc import ABC, abstractmethod
 from concurrent.futures.thread import ThreadPoolExecutor
-from queue import Queue
 from typing import Generator
 
 import openvino_genai
 
 from da.llm.llm_base import LLMBaseClient
+from da.llm.llm_stream import TextStream
 from da.util.log import logger
 
 
@@ -14,11 +14,13 @@ class LLMLocalClient(LLMBaseClient, ABC):
         """
         Initialize the OV LLM model from model dir.
         """
+        super().__init__()
         self.ov_model_dir = ov_model_dir
         self.ov_device = ov_device
         self.max_tokens = max_tokens
         self.pipe = openvino_genai.LLMPipeline(ov_model_dir, ov_device)
-        self.executor = ThreadPoolExecutor()
+        # one generation at a time, the pipeline is not reentrant
+        self.executor = ThreadPoolExecutor(1)
         logger.info(f"Load local LLM from {self.ov_model_dir}")
 
     @abstractmethod
@@ -26,19 +28,32 @@ class LLMLocalClient(LLMBaseClient, ABC):
         pass
 
     def generate_text(self, prompt: str) -> Generator[str, None, None]:
-        text_queue = Queue()
-
-        def text_streamer(text):
-            text_queue.put(text)
+        """
+        Stream the answer, closing the generator before the end stops the generation.
+        """
+        stream = TextStream()
+        # bound now, a cancelled generation may end after the next answer started
+        stats = self.generation_stats
 
         input_text = self.apply_prompt_template(prompt)
         generation_kwargs = dict(
-            inputs=input_text, streamer=text_streamer, max_new_tokens=self.max_tokens,
+            inputs=input_text, streamer=stream.put, max_new_tokens=self.max_tokens,
             do_sample=True, temperature=0.8, top_p=0.9, top_k=5
         )
-        req = self.executor.submit(self.pipe.generate, **generation_kwargs)
-
-        while not req.done() or not text_queue.empty():
-            yield text_queue.get()
 
-        req.result()
+        def generate():
+            error = None
+            try:
+                result = self.pipe.generate(**generation_kwargs)
+                perf_metrics = getattr(result, "perf_metrics", None)
+                if stats is not None and perf_metrics is not None:
+                    stats.tokens = perf_metrics.get_num_generated_tokens()
+            except Exception as e:
+                error = e
+            stream.end(error)
+
+        self.executor.submit(generate)
+        try:
+            yield from stream
+        finally:
+            stream.cancel()
@@ -13,6 +13,7 @@ class LLMRemoteClient(LLMBaseClient, ABC):
 
         :param base_url: The base URL of the LLM server API.
         """
+        super().__init__()
         self.base_url = base_url
         self.headers = {
             "Accept": "application/json",
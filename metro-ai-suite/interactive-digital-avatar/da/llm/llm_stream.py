@@ -0,0 +1,155 @@
+import re
+import threading
+from queue import Queue
+from time import perf_counter
+from typing import Iterable, Optional, Set
+
+
+class _End:
+    def __init__(self, error: Optional[BaseException]):
+        self.error = error
+
+
+class TextStream:
+    """
+    Text pieces streamed from a generation thread to a reader.
+
+    The generation ends the stream with a sentinel, so the reader never waits on a
+    generation that already finished, and the reader can cancel the generation.
+    """
+
+    def __init__(self):
+        self._queue = Queue()
+        self._cancelled = threading.Event()
+
+    def put(self, text: str) -> bool:
+        """
+        Streamer callback of the generation.
+
+        :return: True when the generation should stop
+        """
+        if not self._cancelled.is_set():
+            self._queue.put(text)
+        return self._cancelled.is_set()
+
+    def end(self, error: BaseException = None):
+        """Called by the generation when it is done, with the error it failed with if any."""
+        self._queue.put(_End(error))
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if isinstance(item, _End):
+                if item.error is not None and not self.cancelled:
+                    raise item.error
+                return
+            yield item
+
+
+class SentenceSplitter:
+    """
+    Splits streamed text into sentences for TTS.
+
+    The first sentence is cut as early as possible so the avatar starts speaking soon: at
+    the first punctuation once it has ``first_min_length`` characters, or at
+    ``first_max_length`` characters if no punctuation comes. The minimum length then
+    doubles for each sentence up to ``min_length``, so TTS gets longer sentences once
+    it is ahead of the playback.
+    """
+
+    def __init__(self, min_length: int, end_punctuation: Set[str], first_min_length: int, first_max_length: int):
+        self.min_length = min_length
+        self.first_max_length = first_max_length
+        self.current_min_length = min(first_min_length, min_length)
+        self.first = True
+        self._pattern = re.compile("|".join(re.escape(p) for p in end_punctuation))
+        self._buffer = ""
+        self._scan_from = 0
+
+    def feed(self, text: str) -> Iterable[str]:
+        """Add a text piece, yield the sentences it completes."""
+        self._buffer += text
+
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                return
+            sentence, self._buffer = self._buffer[:cut], self._buffer[cut:]
+            self._scan_from = 0
+            self.first = False
+            self.current_min_length = min(self.current_min_length * 2, self.min_length)
+            yield sentence
+
+    def _find_cut(self) -> Optional[int]:
+        for match in self._pattern.finditer(self._buffer, self._scan_from):
+            if match.end() >= self.current_min_length:
+                return match.end()
+        self._scan_from = len(self._buffer)
+
+        if self.first and len(self._buffer) >= self.first_max_length:
+            return self.first_max_length
+        return None
+
+    def flush(self) -> Optional[str]:
+        """The text left after the last sentence, if any."""
+        rest, self._buffer = self._buffer, ""
+        self._scan_from = 0
+        return rest or None
+
+
+class GenerationStats:
+    """
+    Timings of one LLM answer, from the request on.
+    """
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.first_text_time = None
+        self.first_sentence_time = None
+        self.end_time = None
+        self.pieces = 0
+        # generated tokens when the LLM reports them, otherwise the streamed pieces are counted
+        self.tokens = None
+
+    def text(self):
+        if self.first_text_time is None:
+            self.first_text_time = perf_counter()
+        self.pieces += 1
+
+    def sentence(self):
+        if self.first_sentence_time is None:
+            self.first_sentence_time = perf_counter()
+
+    def finish(self):
+        self.end_time = perf_counter()
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return None if self.first_text_time is None else self.first_text_time - self.start
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        if self.first_text_time is None or self.end_time is None:
+            return None
+        tokens = self.tokens if self.tokens is not None else self.pieces
+        # the first token is the TTFT, the rate is over the rest
+        elapsed = self.end_time - self.first_text_time
+        return (tokens - 1) / elapsed if tokens > 1 and elapsed > 0 else None
+
+    def summary(self) -> str:
+        def secs(value):
+            return "-" if value is None else f"{value:.2f}s"
+
+        tokens_per_sec = self.tokens_per_sec
+        first_sentence = None if self.first_sentence_time is None else self.first_sentence_time - self.start
+        return (
+            f"TTFT {secs(self.ttft)}, first sentence {secs(first_sentence)}, "
+            f"{'-' if tokens_per_sec is None else f'{tokens_per_sec:.1f}'} tokens/s"
+        )
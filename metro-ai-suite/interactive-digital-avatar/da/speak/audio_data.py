@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from math import gcd
+from multiprocessing import resource_tracker, shared_memory
+from queue import Empty
+from typing import Union
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+
+@dataclass
+class AudioData:
+    """
+    Mono float32 PCM audio held in memory.
+    """
+    pcm: np.ndarray
+    sample_rate: int
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / self.sample_rate
+
+    @classmethod
+    def from_file(cls, audio_path: str) -> "AudioData":
+        pcm, sample_rate = sf.read(audio_path, dtype="float32", always_2d=True)
+        return cls(pcm.mean(axis=1, dtype=np.float32), sample_rate)
+
+    def resample(self, sample_rate: int) -> "AudioData":
+        if sample_rate == self.sample_rate:
+            return self
+        div = gcd(sample_rate, self.sample_rate)
+        pcm = resample_poly(self.pcm, sample_rate // div, self.sample_rate // div)
+        return AudioData(pcm.astype(np.float32), sample_rate)
+
+    def share(self) -> "SharedAudio":
+        """
+        Copy the audio to shared memory, the returned handle can be sent to another process.
+        """
+        pcm = np.ascontiguousarray(self.pcm, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(pcm.nbytes, 1))
+        np.ndarray(pcm.shape, dtype=np.float32, buffer=shm.buf)[:] = pcm
+        shm.close()
+        # The receiver frees the block, don't let this process' tracker unlink it at exit.
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return SharedAudio(shm.name, len(pcm), self.sample_rate)
+
+
+@dataclass
+class SharedAudio:
+    """
+    Handle to audio in shared memory, cheap to send through a multiprocessing queue.
+
+    The receiver must call load() or release() exactly once, they free the shared memory.
+    A handle that is never loaded, e.g. left in a queue when its consumer stops, must be
+    released or the block stays in /dev/shm until the host restarts.
+    """
+    name: str
+    length: int
+    sample_rate: int
+
+    def load(self) -> AudioData:
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            pcm = np.ndarray((self.length,), dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+        return AudioData(pcm, self.sample_rate)
+
+    def release(self):
+        """Free the shared memory without reading it."""
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+
+# Audio passed between pipeline workers: a wav file path or audio in memory
+AudioItem = Union[str, AudioData, SharedAudio]
+
+
+def load_audio(item: AudioItem) -> AudioData:
+    if isinstance(item, SharedAudio):
+        return item.load()
+    if isinstance(item, AudioData):
+        return item
+    return AudioData.from_file(item)
+
+
+def audio_name(item: AudioItem) -> str:
+    """Short description of an audio item for logs."""
+    if isinstance(item, (AudioData, SharedAudio)):
+        length = len(item.pcm) if isinstance(item, AudioData) else item.length
+        return f"<{length / item.sample_rate:.2f}s audio>"
+    return str(item)
+
+
+def release_audio(item: AudioItem):
+    """Free the shared memory of an audio item that will not be loaded."""
+    if isinstance(item, SharedAudio):
+        item.release()
+
+
+def release_queued_audio(queue) -> int:
+    """
+    Empty a queue of audio items, or of (audio item, length) tuples, and free their shared
+    memory. Called by the consumers of audio when they stop.
+
+    :return: number of shared audio released
+    """
+    released = 0
+    while True:
+        try:
+            item = queue.get(timeout=0.1)
+        except Empty:
+            return released
+        if isinstance(item, tuple):
+            item = item[0]
+        if isinstance(item, SharedAudio):
+            item.release()
+            released += 1
@@ -2,32 +2,59 @@ from multiprocessing import Queue
 from pathlib import Path
 from queue import Empty
 
+import numpy as np
+import pyaudio
 from playsound import playsound
 
+from da.speak.audio_data import AudioData, load_audio, release_queued_audio
 from da.util.log import logger
 from da.util.woker import PipelineWorker, WorkerType
 
 
 class AudioPlayer(PipelineWorker):
     def __init__(self, input_queue: Queue):
+        """
+        :param input_queue: queue of wav file paths or audio in memory (AudioData or SharedAudio)
+        """
 
         self.input_queue = input_queue
 
         super().__init__(self.__class__.__name__, WorkerType.Process)
 
     def _init(self):
-        pass
+        self.pyaudio = None
+
+    def _play_pcm(self, audio: AudioData):
+        if self.pyaudio is None:
+            self.pyaudio = pyaudio.PyAudio()
+        stream = self.pyaudio.open(format=pyaudio.paFloat32, channels=1, rate=audio.sample_rate, output=True)
+        try:
+            stream.write(np.ascontiguousarray(audio.pcm, dtype=np.float32).tobytes())
+        finally:
+            stream.stop_stream()
+            stream.close()
 
     def _run(self):
         while self._is_running():
             try:
-                audio_path = self.input_queue.get(timeout=1)
+                audio = self.input_queue.get(timeout=1)
             except Empty:
                 continue
 
-            if not Path(audio_path).exists():
-                logger.error(f"{audio_path} not exist.")
+            if not isinstance(audio, str):
+                audio = load_audio(audio)
+                logger.info(f"playing {audio.duration:.2f}s audio")
+                self._play_pcm(audio)
                 continue
 
-            logger.info(f"playing \"{audio_path}\"")
-            playsound(str(Path(audio_path).absolute()))
+            if not Path(audio).exists():
+                logger.error(f"{audio} not exist.")
+                continue
+
+            logger.info(f"playing \"{audio}\"")
+            playsound(str(Path(audio).absolute()))
+
+        # Audio queued after the last one played is never loaded, free its shared memory
+        release_queued_audio(self.input_queue)
+        if self.pyaudio is not None:
+            self.pyaudio.terminate()
@@ -1,35 +1,56 @@
 import uuid
 from pathlib import Path
 
+import soundfile as sf
 from paddlespeech.cli.tts import TTSExecutor
 
+from da.speak.audio_data import AudioData
 from da.util.log import logger
 
 
+class InMemoryTTSExecutor(TTSExecutor):
+    """
+    TTSExecutor returning the synthesized wave and its sample rate instead of writing a wav file.
+    """
+
+    def postprocess(self, output=None):
+        return AudioData(self._outputs["wav"].numpy().reshape(-1), self.am_config.fs)
+
+    def postprocess_onnx(self, output=None):
+        return AudioData(self._outputs["wav"].reshape(-1), self.fs)
+
+
 class TTSClient:
     def __init__(self, male: bool = False):
         self.male = male
-        self.tts_executor = TTSExecutor()
+        self.tts_executor = InMemoryTTSExecutor()
         self.warmup()
         logger.info("TTSClient initialized")
 
     def warmup(self):
-        self.tts("模型初始化")
+        self.synthesize("模型初始化")
+
+    def synthesize(self, text: str) -> AudioData:
+        if self.male:
+            audio = self._tts_male(text)
+        else:
+            audio = self._tts_female(text)
+
+        logger.info(f"TTS {text} synthesized, {audio.duration:.2f}s")
+        return audio
 
     def tts(self, text: str) -> str:
         Path("output/tmp").mkdir(exist_ok=True, parents=True)
-        tmp_file_path = f"output/tmp/{uuid.uuid4()}.wav"
+        audio_path = f"output/tmp/{uuid.uuid4()}.wav"
 
-        if self.male:
-            audio_path = self._tts_male(text, tmp_file_path)
-        else:
-            audio_path = self._tts_female(text, tmp_file_path)
+        audio = self.synthesize(text)
+        sf.write(audio_path, audio.pcm, audio.sample_rate)
 
         logger.info(f"TTS {text} saved to {audio_path}")
         return audio_path
 
-    def _tts_male(self, text: str, tmp_file_path: str):
-        wav = self.tts_executor(
+    def _tts_male(self, text: str) -> AudioData:
+        return self.tts_executor(
             text=text,
             am="fastspeech2_male",
             spk_id=167,
@@ -38,13 +59,10 @@ class TTSClient:
             device="cpu",
             use_onnx=True,
             cpu_threads=4,
-            output=tmp_file_path
         )
 
-        return wav
-
-    def _tts_female(self, text: str, tmp_file_path: str):
-        wav = self.tts_executor(
+    def _tts_female(self, text: str) -> AudioData:
+        return self.tts_executor(
             text=text,
             am="fastspeech2_mix",
             spk_id=174,
@@ -53,7 +71,4 @@ class TTSClient:
             device="cpu",
             use_onnx=True,
             cpu_threads=4,
-            output=tmp_file_path
         )
-
-        return wav
@@ -27,8 +27,9 @@ class TTSWorker(PipelineWorker):
                 continue
 
             try:
-                audio_path = self.tts_client.tts(text)
+                audio = self.tts_client.synthesize(text)
             except Exception as e:
                 logger.exception(f"Error while tts {text}.")
                 continue
-            self.audio_output_queue.put(audio_path)
+            # Hand the PCM over through shared memory, no wav file is written
+            self.audio_output_queue.put(audio.share())
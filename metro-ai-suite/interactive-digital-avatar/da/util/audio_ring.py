@@ -0,0 +1,48 @@
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Fixed size buffer keeping the latest samples of an audio stream.
+
+    Samples are written twice, at their position and one capacity further, so
+    the latest samples can always be read as one contiguous view without copying.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        self.capacity = capacity
+        self._buffer = np.zeros(2 * capacity, dtype=dtype)
+        self._pos = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, chunk: np.ndarray):
+        chunk = np.asarray(chunk).ravel()[-self.capacity:]
+        n = len(chunk)
+        if n == 0:
+            return
+
+        first = min(n, self.capacity - self._pos)
+        rest = n - first
+        for offset in (0, self.capacity):
+            self._buffer[offset + self._pos:offset + self._pos + first] = chunk[:first]
+            self._buffer[offset:offset + rest] = chunk[first:]
+
+        self._pos = (self._pos + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def latest(self, n: int = None) -> np.ndarray:
+        """
+        View of the latest ``n`` samples, all buffered samples if not given.
+
+        The view is overwritten by later appends, copy it to keep it.
+        """
+        n = self._size if n is None else min(n, self._size)
+        end = self._pos + self.capacity
+        return self._buffer[end - n:end]
+
+    def clear(self):
+        self._pos = 0
+        self._size = 0
@@ -21,6 +21,8 @@ class RateLimiter:
         # Interval in seconds for each call based on frequency
         self.interval = 1.0 / frequency_per_sec
         self.last_time = perf_counter() - self.interval
+        # Number of completed waits, lets producers pace themselves to this clock
+        self.ticks = 0
 
     def wait(self):
         # Calculate the time we need to wait to meet the frequency limit
@@ -33,3 +35,4 @@ class RateLimiter:
 
         # Update the last run time to the current time
         self.last_time = perf_counter()
+        self.ticks += 1
@@ -0,0 +1,111 @@
+import multiprocessing
+import threading
+from time import perf_counter
+from typing import Optional
+
+from da.util.log import logger
+
+
+def queue_occupancy(queue) -> tuple:
+    """
+    (size, capacity) of a queue.Queue or multiprocessing.Queue, capacity is 0 if unbounded.
+    """
+    try:
+        size = queue.qsize()
+    except NotImplementedError:
+        # multiprocessing.Queue.qsize() is not available on macOS
+        size = -1
+    capacity = getattr(queue, "maxsize", None)
+    if capacity is None:
+        capacity = getattr(queue, "_maxsize", 0)
+    return size, max(capacity, 0)
+
+
+class StageStats:
+    """
+    Frame rate of a pipeline stage and occupancy of its input queue.
+    """
+
+    def __init__(self, name: str, input_queue=None):
+        self.name = name
+        self.input_queue = input_queue
+        self._lock = threading.Lock()
+        self._count = 0
+        self._last_count = 0
+        self._last_time = perf_counter()
+
+    def count(self, frames: int = 1):
+        with self._lock:
+            self._count += frames
+
+    def snapshot(self) -> dict:
+        """Frames per second since the previous snapshot, and the input queue occupancy."""
+        now = perf_counter()
+        with self._lock:
+            frames = self._count - self._last_count
+            elapsed = now - self._last_time
+            self._last_count = self._count
+            self._last_time = now
+
+        stats = {"name": self.name, "fps": frames / elapsed if elapsed > 0 else 0.0}
+        if self.input_queue is not None:
+            stats["queue"] = queue_occupancy(self.input_queue)
+        return stats
+
+
+class PipelineStats:
+    """
+    Stats of all stages of a pipeline, reported in one line.
+    """
+
+    def __init__(self):
+        self.stages = []
+
+    def add(self, name: str, input_queue=None) -> StageStats:
+        stage = StageStats(name, input_queue)
+        self.stages.append(stage)
+        return stage
+
+    def summary(self) -> str:
+        parts = []
+        for stats in (stage.snapshot() for stage in self.stages):
+            part = f"{stats['name']} {stats['fps']:.1f} fps"
+            if "queue" in stats:
+                size, capacity = stats["queue"]
+                part += f" (queue {size}/{capacity or 'inf'})"
+            parts.append(part)
+        return " | ".join(parts)
+
+
+class FirstFrameProbe:
+    """
+    Time from an event, e.g. a question, to the first frame marked after it.
+
+    Shared between processes: perf_counter() is the same clock in all of them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # start time while armed, 0 once the frame is marked
+        self._start = multiprocessing.Value("d", 0.0)
+        self._latency = multiprocessing.Value("d", -1.0)
+
+    def arm(self):
+        with self._start.get_lock():
+            self._start.value = perf_counter()
+            self._latency.value = -1.0
+
+    def mark(self):
+        with self._start.get_lock():
+            if self._start.value <= 0:
+                return
+            latency = perf_counter() - self._start.value
+            self._start.value = 0.0
+            self._latency.value = latency
+        logger.info(f"{self.name}: {latency:.2f}s")
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Latency of the last marked frame, None if not marked since armed."""
+        latency = self._latency.value
+        return latency if latency >= 0 else None
@@ -1,4 +1,5 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
+from io import BytesIO
 import json
 import numpy as np
 import torch
@@ -48,17 +49,10 @@ said_model.load_state_dict(torch.load(weights_path, map_location="cpu"))
 said_model.to("cpu")
 said_model.eval()
 
-@app.route('/post-endpoint', methods=['POST'])
-def handle_post():
-
-    data = request.json
-    data = json.loads(data)
-    audio = data["audio"]
-    audio = np.array(audio)
-    audio_fs = data["audio_fs"]
+def predict(audio, audio_fs):
     print("len(audio)/audio_fs", len(audio)/audio_fs)
     t_start = time()
-    waveform = torch.from_numpy(np.squeeze(audio)) 
+    waveform = torch.from_numpy(np.squeeze(audio))
     if audio_fs != said_model.sampling_rate:
         waveform = torchaudio.functional.resample(waveform, audio_fs, said_model.sampling_rate)
 
@@ -87,7 +81,26 @@ def handle_post():
     result = output.result[0, :window_len].cpu().numpy()
     print("Time used for process the audio: ", time() - t_start)
     print("rtf is: ", (time() - t_start)/(len(audio)/audio_fs))
-    
+    return result
+
+
+@app.route('/post-endpoint', methods=['POST'])
+def handle_post():
+    if request.content_type == "application/x-npy":
+        # binary request: float32 audio as .npy body, sample rate in the query
+        audio = np.load(BytesIO(request.get_data()), allow_pickle=False)
+        audio_fs = int(request.args["audio_fs"])
+        result = predict(audio, audio_fs)
+
+        buffer = BytesIO()
+        np.save(buffer, result.astype(np.float32))
+        return Response(buffer.getvalue(), mimetype="application/x-npy")
+
+    data = request.json
+    data = json.loads(data)
+    audio = np.array(data["audio"])
+    audio_fs = data["audio_fs"]
+    result = predict(audio, audio_fs)
     return json.dumps({"arkit_points": result.tolist()})
 
 if __name__ == '__main__':
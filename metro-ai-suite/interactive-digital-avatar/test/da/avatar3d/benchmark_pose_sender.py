@@ -0,0 +1,76 @@
+import json
+import time
+
+import numpy as np
+
+from da import config
+from da.avatar3d.body_pose_selector import idle
+from da.avatar3d.face_data_util import npy_to_face_pose
+from da.avatar3d.pose_frame import PoseDecoder, PoseDeltaEncoder, PoseLayout
+from da.avatar3d.pose_sender import PoseFrames
+from da.util.log import logger
+
+
+class CountingSio:
+    """Stands in for the socket.io client, counts what would be sent and decodes it like the relay."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.relayed_bytes = 0
+        self.decoder = None
+
+    def emit(self, event, data):
+        self.messages += 1
+        if event == "pose_layout":
+            self.bytes += len(json.dumps(data))
+            self.decoder = PoseDecoder(PoseLayout.from_message(data))
+            return
+        self.bytes += sum(len(value) for value in data.values() if isinstance(value, bytes))
+        self.relayed_bytes += len(self.decoder.decode(data))
+
+
+def run(layout: PoseLayout, tolerance: float, speaking_mouth_pose: list, ticks: int) -> str:
+    frames = PoseFrames(layout)
+    encoder = PoseDeltaEncoder(layout, tolerance)
+    sio = CountingSio()
+    sio.emit("pose_layout", layout.to_message())
+
+    messages = []
+    start = time.perf_counter()
+    for tick in range(ticks):
+        mouth = speaking_mouth_pose[tick % len(speaking_mouth_pose)] if speaking_mouth_pose else None
+        # same work as a PoseSender tick
+        message = encoder.encode(frames.next(mouth))
+        if message is not None:
+            messages.append(message)
+    elapsed = time.perf_counter() - start
+
+    for message in messages:
+        sio.emit("pose", message)
+
+    # the sender is paced to pose_sync_fps, bytes per second are at that rate
+    per_sec = config.avatar3d.pose_sync_fps / ticks
+    return (
+        f"{ticks / elapsed:.0f} ticks/s, {sio.messages * per_sec:.1f} messages/s, "
+        f"sent {sio.bytes * per_sec / 1024:.1f} KiB/s, relayed {sio.relayed_bytes * per_sec / 1024:.1f} KiB/s"
+    )
+
+
+def benchmark(ticks: int = 2000):
+    """
+    Frame loop of the PoseSender without pacing nor socket, at idle and while speaking.
+
+    "sent" is what goes to the socket.io relay, "relayed" the json the relay gives the renderer.
+    The ticks/s exclude the relay decoding.
+    """
+    layout = PoseLayout.from_body_pose(idle[0])
+    speaking_mouth_pose = npy_to_face_pose(np.load("resource/avatar3d/speaking_mouth.npy"))
+
+    for tolerance in sorted({0.0, config.avatar3d.pose_delta_tolerance}):
+        logger.info(f"delta tolerance {tolerance}, idle: {run(layout, tolerance, [], ticks)}")
+        logger.info(f"delta tolerance {tolerance}, speaking: {run(layout, tolerance, speaking_mouth_pose, ticks)}")
+
+
+if __name__ == '__main__':
+    benchmark()
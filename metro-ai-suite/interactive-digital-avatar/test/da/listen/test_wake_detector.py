@@ -0,0 +1,146 @@
+import numpy as np
+
+from da import config
+from da.listen.asr_worker import AsrWorker
+from da.listen.wake_detector import EnergyGate
+from da.util.audio_ring import AudioRingBuffer
+
+RATE = 1000  # 16 samples per frame, onset after 100 samples, hangover after 300
+CHUNK = 50
+
+
+def noise(n=CHUNK):
+    return np.full(n, 0.001, dtype=np.float32)  # -60 dB
+
+
+def speech(n=CHUNK):
+    return np.full(n, 0.5, dtype=np.float32)  # -6 dB
+
+
+def make_gate():
+    gate = EnergyGate(RATE, margin_db=10, min_db=-40)
+    assert not gate.update(noise())
+    assert gate.noise_db < -40
+    return gate
+
+
+def test_onset():
+    gate = make_gate()
+    assert not gate.update(speech())
+    assert gate.onset_time is None
+    assert gate.update(speech())
+    assert gate.segment_samples == 2 * CHUNK
+    assert gate.onset_time is not None
+    assert not gate.ended
+
+
+def test_short_burst_does_not_open():
+    gate = make_gate()
+    assert not gate.update(speech())
+    assert not gate.update(noise())
+    # voiced samples were reset by the unvoiced chunk
+    assert not gate.update(speech())
+    assert gate.update(speech())
+
+
+def test_hangover():
+    gate = make_gate()
+    gate.update(speech())
+    gate.update(speech())
+
+    for _ in range(5):
+        assert gate.update(noise())
+        assert not gate.ended
+    assert not gate.update(noise())
+    assert gate.ended
+    assert gate.segment_samples == 2 * CHUNK + 6 * CHUNK
+
+    # ended only holds for the chunk that closed the segment
+    assert not gate.update(noise())
+    assert not gate.ended
+
+
+def test_voiced_chunk_restarts_hangover():
+    gate = make_gate()
+    gate.update(speech())
+    gate.update(speech())
+
+    for _ in range(5):
+        gate.update(noise())
+    assert gate.update(speech())
+    for _ in range(5):
+        assert gate.update(noise())
+    assert not gate.update(noise())
+    assert gate.ended
+
+
+def test_min_db():
+    gate = EnergyGate(RATE, margin_db=10, min_db=-3)
+    gate.update(noise())
+    # well above the noise level but below min_db
+    for _ in range(4):
+        assert not gate.update(speech())
+
+
+def test_reset():
+    gate = make_gate()
+    gate.update(speech())
+    gate.update(speech())
+    gate.reset()
+    assert not gate.active
+    assert gate.onset_time is None
+    assert gate.segment_samples == 0
+    assert not gate.update(speech())
+
+
+def make_worker(monkeypatch, gate: bool):
+    monkeypatch.setattr(config.wake, "gate", gate)
+    # only the state used by wake_candidate, without connecting to the ASR service
+    worker = AsrWorker.__new__(AsrWorker)
+    worker.gate = make_gate()
+    worker.standby_buffer_size = 20 * CHUNK
+    worker.standby_buffer = AudioRingBuffer(worker.standby_buffer_size)
+    worker.min_asr_size = 2
+    worker.chunks_received = 0
+    return worker
+
+
+def feed(worker, chunk):
+    worker.chunks_received += 1
+    worker.standby_buffer.append(chunk)
+    worker.gate.update(chunk)
+    return worker.wake_candidate()
+
+
+def test_wake_candidate_with_gate(monkeypatch):
+    worker = make_worker(monkeypatch, gate=True)
+    assert feed(worker, noise()) is None
+    assert feed(worker, noise()) is None  # interval reached but no speech
+    assert feed(worker, speech()) is None
+    candidate = feed(worker, speech())  # segment opens on an interval chunk
+    np.testing.assert_array_equal(candidate, speech(2 * CHUNK))
+    assert feed(worker, speech()) is None  # between intervals
+
+    for _ in range(5):
+        feed(worker, noise())
+    candidate = feed(worker, noise())  # segment ends, checked whatever the interval
+    assert worker.gate.ended
+    assert len(candidate) == worker.gate.segment_samples == 3 * CHUNK + 6 * CHUNK
+    assert feed(worker, noise()) is None
+
+
+def test_wake_candidate_stops_after_long_segment(monkeypatch):
+    worker = make_worker(monkeypatch, gate=True)
+    candidates = [feed(worker, speech()) for _ in range(24)]
+    checked = [i for i, candidate in enumerate(candidates) if candidate is not None]
+    # checked every 2 chunks from the onset, while the segment fits in the 20 chunk buffer
+    assert checked == list(range(1, 20, 2))
+
+
+def test_wake_candidate_without_gate(monkeypatch):
+    worker = make_worker(monkeypatch, gate=False)
+    assert feed(worker, speech()) is None
+    np.testing.assert_array_equal(feed(worker, speech()), speech(2 * CHUNK))
+    worker.standby_buffer.clear()
+    feed(worker, np.zeros(CHUNK, dtype=np.float32))
+    assert feed(worker, np.zeros(CHUNK, dtype=np.float32)) is None  # silent
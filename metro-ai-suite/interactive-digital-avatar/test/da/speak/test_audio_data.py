@@ -0,0 +1,42 @@
+import os
+from multiprocessing import Queue
+
+import numpy as np
+
+from da.speak.audio_data import AudioData, SharedAudio, release_queued_audio
+
+
+def shm_exists(shared: SharedAudio) -> bool:
+    return os.path.exists(f"/dev/shm/{shared.name.lstrip('/')}")
+
+
+def test_share_load():
+    audio = AudioData(np.linspace(-1, 1, 1600, dtype=np.float32), 16000)
+    shared = audio.share()
+    assert shm_exists(shared)
+
+    loaded = shared.load()
+    assert loaded.sample_rate == 16000
+    np.testing.assert_array_equal(loaded.pcm, audio.pcm)
+    assert not shm_exists(shared)
+
+
+def test_release():
+    shared = AudioData(np.zeros(100, dtype=np.float32), 16000).share()
+    shared.release()
+    assert not shm_exists(shared)
+    # a second release is a no-op
+    shared.release()
+
+
+def test_release_queued_audio():
+    queue = Queue()
+    shared = [AudioData(np.ones(10, dtype=np.float32), 16000).share() for _ in range(3)]
+    queue.put(shared[0])
+    queue.put("resource/test/test_audio.wav")
+    queue.put((shared[1], 4))
+    queue.put((shared[2], 2))
+
+    assert release_queued_audio(queue) == 3
+    assert not any(shm_exists(item) for item in shared)
+    assert queue.empty()
@@ -14,7 +14,8 @@ def test():
         text_input_queue.put("一二三四五，")
 
     for _ in range(3):
-        audio_output_queue.get()
+        audio = audio_output_queue.get().load()
+        assert audio.duration > 0
 
     tts_worker.stop()
 
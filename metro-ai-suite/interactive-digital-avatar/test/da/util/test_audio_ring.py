@@ -0,0 +1,48 @@
+import numpy as np
+
+from da.util.audio_ring import AudioRingBuffer
+
+
+def test_latest_before_full():
+    ring = AudioRingBuffer(4)
+    ring.append(np.array([1, 2], dtype=np.float32))
+    assert len(ring) == 2
+    np.testing.assert_array_equal(ring.latest(), [1, 2])
+    np.testing.assert_array_equal(ring.latest(1), [2])
+    np.testing.assert_array_equal(ring.latest(10), [1, 2])
+
+
+def test_wraparound():
+    ring = AudioRingBuffer(4)
+    ring.append(np.array([1, 2, 3], dtype=np.float32))
+    ring.append(np.array([4, 5, 6], dtype=np.float32))
+    assert len(ring) == 4
+    np.testing.assert_array_equal(ring.latest(), [3, 4, 5, 6])
+
+    # both copies hold the same samples, the latest ones are contiguous in either wrap position
+    np.testing.assert_array_equal(ring._buffer[:4], ring._buffer[4:])
+    for value in range(7, 12):
+        ring.append(np.array([value], dtype=np.float32))
+        np.testing.assert_array_equal(ring.latest(), np.arange(value - 3, value + 1))
+        np.testing.assert_array_equal(ring._buffer[:4], ring._buffer[4:])
+
+
+def test_chunk_longer_than_capacity():
+    ring = AudioRingBuffer(4)
+    ring.append(np.array([1], dtype=np.float32))
+    ring.append(np.arange(2, 12, dtype=np.float32))
+    assert len(ring) == 4
+    np.testing.assert_array_equal(ring.latest(), [8, 9, 10, 11])
+
+
+def test_empty_chunk_and_clear():
+    ring = AudioRingBuffer(4)
+    ring.append(np.array([1, 2, 3], dtype=np.float32))
+    ring.append(np.array([], dtype=np.float32))
+    np.testing.assert_array_equal(ring.latest(), [1, 2, 3])
+
+    ring.clear()
+    assert len(ring) == 0
+    assert len(ring.latest()) == 0
+    ring.append(np.array([4, 5], dtype=np.float32))
+    np.testing.assert_array_equal(ring.latest(), [4, 5])
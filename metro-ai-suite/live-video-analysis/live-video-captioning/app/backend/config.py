@@ -22,6 +22,28 @@ PIPELINE_SERVER_URL = os.environ.get(
 )
 PIPELINE_NAME = os.environ.get("PIPELINE_NAME", "genai_pipeline")
 
+# Pipeline server HTTP client configuration
+HTTP_TIMEOUT_SECONDS = float(os.environ.get("HTTP_TIMEOUT_SECONDS", "30"))
+PIPELINE_START_TIMEOUT_SECONDS = float(os.environ.get("PIPELINE_START_TIMEOUT_SECONDS", "120"))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+HTTP_MAX_CONCURRENCY = int(os.environ.get("HTTP_MAX_CONCURRENCY", "8"))
+# Seconds pipeline and model discovery results are reused before refreshing
+DISCOVERY_CACHE_TTL_SECONDS = float(os.environ.get("DISCOVERY_CACHE_TTL_SECONDS", "30"))
+
+# Metadata SSE stream: frames buffered per client (oldest dropped when full),
+# seconds a client may stay behind before it is disconnected, idle heartbeat
+SSE_CLIENT_BUFFER_SIZE = int(os.environ.get("SSE_CLIENT_BUFFER_SIZE", "256"))
+SSE_CLIENT_EVICT_SECONDS = float(os.environ.get("SSE_CLIENT_EVICT_SECONDS", "10"))
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "1"))
+
+# Metrics websocket relay: seconds of history sent to new dashboards, batches
+# queued per client (oldest dropped when full), per-send timeout, longest update
+# interval a client may subscribe with
+METRICS_HISTORY_SECONDS = float(os.environ.get("METRICS_HISTORY_SECONDS", "60"))
+METRICS_CLIENT_QUEUE_SIZE = int(os.environ.get("METRICS_CLIENT_QUEUE_SIZE", "32"))
+METRICS_SEND_TIMEOUT_SECONDS = float(os.environ.get("METRICS_SEND_TIMEOUT_SECONDS", "5"))
+METRICS_MAX_INTERVAL_SECONDS = float(os.environ.get("METRICS_MAX_INTERVAL_SECONDS", "60"))
+
 BASE_DIR = Path(__file__).parent.parent
 MODELS_DIR = Path(os.environ.get("MODELS_DIR", str(BASE_DIR / "ov_models")))
 DETECTION_MODELS_DIR = Path(os.environ.get("DETECTION_MODELS_DIR", str(BASE_DIR / "ov_detection_models")))
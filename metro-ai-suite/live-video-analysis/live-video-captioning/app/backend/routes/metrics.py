@@ -22,15 +22,19 @@ Telegraf sends metrics as a JSON array directly:
         ...
     ]
 
-We wrap this as {"metrics": [...]} before forwarding to clients.
+We wrap this as {"metrics": [...]} before forwarding to clients. Fan-out,
+client subscriptions and the history window are handled by MetricsRelay.
 """
 
+import asyncio
 import logging
 from asyncio import Lock
-from typing import Optional, Set
+from typing import Optional
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
 
+from ..services.metrics_relay import MetricsRelay
+
 router = APIRouter(tags=["metrics"])
 logger = logging.getLogger("app.metrics")
 
@@ -38,9 +42,8 @@ logger = logging.getLogger("app.metrics")
 collector_ws: Optional[WebSocket] = None
 collector_lock = Lock()
 
-# Set of client websockets
-client_connections: Set[WebSocket] = set()
-clients_lock = Lock()
+# Relay of metric batches to the connected client websockets
+relay = MetricsRelay()
 
 
 @router.websocket("/ws/collector")
@@ -54,7 +57,8 @@ async def collector_websocket(websocket: WebSocket):
     Protocol:
         * Accepts one collector at a time (enforced via lock)
         * Receives JSON metric arrays from Telegraf (text or binary mode)
-        * Wraps as {"metrics": [...]} and broadcasts to /ws/clients
+        * Wraps as {"metrics": [...]} and queues it to /ws/clients without
+          waiting for the clients to receive it
         * Handles disconnection and errors gracefully
         * Releases collector slot on exit
 
@@ -99,39 +103,17 @@ async def collector_websocket(websocket: WebSocket):
             data = await websocket.receive_json(mode="binary")
             logger.debug("Received metrics from collector: %s", data)
 
-            # Telegraf sends an array of metrics directly, wrap it
+            # Telegraf sends an array of metrics directly
             if isinstance(data, list):
-                wrapped_data = {"metrics": data}
+                metrics = data
             elif isinstance(data, dict) and "metrics" in data:
                 # Already wrapped
-                wrapped_data = data
+                metrics = data["metrics"]
             else:
                 # Single metric or unknown format, wrap as array
-                wrapped_data = {"metrics": [data] if isinstance(data, dict) else data}
-
-            # Broadcast to all connected clients
-            disconnects = []
-            async with clients_lock:
-                clients = list(client_connections)
-
-            for client in clients:
-                try:
-                    await client.send_json(wrapped_data, mode="text")
-                    logger.debug("Forwarded metrics to client %s", client.client)
-                except Exception as e:
-                    logger.error(
-                        "Error sending to client %s: %s", client.client, e
-                    )
-                    disconnects.append(client)
-
-            # Cleanup disconnected clients
-            if disconnects:
-                async with clients_lock:
-                    for client in disconnects:
-                        client_connections.discard(client)
-                logger.debug(
-                    "Cleaned up %d disconnected clients", len(disconnects)
-                )
+                metrics = [data]
+
+            relay.publish(metrics)
 
     except WebSocketDisconnect:
         logger.info("Collector disconnected: %s", websocket.client)
@@ -154,8 +136,13 @@ async def clients_websocket(websocket: WebSocket):
 
     Protocol:
         * Accepts unlimited concurrent connections
+        * Sends the metrics of the recent history window on connect
         * Pushes every metric payload from /ws/collector as JSON
-        * Ignores messages sent by clients (only logs them)
+        * Accepts subscription messages to filter by metric name and
+          downsample, see backend.services.metrics_relay; other client
+          messages are ignored (only logged)
+        * Drops the oldest payloads for clients that fall behind, and
+          disconnects clients whose sends time out
         * Handles disconnection and cleanup gracefully
 
     Client Integration:
@@ -166,34 +153,45 @@ async def clients_websocket(websocket: WebSocket):
                 // data.metrics = array of metric objects
                 updateCharts(data.metrics);
             };
+            ws.onopen = () => ws.send(JSON.stringify(
+                {subscribe: ['cpu', 'mem'], interval: 2, aggregate: 'mean'}
+            ));
 
     Message Format (sent to clients):
         Same as collector format - see collector_websocket() docstring.
 
     Error Handling:
-        * Client disconnect → connection removed from set
+        * Client disconnect → connection removed from the relay
+        * Send timeout → connection closed with WS_1008_POLICY_VIOLATION
         * Unexpected exception → logged; connection cleaned up
     """
     await websocket.accept()
     logger.info("Client connected: %s", websocket.client)
 
-    async with clients_lock:
-        client_connections.add(websocket)
-        logger.debug(
-            "Total clients connected: %d", len(client_connections)
-        )
+    client = relay.attach(websocket)
+    sender = asyncio.create_task(relay.send_loop(client))
 
-    try:
+    async def receive_loop():
         while True:
-            # Keep connection alive; ignore client messages
             msg = await websocket.receive_text()
-            logger.debug(
-                "Received message from client %s (ignored): %s",
-                websocket.client,
-                msg[:100],
-            )
+            relay.handle_client_message(client, msg)
+
+    receiver = asyncio.create_task(receive_loop())
+    try:
+        # Runs until the client disconnects or a send fails or times out
+        done, _ = await asyncio.wait(
+            {sender, receiver}, return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in done:
+            task.result()
     except WebSocketDisconnect:
         logger.info("Client disconnected: %s", websocket.client)
+    except asyncio.TimeoutError:
+        logger.warning("Disconnecting slow client %s", websocket.client)
+        try:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        except Exception:
+            pass
     except Exception as e:
         logger.error(
             "Exception in client handler for %s: %s",
@@ -202,11 +200,9 @@ async def clients_websocket(websocket: WebSocket):
             exc_info=True,
         )
     finally:
-        async with clients_lock:
-            client_connections.discard(websocket)
-            logger.debug(
-                "Client removed. Total clients: %d", len(client_connections)
-            )
+        sender.cancel()
+        receiver.cancel()
+        relay.detach(websocket)
 
 
 @router.get("/api/metrics/status")
@@ -223,10 +219,7 @@ async def metrics_status():
     async with collector_lock:
         collector_connected = collector_ws is not None
 
-    async with clients_lock:
-        num_clients = len(client_connections)
-
     return {
         "collector_connected": collector_connected,
-        "clients_connected": num_clients,
+        "clients_connected": relay.client_count,
     }
@@ -10,14 +10,14 @@ router = APIRouter(prefix="/api", tags=["models"])
 
 
 @router.get("/vlm-models", response_model=ModelList)
-async def list_models() -> ModelList:
+async def list_models(refresh: bool = False) -> ModelList:
     """List available VLM models from the models directory."""
-    models = discover_models(MODELS_DIR)
+    models = discover_models(MODELS_DIR, refresh=refresh)
     return ModelList(models=models)
 
 
 @router.get("/detection-models", response_model=ModelList)
-async def list_detection_models() -> ModelList:
+async def list_detection_models(refresh: bool = False) -> ModelList:
     """List available detection models from the detection models directory."""
-    models = discover_detection_models(DETECTION_MODELS_DIR)
+    models = discover_detection_models(DETECTION_MODELS_DIR, refresh=refresh)
     return ModelList(models=models)
\ No newline at end of file
@@ -9,7 +9,10 @@ router = APIRouter(prefix="/api", tags=["pipelines"])
 
 
 @router.get("/pipelines", response_model=PipelineInfoList)
-async def list_pipelines() -> PipelineInfoList:
-    """List available pipelines from the pipeline server, classified and filtered."""
-    items = discover_pipelines_remote()  # List[Dict[str, str]]
+async def list_pipelines(refresh: bool = False) -> PipelineInfoList:
+    """List available pipelines from the pipeline server, classified and filtered.
+
+    Results are cached; pass ``refresh=true`` to query the pipeline server again.
+    """
+    items = await discover_pipelines_remote(refresh=refresh)  # List[Dict[str, str]]
     return PipelineInfoList(pipelines=[PipelineInfo(**it) for it in items])
\ No newline at end of file
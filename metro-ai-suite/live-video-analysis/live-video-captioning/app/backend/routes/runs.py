@@ -1,8 +1,6 @@
 # Copyright (C) 2025 Intel Corporation
 # SPDX-License-Identifier: Apache-2.0
 
-import asyncio
-import json
 import logging
 import re
 import uuid
@@ -16,10 +14,16 @@ from ..config import (
     MQTT_BROKER_PORT,
     MQTT_TOPIC_PREFIX,
     WEBRTC_BITRATE,
+    PIPELINE_START_TIMEOUT_SECONDS,
 )
 from ..models import RunInfo, StartRunRequest
 from ..models.requests import DEFAULT_PROMPT
-from ..services import http_json, get_mqtt_subscriber
+from ..services import (
+    current_broadcaster,
+    get_broadcaster,
+    http_json,
+    invalidate_discovery_cache,
+)
 from ..state import RUNS
 
 router = APIRouter(prefix="/api", tags=["runs"])
@@ -78,7 +82,14 @@ async def start_run(req: StartRunRequest) -> RunInfo:
         },
     }
 
-    raw = http_json("POST", start_url, payload=payload)
+    try:
+        raw = await http_json(
+            "POST", start_url, payload=payload, timeout=PIPELINE_START_TIMEOUT_SECONDS
+        )
+    except HTTPException:
+        # The pipeline may have been removed from the server, rediscover next time
+        invalidate_discovery_cache()
+        raise
     pipeline_id = raw.replace('"', "").strip()
     if not pipeline_id:
         raise HTTPException(
@@ -105,6 +116,9 @@ async def start_run(req: StartRunRequest) -> RunInfo:
         rtspUrl=req.rtspUrl,
     )
     RUNS[info.runId] = info
+    broadcaster = current_broadcaster()
+    if broadcaster:
+        broadcaster.add_run(info.runId)
     return info
 
 
@@ -115,71 +129,17 @@ async def list_runs() -> list[RunInfo]:
 
 
 async def _multiplexed_metadata_generator() -> AsyncGenerator[str, None]:
-    """Generator that receives metadata from MQTT and multiplexes into a single SSE stream."""
-    message_queue: asyncio.Queue = asyncio.Queue()
-    subscribed_runs: set[str] = set()
-    
-    def on_message(run_id: str, data: dict, received_at: float):
-        """Callback for MQTT messages - puts them into the async queue."""
-        try:
-            asyncio.get_event_loop().call_soon_threadsafe(
-                message_queue.put_nowait,
-                (run_id, data, received_at)
-            )
-        except Exception as e:
-            logger.error(f"Error queueing MQTT message: {e}")
-
+    """Generator that streams metadata of all active runs from the shared broadcaster."""
     try:
-        mqtt_subscriber = await get_mqtt_subscriber()
-        
-        while True:
-            try:
-                # Update subscriptions based on current active runs
-                current_runs = set(RUNS.keys())
-                
-                # Subscribe to new runs
-                new_runs = current_runs - subscribed_runs
-                for run_id in new_runs:
-                    mqtt_subscriber.subscribe_to_run(run_id, on_message)
-                    subscribed_runs.add(run_id)
-                    logger.info(f"Subscribed to MQTT topic for run {run_id}")
-                
-                # Unsubscribe from stopped runs
-                stopped_runs = subscribed_runs - current_runs
-                for run_id in stopped_runs:
-                    mqtt_subscriber.unsubscribe_from_run(run_id)
-                    subscribed_runs.discard(run_id)
-                    logger.info(f"Unsubscribed from MQTT topic for run {run_id}")
-                
-                # Process any messages in the queue with a short timeout
-                try:
-                    run_id, data, received_at = await asyncio.wait_for(
-                        message_queue.get(), timeout=1.0
-                    )
-                    
-                    # Wrap the data with runId for client-side demultiplexing
-                    envelope = {
-                        "runId": run_id,
-                        "data": data,
-                        "received_at": received_at,
-                    }
-                    yield f"data: {json.dumps(envelope)}\n\n"
-                    
-                except asyncio.TimeoutError:
-                    # No message received, send heartbeat
-                    yield f": heartbeat\n\n"
-                    
-            except Exception as e:
-                logger.error(f"Error in multiplexed metadata generator: {e}")
-                yield f": error - {e}\n\n"
-                await asyncio.sleep(1)
-                
-    finally:
-        # Cleanup subscriptions when generator is closed
-        mqtt_subscriber = await get_mqtt_subscriber()
-        for run_id in subscribed_runs:
-            mqtt_subscriber.unsubscribe_from_run(run_id)
-        logger.info("Cleaned up MQTT subscriptions")
+        broadcaster = await get_broadcaster()
+    except Exception as e:
+        logger.error(f"Metadata broadcaster unavailable: {e}")
+        yield f": error - {e}\n\n"
+        return
+
+    broadcaster.set_runs(RUNS.keys())
+    async for frame in broadcaster.stream():
+        yield frame
 
 
 @router.get("/runs/metadata-stream")
@@ -219,10 +179,13 @@ async def stop_run(run_id: str) -> dict[str, str]:
     # Try to stop pipeline on backend, but always remove from internal list
     # A failure (502) usually means the pipeline is already stopped
     try:
-        http_json("DELETE", stop_url)
+        await http_json("DELETE", stop_url)
     except HTTPException:
         # Pipeline may already be stopped or unreachable - continue cleanup
         pass
 
     RUNS.pop(run_id, None)
+    broadcaster = current_broadcaster()
+    if broadcaster:
+        broadcaster.remove_run(run_id)
     return {"status": "stopped", "runId": run_id}
@@ -1,6 +1,17 @@
 # Business logic services
-from .discovery import discover_models, discover_detection_models, discover_pipelines_remote
-from .http_client import http_json
+from .discovery import (
+    discover_models,
+    discover_detection_models,
+    discover_pipelines_remote,
+    invalidate_discovery_cache,
+)
+from .broadcaster import (
+    MetadataBroadcaster,
+    current_broadcaster,
+    get_broadcaster,
+    shutdown_broadcaster,
+)
+from .http_client import http_json, get_http_client, shutdown_http_client
 from .mqtt_subscriber import (
     MQTTSubscriber,
     get_mqtt_subscriber,
@@ -11,7 +22,14 @@ __all__ = [
     "discover_models",
     "discover_detection_models",
     "discover_pipelines_remote",
+    "invalidate_discovery_cache",
     "http_json",
+    "get_http_client",
+    "shutdown_http_client",
+    "MetadataBroadcaster",
+    "current_broadcaster",
+    "get_broadcaster",
+    "shutdown_broadcaster",
     "MQTTSubscriber",
     "get_mqtt_subscriber",
     "shutdown_mqtt_subscriber",
@@ -0,0 +1,208 @@
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Fan-out of run metadata to the SSE clients of /api/runs/metadata-stream.
+
+The broadcaster holds one MQTT subscription per active run, no matter how many
+clients are connected. Each message is decoded once by the MQTT subscriber and
+serialized to an SSE frame once here, then the same frame is pushed to a
+bounded ring buffer per client. A client that does not keep up loses its
+oldest frames, and is disconnected when it stays behind for too long so it
+cannot hold memory or slow down the other clients.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import AsyncGenerator, Iterable, Optional
+
+from ..config import (
+    SSE_CLIENT_BUFFER_SIZE,
+    SSE_CLIENT_EVICT_SECONDS,
+    SSE_HEARTBEAT_SECONDS,
+)
+from .mqtt_subscriber import MQTTSubscriber, get_mqtt_subscriber
+
+logger = logging.getLogger("app.broadcaster")
+
+HEARTBEAT_FRAME = ": heartbeat\n\n"
+
+
+class StreamClient:
+    """
+    A connected SSE client with a bounded, drop-oldest buffer of frames.
+    """
+
+    def __init__(self, client_id: int, buffer_size: int):
+        self.client_id = client_id
+        self._frames: deque[str] = deque(maxlen=buffer_size)
+        self._ready = asyncio.Event()
+        self.dropped = 0
+        self.closed = False
+        # Since when the buffer has been full without being drained
+        self.behind_since: Optional[float] = None
+
+    def push(self, frame: str, now: float):
+        if len(self._frames) == self._frames.maxlen:
+            # deque drops the oldest frame on append
+            self.dropped += 1
+            if self.behind_since is None:
+                self.behind_since = now
+        self._frames.append(frame)
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def frames(self, heartbeat: float) -> AsyncGenerator[str, None]:
+        """Yield buffered frames, or a heartbeat when idle, until closed."""
+        while not self.closed:
+            if not self._frames:
+                self._ready.clear()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT_FRAME
+                    continue
+            while self._frames and not self.closed:
+                yield self._frames.popleft()
+            self.behind_since = None
+
+
+class MetadataBroadcaster:
+    """
+    Single consumer of run metadata from MQTT, fanning out to SSE clients.
+    """
+
+    def __init__(
+        self,
+        mqtt_subscriber: MQTTSubscriber,
+        buffer_size: int = SSE_CLIENT_BUFFER_SIZE,
+        evict_after: float = SSE_CLIENT_EVICT_SECONDS,
+        heartbeat: float = SSE_HEARTBEAT_SECONDS,
+    ):
+        self._mqtt = mqtt_subscriber
+        self.buffer_size = buffer_size
+        self.evict_after = evict_after
+        self.heartbeat = heartbeat
+        self._clients: dict[int, StreamClient] = {}
+        self._next_client_id = 0
+        self._runs: set[str] = set()
+        self._subscribed: set[str] = set()
+
+    # Runs
+
+    def set_runs(self, run_ids: Iterable[str]):
+        """Replace the set of active runs."""
+        self._runs = set(run_ids)
+        self._sync_subscriptions()
+
+    def add_run(self, run_id: str):
+        self._runs.add(run_id)
+        self._sync_subscriptions()
+
+    def remove_run(self, run_id: str):
+        self._runs.discard(run_id)
+        self._sync_subscriptions()
+
+    def _sync_subscriptions(self):
+        # Only listen to the broker while somebody is watching
+        wanted = self._runs if self._clients else set()
+        for run_id in wanted - self._subscribed:
+            self._mqtt.subscribe_to_run(run_id, self._on_message)
+            self._subscribed.add(run_id)
+            logger.info(f"Broadcasting metadata for run {run_id}")
+        for run_id in self._subscribed - wanted:
+            self._mqtt.unsubscribe_from_run(run_id, self._on_message)
+            self._subscribed.discard(run_id)
+            logger.info(f"Stopped broadcasting metadata for run {run_id}")
+
+    # Clients
+
+    def attach(self) -> StreamClient:
+        client = StreamClient(self._next_client_id, self.buffer_size)
+        self._next_client_id += 1
+        self._clients[client.client_id] = client
+        logger.info(f"SSE client {client.client_id} attached ({len(self._clients)} total)")
+        self._sync_subscriptions()
+        return client
+
+    def detach(self, client: StreamClient):
+        client.close()
+        if self._clients.pop(client.client_id, None) is not None:
+            logger.info(
+                f"SSE client {client.client_id} detached "
+                f"({client.dropped} frames dropped, {len(self._clients)} remaining)"
+            )
+        self._sync_subscriptions()
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    async def stream(self) -> AsyncGenerator[str, None]:
+        """SSE generator for one client."""
+        client = self.attach()
+        try:
+            async for frame in client.frames(self.heartbeat):
+                yield frame
+        finally:
+            self.detach(client)
+
+    # Messages
+
+    def _on_message(self, run_id: str, data: dict, received_at: float):
+        """Serialize a message once and push it to every client."""
+        # Wrap the data with runId for client-side demultiplexing
+        envelope = {
+            "runId": run_id,
+            "data": data,
+            "received_at": received_at,
+        }
+        self.publish(f"data: {json.dumps(envelope)}\n\n")
+
+    def publish(self, frame: str):
+        now = time.monotonic()
+        for client in list(self._clients.values()):
+            client.push(frame, now)
+            if client.behind_since is not None and now - client.behind_since > self.evict_after:
+                logger.warning(
+                    f"Evicting slow SSE client {client.client_id} "
+                    f"({client.dropped} frames dropped)"
+                )
+                self.detach(client)
+
+    def close(self):
+        for client in list(self._clients.values()):
+            self.detach(client)
+
+
+# Global broadcaster instance
+_broadcaster: Optional[MetadataBroadcaster] = None
+
+
+async def get_broadcaster() -> MetadataBroadcaster:
+    """Get or create the global metadata broadcaster."""
+    global _broadcaster
+
+    if _broadcaster is None:
+        _broadcaster = MetadataBroadcaster(await get_mqtt_subscriber())
+    return _broadcaster
+
+
+def current_broadcaster() -> Optional[MetadataBroadcaster]:
+    """Return the global broadcaster if one has been created."""
+    return _broadcaster
+
+
+def shutdown_broadcaster():
+    """Disconnect all SSE clients and drop the global broadcaster."""
+    global _broadcaster
+
+    if _broadcaster is not None:
+        _broadcaster.close()
+        _broadcaster = None
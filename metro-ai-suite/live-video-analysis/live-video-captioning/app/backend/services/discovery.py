@@ -1,12 +1,56 @@
+import asyncio
 import json
+import time
 from pathlib import Path
-from typing import List, Dict
-from ..config import PIPELINE_NAME, PIPELINE_SERVER_URL, ENABLE_DETECTION_PIPELINE
+from typing import Any, Callable, List, Dict
+from ..config import (
+    DISCOVERY_CACHE_TTL_SECONDS,
+    PIPELINE_NAME,
+    PIPELINE_SERVER_URL,
+    ENABLE_DETECTION_PIPELINE,
+)
 from .http_client import http_json
 
+# Discovery results: key -> (expiry time, value)
+_discovery_cache: Dict[Any, tuple[float, Any]] = {}
+_pipelines_lock = asyncio.Lock()
 
-def discover_models(root: Path) -> List[str]:
+
+def _cache_get(key: Any) -> Any:
+    entry = _discovery_cache.get(key)
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1]
+
+
+def _cache_put(key: Any, value: Any) -> Any:
+    _discovery_cache[key] = (time.monotonic() + DISCOVERY_CACHE_TTL_SECONDS, value)
+    return value
+
+
+def _cached(key: Any, loader: Callable[[], Any], refresh: bool) -> Any:
+    value = None if refresh else _cache_get(key)
+    if value is None:
+        value = _cache_put(key, loader())
+    return value
+
+
+def invalidate_discovery_cache() -> None:
+    """Drop all cached model and pipeline discovery results."""
+    _discovery_cache.clear()
+
+
+def discover_models(root: Path, refresh: bool = False) -> List[str]:
     """Discover available models from the models directory."""
+    return list(_cached(("models", str(root)), lambda: _scan_models(root), refresh))
+
+
+def discover_detection_models(root: Path, refresh: bool = False) -> List[str]:
+    """Discover available detection models from the detection models directory."""
+    return list(_cached(("detection_models", str(root)), lambda: _scan_detection_models(root), refresh))
+
+
+def _scan_models(root: Path) -> List[str]:
     if not root.exists():
         return []
     models: List[str] = []
@@ -22,8 +66,7 @@ def discover_models(root: Path) -> List[str]:
     return models
 
 
-def discover_detection_models(root: Path) -> List[str]:
-    """Discover available detection models from the detection models directory."""
+def _scan_detection_models(root: Path) -> List[str]:
     if not root.exists():
         return []
     models: List[str] = []
@@ -60,7 +103,7 @@ def is_detection_pipeline(item: dict) -> bool:
 
 
 
-def discover_pipelines_remote() -> List[Dict[str, str]]:
+async def discover_pipelines_remote(refresh: bool = False) -> List[Dict[str, str]]:
     """
     Discover available pipelines from the pipeline server and return a List of dicts:
     {
@@ -73,73 +116,83 @@ def discover_pipelines_remote() -> List[Dict[str, str]]:
     - Classifies using is_detection_pipeline(item) when item is a dict
     - Defaults string-only items to 'non-detection' (no metadata to inspect)
     - Optionally filters out detection pipelines when ENABLE_DETECTION_PIPELINE is False
+    - Caches successful results for DISCOVERY_CACHE_TTL_SECONDS; the fallback is never cached
     """
-    url = f"{PIPELINE_SERVER_URL.rstrip('/')}/pipelines"
-    try:
-        raw = http_json("GET", url)
-        payload = json.loads(raw)
-
-        # Normalize to a List of items
-        if isinstance(payload, List):
-            items = payload
-        elif isinstance(payload, dict):
-            items = payload.get("pipelines") or payload.get("items") or []
-        else:
-            items = []
-
-        if not isinstance(items, List):
-            # Fallback to a single default pipeline
-            results = [{
+    key = ("pipelines", PIPELINE_SERVER_URL)
+    async with _pipelines_lock:
+        cached = None if refresh else _cache_get(key)
+        if cached is not None:
+            return [dict(item) for item in cached]
+        url = f"{PIPELINE_SERVER_URL.rstrip('/')}/pipelines"
+        try:
+            payload = json.loads(await http_json("GET", url))
+            results = _classify_pipelines(payload)
+        except Exception:
+            # Conservative fallback
+            return [{
                 "pipeline_name": PIPELINE_NAME,
                 "pipeline_type": "non-detection"
             }]
-            # Optional filtering: if detection were disabled, 'non-detection' remains
-            return results
-
-        results: List[Dict[str, str]] = []
-
-        for item in items:
-            # Determine pipeline name
-            if isinstance(item, str):
-                name = item
-                pipeline_type = "non-detection"  # No metadata available
-            elif isinstance(item, dict):
-                # Preserve your original preference for 'version' as name
-                if isinstance(item.get("version"), str):
-                    name = item["version"]
-                elif isinstance(item.get("name"), str):
-                    name = item["name"]
-                elif isinstance(item.get("id"), str):
-                    name = item["id"]
-                else:
-                    # No usable identifier
-                    continue
-
-                pipeline_type = "detection" if is_detection_pipeline(item) else "non-detection"
+        _cache_put(key, results)
+        return [dict(item) for item in results]
+
+
+def _classify_pipelines(payload: Any) -> List[Dict[str, str]]:
+    """Normalize and classify the pipeline server listing."""
+    # Normalize to a List of items
+    if isinstance(payload, List):
+        items = payload
+    elif isinstance(payload, dict):
+        items = payload.get("pipelines") or payload.get("items") or []
+    else:
+        items = []
+
+    if not isinstance(items, List):
+        # Fallback to a single default pipeline
+        results = [{
+            "pipeline_name": PIPELINE_NAME,
+            "pipeline_type": "non-detection"
+        }]
+        # Optional filtering: if detection were disabled, 'non-detection' remains
+        return results
+
+    results: List[Dict[str, str]] = []
+
+    for item in items:
+        # Determine pipeline name
+        if isinstance(item, str):
+            name = item
+            pipeline_type = "non-detection"  # No metadata available
+        elif isinstance(item, dict):
+            # Preserve your original preference for 'version' as name
+            if isinstance(item.get("version"), str):
+                name = item["version"]
+            elif isinstance(item.get("name"), str):
+                name = item["name"]
+            elif isinstance(item.get("id"), str):
+                name = item["id"]
             else:
+                # No usable identifier
                 continue
 
-            results.append({
-                "pipeline_name": name,
-                "pipeline_type": pipeline_type
-            })
-
-        # Optional filtering based on your existing flag
-        if not ENABLE_DETECTION_PIPELINE:
-            results = [r for r in results if r["pipeline_type"] != "detection"]
+            pipeline_type = "detection" if is_detection_pipeline(item) else "non-detection"
+        else:
+            continue
 
-        # Fallback if nothing usable left
-        if not results:
-            return [{
-                "pipeline_name": PIPELINE_NAME,
-                "pipeline_type": "non-detection"
-            }]
+        results.append({
+            "pipeline_name": name,
+            "pipeline_type": pipeline_type
+        })
 
-        return results
+    # Optional filtering based on your existing flag
+    if not ENABLE_DETECTION_PIPELINE:
+        results = [r for r in results if r["pipeline_type"] != "detection"]
 
-    except Exception:
-        # Conservative fallback
+    # Fallback if nothing usable left
+    if not results:
         return [{
             "pipeline_name": PIPELINE_NAME,
             "pipeline_type": "non-detection"
         }]
+
+    return results
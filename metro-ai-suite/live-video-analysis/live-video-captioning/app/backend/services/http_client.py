@@ -1,41 +1,143 @@
-import json
+"""
+Async, pooled HTTP client for calls to the pipeline server.
+
+A single httpx.AsyncClient is shared by all routes so connections are reused,
+and calls never block the event loop that also serves the SSE metadata streams
+and the metrics websockets.
+"""
+
+import asyncio
+import logging
 from typing import Any, Optional
-from urllib import request as urllib_request
-from urllib.error import HTTPError, URLError
 
+import httpx
 from fastapi import HTTPException
 
+from ..config import HTTP_MAX_CONCURRENCY, HTTP_RETRIES, HTTP_TIMEOUT_SECONDS
 
-def http_json(method: str, url: str, payload: Optional[dict[str, Any]] = None) -> str:
-    """Make an HTTP request with JSON payload and return response text."""
-    headers = {
-        "Accept": "application/json",
-    }
-    data = None
-    if payload is not None:
-        body = json.dumps(payload).encode("utf-8")
-        data = body
-        headers["Content-Type"] = "application/json"
-    req = urllib_request.Request(url=url, data=data, headers=headers, method=method)
-    try:
-        with urllib_request.urlopen(req, timeout=120) as resp:
-            return resp.read().decode("utf-8")
-    except HTTPError as err:
-        details = None
-        try:
-            details = err.read().decode("utf-8")
-        except Exception:
-            details = None
-        raise HTTPException(
-            status_code=502,
-            detail={
-                "message": "Pipeline server error",
-                "status": err.code,
-                "body": details,
-            },
-        )
-    except URLError as err:
-        raise HTTPException(
-            status_code=502,
-            detail={"message": "Pipeline server unreachable", "error": str(err)},
+logger = logging.getLogger("app.http_client")
+
+# Methods that are safe to send again after a failed attempt
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+
+
+class PipelineHttpClient:
+    """
+    Pooled HTTP client with per-call timeouts, retries and a concurrency limit.
+    """
+
+    def __init__(
+        self,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        retries: int = HTTP_RETRIES,
+        max_concurrency: int = HTTP_MAX_CONCURRENCY,
+        backoff: float = 0.5,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            headers={"Accept": "application/json"},
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
         )
+
+    def _should_retry(self, method: str, error: Exception) -> bool:
+        # A request that never reached the server can always be sent again
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True
+        if method not in IDEMPOTENT_METHODS:
+            return False
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        payload: Optional[dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+    ) -> str:
+        """Make an HTTP request with JSON payload and return response text."""
+        method = method.upper()
+        retries = self.retries if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    resp = await self._client.request(
+                        method,
+                        url,
+                        json=payload,
+                        timeout=self.timeout if timeout is None else timeout,
+                    )
+                resp.raise_for_status()
+                return resp.text
+            except (httpx.HTTPStatusError, httpx.TransportError) as err:
+                if attempt < retries and self._should_retry(method, err):
+                    attempt += 1
+                    delay = self.backoff * (2 ** (attempt - 1))
+                    logger.warning(
+                        "%s %s failed (%s), retry %d/%d in %.1fs",
+                        method, url, err, attempt, retries, delay,
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                if isinstance(err, httpx.HTTPStatusError):
+                    raise HTTPException(
+                        status_code=502,
+                        detail={
+                            "message": "Pipeline server error",
+                            "status": err.response.status_code,
+                            "body": err.response.text or None,
+                        },
+                    )
+                raise HTTPException(
+                    status_code=502,
+                    detail={"message": "Pipeline server unreachable", "error": str(err)},
+                )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+# Global HTTP client instance
+_http_client: Optional[PipelineHttpClient] = None
+
+
+def get_http_client() -> PipelineHttpClient:
+    """Get or create the global HTTP client instance."""
+    global _http_client
+
+    if _http_client is None:
+        _http_client = PipelineHttpClient()
+    return _http_client
+
+
+async def shutdown_http_client():
+    """Close the global HTTP client and its pooled connections."""
+    global _http_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def http_json(
+    method: str,
+    url: str,
+    payload: Optional[dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+) -> str:
+    """Make an HTTP request with JSON payload and return response text."""
+    return await get_http_client().request(
+        method, url, payload=payload, timeout=timeout, retries=retries
+    )
+
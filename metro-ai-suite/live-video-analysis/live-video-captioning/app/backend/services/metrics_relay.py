@@ -0,0 +1,276 @@
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Fan-out of collector metric batches to dashboard websocket clients.
+
+Each batch received from the collector is serialized once per distinct client
+subscription and queued to every client without waiting for any of them. A
+sender task per client drains its bounded queue with a send timeout, so a slow
+dashboard only loses its own oldest batches and cannot delay the other clients
+or the collector. Recent batches are kept for a short window so a newly
+connected dashboard can draw the recent curve immediately.
+
+Clients may narrow their stream by sending a subscription message:
+    {"subscribe": ["cpu", "mem"], "interval": 2, "aggregate": "mean"}
+
+* subscribe: metric names to receive (omit or null for all metrics)
+* interval: seconds between updates, at most METRICS_MAX_INTERVAL_SECONDS;
+  metrics received in between are merged into one update per series (name
+  and tags)
+* aggregate: "last" (default) keeps the latest sample of each series,
+  "mean" averages the numeric fields of the merged samples
+
+The history is sent when a client connects, and for the metrics a
+subscription adds, so a client never receives the same history twice.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Optional
+
+from fastapi import WebSocket
+
+from ..config import (
+    METRICS_CLIENT_QUEUE_SIZE,
+    METRICS_HISTORY_SECONDS,
+    METRICS_MAX_INTERVAL_SECONDS,
+    METRICS_SEND_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger("app.metrics_relay")
+
+AGGREGATES = ("last", "mean")
+
+
+def _series_key(metric: dict) -> tuple:
+    tags = metric.get("tags") or {}
+    return (metric.get("name"), tuple(sorted(tags.items())))
+
+
+class SeriesMerger:
+    """
+    Running merge of metric samples, one entry per series (name and tags).
+
+    Samples are merged as they are added, so the memory used is bounded by the
+    number of series, whatever the number of samples. "last" keeps the latest
+    sample, "mean" averages numeric fields and keeps the latest value of the
+    other fields.
+    """
+
+    def __init__(self, aggregate: str = "last"):
+        self.aggregate = aggregate
+        self._merged: dict[tuple, dict] = {}
+        self._counts: dict[tuple, dict[str, int]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._merged)
+
+    def add(self, metric: dict):
+        key = _series_key(metric)
+        current = self._merged.get(key)
+        if current is None or self.aggregate != "mean":
+            self._merged[key] = {**metric, "fields": dict(metric.get("fields") or {})}
+            self._counts[key] = {name: 1 for name in self._merged[key]["fields"]}
+            return
+        fields = current["fields"]
+        field_counts = self._counts[key]
+        for name, value in (metric.get("fields") or {}).items():
+            previous = fields.get(name)
+            numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+            if numeric and isinstance(previous, (int, float)) and not isinstance(previous, bool):
+                n = field_counts.get(name, 1)
+                fields[name] = previous + (value - previous) / (n + 1)
+                field_counts[name] = n + 1
+            else:
+                fields[name] = value
+                field_counts[name] = 1
+        current["timestamp"] = metric.get("timestamp", current.get("timestamp"))
+
+    def result(self) -> list[dict]:
+        return list(self._merged.values())
+
+
+class MetricsClient:
+    """
+    A dashboard connection with its subscription and bounded send queue.
+    """
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.names: Optional[frozenset[str]] = None
+        self.interval = 0.0
+        self.aggregate = "last"
+        self.dropped = 0
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        # Metrics waiting for the next downsampled update, merged per series
+        self._pending = SeriesMerger()
+        self._last_flush = 0.0
+
+    @property
+    def downsampled(self) -> bool:
+        return self.interval > 0
+
+    def wants(self, metric: dict) -> bool:
+        return self.names is None or metric.get("name") in self.names
+
+    def subscribe(self, message: dict[str, Any]):
+        """Apply a subscription message sent by the client."""
+        names = message.get("subscribe")
+        self.names = frozenset(names) if names else None
+        self.interval = min(
+            max(float(message.get("interval") or 0.0), 0.0), METRICS_MAX_INTERVAL_SECONDS
+        )
+        aggregate = message.get("aggregate") or "last"
+        self.aggregate = aggregate if aggregate in AGGREGATES else "last"
+        self._pending = SeriesMerger(self.aggregate)
+
+    def enqueue(self, text: str):
+        """Queue a serialized message, dropping the oldest one when full."""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(text)
+
+    def add_pending(self, metrics: list[dict], now: float) -> Optional[str]:
+        """
+        Buffer metrics for a downsampled client and return the serialized
+        update once the client's interval has elapsed.
+        """
+        for metric in metrics:
+            if self.wants(metric):
+                self._pending.add(metric)
+        if not self._pending or now - self._last_flush < self.interval:
+            return None
+        merged = self._pending.result()
+        self._pending = SeriesMerger(self.aggregate)
+        self._last_flush = now
+        return json.dumps({"metrics": merged})
+
+    async def next_message(self) -> str:
+        return await self._queue.get()
+
+
+class MetricsRelay:
+    """
+    Non-blocking relay of collector batches to dashboard clients.
+    """
+
+    def __init__(
+        self,
+        history_seconds: float = METRICS_HISTORY_SECONDS,
+        queue_size: int = METRICS_CLIENT_QUEUE_SIZE,
+        send_timeout: float = METRICS_SEND_TIMEOUT_SECONDS,
+    ):
+        self.history_seconds = history_seconds
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self._clients: dict[WebSocket, MetricsClient] = {}
+        # (received_at, metrics) batches within the history window
+        self._history: deque[tuple[float, list[dict]]] = deque()
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    # History
+
+    def _trim_history(self, now: float):
+        while self._history and now - self._history[0][0] > self.history_seconds:
+            self._history.popleft()
+
+    def history(self, client: Optional[MetricsClient] = None) -> list[dict]:
+        self._trim_history(time.monotonic())
+        metrics = [m for _, batch in self._history for m in batch]
+        if client is not None:
+            metrics = [m for m in metrics if client.wants(m)]
+        return metrics
+
+    def send_history(self, client: MetricsClient, exclude: frozenset[str] = frozenset()):
+        """Queue the history the client subscribes to, except the metrics in exclude."""
+        metrics = [m for m in self.history(client) if m.get("name") not in exclude]
+        if metrics:
+            client.enqueue(json.dumps({"metrics": metrics, "history": True}))
+
+    # Clients
+
+    def attach(self, websocket: WebSocket) -> MetricsClient:
+        client = MetricsClient(websocket, self.queue_size)
+        self._clients[websocket] = client
+        self.send_history(client)
+        logger.debug("Total clients connected: %d", len(self._clients))
+        return client
+
+    def detach(self, websocket: WebSocket):
+        client = self._clients.pop(websocket, None)
+        if client is not None and client.dropped:
+            logger.info(
+                "Client %s dropped %d metric batches", websocket.client, client.dropped
+            )
+        logger.debug("Client removed. Total clients: %d", len(self._clients))
+
+    def handle_client_message(self, client: MetricsClient, text: str):
+        """Apply a subscription message; anything else is ignored."""
+        try:
+            message = json.loads(text)
+        except json.JSONDecodeError:
+            message = None
+        if not isinstance(message, dict) or not (
+            {"subscribe", "interval", "aggregate"} & message.keys()
+        ):
+            logger.debug(
+                "Received message from client %s (ignored): %s",
+                client.websocket.client,
+                text[:100],
+            )
+            return
+        previous = client.names
+        try:
+            client.subscribe(message)
+        except (TypeError, ValueError) as e:
+            logger.warning("Invalid subscription from %s: %s", client.websocket.client, e)
+            return
+        logger.info(
+            "Client %s subscribed to %s every %.1fs (%s)",
+            client.websocket.client,
+            sorted(client.names) if client.names else "all metrics",
+            client.interval,
+            client.aggregate,
+        )
+        # The client already has the history of the metrics it received so far,
+        # with all metrics it has all the history
+        if previous is not None:
+            self.send_history(client, exclude=previous)
+
+    async def send_loop(self, client: MetricsClient):
+        """Send queued messages to one client until it fails or times out."""
+        while True:
+            text = await client.next_message()
+            await asyncio.wait_for(
+                client.websocket.send_text(text), timeout=self.send_timeout
+            )
+
+    # Batches
+
+    def publish(self, metrics: list[dict]):
+        """Queue a collector batch to every client without blocking."""
+        now = time.monotonic()
+        self._history.append((now, metrics))
+        self._trim_history(now)
+
+        # Serialize once per distinct subscription
+        serialized: dict[Optional[frozenset[str]], Optional[str]] = {}
+        for client in list(self._clients.values()):
+            if client.downsampled:
+                text = client.add_pending(metrics, now)
+            else:
+                key = client.names
+                if key not in serialized:
+                    selected = metrics if key is None else [m for m in metrics if m.get("name") in key]
+                    serialized[key] = json.dumps({"metrics": selected}) if selected else None
+                text = serialized[key]
+            if text is not None:
+                client.enqueue(text)
@@ -126,7 +126,10 @@ class MQTTSubscriber:
     def subscribe_to_run(self, run_id: str, callback: Callable[[str, dict, float], None]):
         """
         Subscribe to metadata for a specific run.
-        
+
+        Subscriptions are reference counted: the broker topic is subscribed
+        with the first callback and unsubscribed when the last one is removed.
+
         Args:
             run_id: The run identifier
             callback: Function to call with (run_id, data, received_at) when message arrives
@@ -142,15 +145,39 @@ class MQTTSubscriber:
         self._callbacks[topic].append(callback)
         logger.info(f"Registered callback for run {run_id}")
 
-    def unsubscribe_from_run(self, run_id: str):
-        """Unsubscribe from metadata for a specific run."""
+    def unsubscribe_from_run(
+        self, run_id: str, callback: Optional[Callable[[str, dict, float], None]] = None
+    ):
+        """
+        Unsubscribe from metadata for a specific run.
+
+        Args:
+            run_id: The run identifier
+            callback: The callback to remove. Other callbacks for the run are
+                kept. When omitted, all callbacks for the run are removed.
+        """
         topic = self._get_topic_for_run(run_id)
-        
-        if topic in self._callbacks:
-            del self._callbacks[topic]
-            if self._client and self._connected:
-                self._client.unsubscribe(topic)
-                logger.info(f"Unsubscribed from topic: {topic}")
+        callbacks = self._callbacks.get(topic)
+        if callbacks is None:
+            return
+
+        if callback is not None:
+            try:
+                callbacks.remove(callback)
+            except ValueError:
+                return
+            if callbacks:
+                logger.info(f"Removed callback for run {run_id}, {len(callbacks)} remaining")
+                return
+
+        del self._callbacks[topic]
+        if self._client and self._connected:
+            self._client.unsubscribe(topic)
+            logger.info(f"Unsubscribed from topic: {topic}")
+
+    def subscriber_count(self, run_id: str) -> int:
+        """Number of callbacks registered for a run."""
+        return len(self._callbacks.get(self._get_topic_for_run(run_id), []))
 
     async def process_messages(self):
         """
@@ -181,7 +208,7 @@ class MQTTSubscriber:
                 run_id = parts[-1] if len(parts) > 1 else topic
                 
                 # Dispatch to callbacks
-                callbacks = self._callbacks.get(topic, [])
+                callbacks = list(self._callbacks.get(topic, []))
                 for callback in callbacks:
                     try:
                         callback(run_id, data, received_at)
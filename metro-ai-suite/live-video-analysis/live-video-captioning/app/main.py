@@ -15,7 +15,12 @@ from backend.routes import (
     runs_router,
     health_router,
 )
-from backend.services import get_mqtt_subscriber, shutdown_mqtt_subscriber
+from backend.services import (
+    get_mqtt_subscriber,
+    shutdown_broadcaster,
+    shutdown_http_client,
+    shutdown_mqtt_subscriber,
+)
 
 
 @asynccontextmanager
@@ -30,8 +35,10 @@ async def lifespan(app: FastAPI):
     
     yield
     
-    # Shutdown: Clean up MQTT subscriber
+    # Shutdown: Close metadata streams, MQTT subscriber and pooled HTTP connections
+    shutdown_broadcaster()
     await shutdown_mqtt_subscriber()
+    await shutdown_http_client()
 
 
 app = FastAPI(title="Live Video Captioning API", lifespan=lifespan)
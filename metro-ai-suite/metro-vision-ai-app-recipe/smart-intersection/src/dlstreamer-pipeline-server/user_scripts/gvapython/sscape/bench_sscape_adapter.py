@@ -0,0 +1,130 @@
+# Copyright (C) 2024 Intel Corporation
+#
+# This software and the related documents are Intel copyrighted materials,
+# and your use of them is governed by the express license under which they
+# were provided to you ("License"). Unless the License provides otherwise,
+# you may not use, modify, copy, publish, distribute, disclose or transmit
+# this software or the related documents without Intel's prior written permission.
+#
+# This software and the related documents are provided as is, with no express
+# or implied warranties, other than those that are expressly stated in the License.
+
+# Replays recorded gva metadata through the per-frame work of the SceneScape adapter
+# and reports the time spent per frame, without MQTT nor a pipeline.
+#
+# Record metadata by adding "record_metadata": "/path/metadata.jsonl" to the
+# camera_config of the pipeline, then run inside the pipeline server container:
+#   python3 bench_sscape_adapter.py /path/metadata.jsonl
+# Without a recording, synthetic frames are generated.
+
+import argparse
+import json
+import random
+import time
+
+from sscape_adapter import PostDecodeTimestampCapture, PostInferenceDataPublish, TimestampFormatter
+
+class NullClient:
+  def __init__(self):
+    self.published = 0
+
+  def is_connected(self):
+    return True
+
+  def publish(self, topic, payload):
+    self.published += len(payload)
+    return
+
+class ReplayFrame:
+  def __init__(self):
+    self.messages = 0
+
+  def add_message(self, message):
+    self.messages += 1
+    return
+
+class ReplayDataPublish(PostInferenceDataPublish):
+  def setupMQTT(self):
+    self.client = NullClient()
+    return
+
+def syntheticMetadata(count, objects):
+  formatter = TimestampFormatter()
+  frames = []
+  for _ in range(count):
+    detections = []
+    for _ in range(objects):
+      xmin, ymin = random.random() * 0.8, random.random() * 0.8
+      xmax, ymax = xmin + 0.1, ymin + 0.2
+      detections.append({
+        'x': int(xmin * 1920), 'y': int(ymin * 1080), 'w': 192, 'h': 216,
+        'detection': {
+          'label': random.choice(('person', 'vehicle', 'bicycle')),
+          'confidence': random.random(),
+          'bounding_box': {'x_min': xmin, 'y_min': ymin, 'x_max': xmax, 'y_max': ymax}
+        },
+        # reid vector for reidPolicy
+        'tensors': [{}, {'data': [random.random() for _ in range(256)]}]
+      })
+    now = time.time()
+    frames.append({
+      'postdecode_timestamp': formatter.format(now),
+      'timestamp_for_next_block': now,
+      'fps': 15.0,
+      'resolution': {'width': 1920, 'height': 1080},
+      'objects': detections
+    })
+  return frames
+
+def loadMetadata(path):
+  with open(path) as f:
+    return [json.loads(line) for line in f if line.strip()]
+
+def bench(frames, repeat, policy):
+  capture = PostDecodeTimestampCapture()
+  publisher = ReplayDataPublish('bench', policy)
+  frame = ReplayFrame()
+
+  start = time.perf_counter()
+  for _ in range(repeat):
+    for _ in frames:
+      capture.processFrame(frame)
+  captureTime = time.perf_counter() - start
+
+  buildTime = publishTime = 0
+  for _ in range(repeat):
+    for gvametadata in frames:
+      start = time.perf_counter()
+      publisher.buildObjData(gvametadata)
+      built = time.perf_counter()
+      publisher.publishObjData(frame)
+      buildTime += built - start
+      publishTime += time.perf_counter() - built
+
+  count = len(frames) * repeat
+  objects = sum(len(gvametadata.get('objects', [])) for gvametadata in frames) / len(frames)
+  print(f"{count} frames, {objects:.1f} objects/frame, {publisher.client.published / count:.0f} bytes/frame")
+  print(f"timestamp capture {captureTime / count * 1e6:8.1f} us/frame")
+  print(f"build objects     {buildTime / count * 1e6:8.1f} us/frame")
+  print(f"serialize+publish {publishTime / count * 1e6:8.1f} us/frame")
+  print(f"total             {(captureTime + buildTime + publishTime) / count * 1e6:8.1f} us/frame")
+  return
+
+def main():
+  parser = argparse.ArgumentParser(description="Replay gva metadata through the SceneScape adapter")
+  parser.add_argument("metadata", nargs="?", help="json lines recorded with record_metadata")
+  parser.add_argument("--repeat", type=int, default=10, help="number of replays of the metadata")
+  parser.add_argument("--policy", default="detectionPolicy", help="metadatagenpolicy of the camera")
+  parser.add_argument("--frames", type=int, default=1000, help="synthetic frames, without metadata file")
+  parser.add_argument("--objects", type=int, default=20, help="objects per synthetic frame")
+  args = parser.parse_args()
+
+  if args.metadata:
+    frames = loadMetadata(args.metadata)
+  else:
+    frames = syntheticMetadata(args.frames, args.objects)
+  bench(frames, args.repeat, args.policy)
+  return
+
+if __name__ == '__main__':
+  main()
@@ -14,23 +14,24 @@ import json
 import logging
 import math
 import os
-import struct
+import queue
+import threading
 import time
-from collections import defaultdict
-from datetime import datetime
 from uuid import getnode as get_mac
 
 import cv2
 import ntplib
 import numpy as np
 import paho.mqtt.client as mqtt
-from pytz import timezone
 
 from utils import publisher_utils as utils
 
 ROOT_CA = os.environ.get('ROOT_CA', '/run/secrets/certs/scenescape-ca.pem')
-DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
-TIMEZONE = "UTC"
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+NTP_SYNC_INTERVAL = 1000
+NTP_RETRY_INTERVAL = 60
+OBJECT_COLORS = ((0, 0, 255), (255, 128, 128), (207, 83, 294), (31, 156, 238))
+CATEGORY_COLORS = {'person': OBJECT_COLORS[0], 'vehicle': OBJECT_COLORS[1], 'bicycle': OBJECT_COLORS[1]}
 
 def getMACAddress():
   if 'MACADDR' in os.environ:
@@ -40,14 +41,71 @@ def getMACAddress():
   h = iter(hex(a)[2:].zfill(12))
   return ":".join(i + next(h) for i in h)
 
+class TimestampFormatter:
+  """Formats epoch seconds as UTC ISO 8601 with milliseconds.
+
+  The date and time part only changes once a second, so it is cached.
+  """
+  def __init__(self):
+    self.second = None
+    self.prefix = None
+
+  def format(self, ts):
+    # rounded to microseconds like datetime.fromtimestamp, then truncated to milliseconds
+    fraction, second = math.modf(ts)
+    second, micros = divmod(int(second) * 1000000 + round(fraction * 1000000), 1000000)
+    if second != self.second:
+      self.second = second
+      self.prefix = time.strftime(DATETIME_FORMAT, time.gmtime(second))
+    return f"{self.prefix}.{micros // 1000:03d}Z"
+
+class ClockOffset:
+  """NTP offset of the local clock, refreshed by a background thread.
+
+  Frames read the last known offset and never wait on the NTP server.
+  One instance per server is shared by all pipelines of the process.
+  """
+  _instances = {}
+  _instancesLock = threading.Lock()
+
+  @classmethod
+  def forServer(cls, ntpServer):
+    with cls._instancesLock:
+      if ntpServer not in cls._instances:
+        cls._instances[ntpServer] = cls(ntpServer)
+      return cls._instances[ntpServer]
+
+  def __init__(self, ntpServer, syncInterval=NTP_SYNC_INTERVAL, retryInterval=NTP_RETRY_INTERVAL):
+    self.log = logging.getLogger('SSCAPE_ADAPTER')
+    self.ntpServer = ntpServer
+    self.syncInterval = syncInterval
+    self.retryInterval = retryInterval
+    self.offset = 0
+    self.lastTimeSync = None
+    self.thread = threading.Thread(target=self.run, name=f"ntp-{ntpServer}", daemon=True)
+    self.thread.start()
+    return
+
+  def run(self):
+    ntpClient = ntplib.NTPClient()
+    while True:
+      try:
+        response = ntpClient.request(host=self.ntpServer, port=123)
+        self.offset = response.offset
+        self.lastTimeSync = time.time()
+        wait = self.syncInterval
+      except Exception as e:
+        self.log.warning(f"NTP request to {self.ntpServer} failed, keeping offset {self.offset}: {e}")
+        wait = self.retryInterval
+      time.sleep(wait)
+
 class PostDecodeTimestampCapture:
   def __init__(self, ntpServer=None):
     self.log = logging.getLogger('SSCAPE_ADAPTER')
     self.log.setLevel(logging.INFO)
-    self.ntpClient = ntplib.NTPClient()
     self.ntpServer = ntpServer
-    self.lastTimeSync = None
-    self.timeOffset = 0
+    self.clock = ClockOffset.forServer(ntpServer) if ntpServer else None
+    self.timestampFormatter = TimestampFormatter()
     self.ts = None
     self.timestamp_for_next_block = None
     self.fps = 5.0
@@ -66,17 +124,12 @@ class PostDecodeTimestampCapture:
       self.last_calculated_fps_ts = now
       self.frame_cnt = 0
 
-    if self.ntpServer:
-      # if ntpServer is available, check if it is time to recalibrate
-      if not self.lastTimeSync or now - self.lastTimeSync > 1000 :
-        response = self.ntpClient.request(host=self.ntpServer, port=123)
-        self.timeOffset = response.offset
-        self.lastTimeSync = now
-
-    now += self.timeOffset
+    if self.clock:
+      # offset kept up to date by the clock thread
+      now += self.clock.offset
     self.timestamp_for_next_block = now
     frame.add_message(json.dumps({
-      'postdecode_timestamp': f"{datetime.fromtimestamp(now, tz=timezone(TIMEZONE)).strftime(DATETIME_FORMAT)[:-3]}Z",
+      'postdecode_timestamp': self.timestampFormatter.format(now),
       'timestamp_for_next_block': now,
       'fps': self.fps
     }))
@@ -111,8 +164,8 @@ def detectionPolicy(pobj, item, fw, fh):
 def reidPolicy(pobj, item, fw, fh):
   detectionPolicy(pobj, item, fw, fh)
   reid_vector = item['tensors'][1]['data']
-  # following code snippet is from percebro/modelchain.py
-  v = struct.pack("256f",*reid_vector)
+  # same bytes as struct.pack("256f", ...) in percebro/modelchain.py
+  v = np.asarray(reid_vector, dtype=np.float32).tobytes()
   pobj['reid'] = base64.b64encode(v).decode('utf-8')
   return
 
@@ -128,8 +181,102 @@ metadatapolicies = {
 "classificationPolicy": classificationPolicy
 }
 
+class ImagePublisher:
+  """Encodes and publishes camera images on a worker thread.
+
+  The pipeline callback only copies the frame, downscaled when possible.
+  Annotation, JPEG encoding and publishing happen off the streaming thread.
+
+  A binary payload is a one line json header, then the JPEG bytes:
+  {"timestamp": ..., "id": ..., "encoding": "jpeg", "width": ..., "height": ...}\n<jpeg>
+  Otherwise the payload is the json with the base64 JPEG in 'image'.
+  """
+  def __init__(self, client, cameraid, scale=1.0, jpegQuality=95, binary=False):
+    self.log = logging.getLogger('SSCAPE_ADAPTER')
+    self.client = client
+    self.cameraid = cameraid
+    self.scale = scale
+    self.encodeParams = [cv2.IMWRITE_JPEG_QUALITY, int(jpegQuality)]
+    self.binary = binary
+    self.imageTopic = f"scenescape/image/camera/{cameraid}"
+    self.calibrationImageTopic = f"scenescape/image/calibration/camera/{cameraid}"
+    # one image in flight, requests are retried on the next frame while it is busy
+    self.queue = queue.Queue(maxsize=1)
+    self.thread = threading.Thread(target=self.run, name=f"image-{cameraid}", daemon=True)
+    self.thread.start()
+    return
+
+  def submit(self, gvaframe, frameData, image, calibration):
+    """Copies the frame for publishing, returns False if the previous image is still being published."""
+    if self.queue.full():
+      return False
+    with gvaframe.data() as img:
+      # calibration images keep the full resolution
+      if calibration or self.scale == 1:
+        img = img.copy()
+      else:
+        img = cv2.resize(img, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+    # objects are rebuilt every frame, the worker can keep a reference
+    self.queue.put_nowait((img, frameData['timestamp'], frameData['rate'], frameData['objects'],
+                           image, calibration))
+    return True
+
+  def run(self):
+    while True:
+      img, timestamp, rate, objects, image, calibration = self.queue.get()
+      try:
+        if calibration:
+          self.publish(self.calibrationImageTopic, img, timestamp)
+          if image and self.scale != 1:
+            img = cv2.resize(img, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if image:
+          self.annotateObjects(img, objects)
+          self.annotateFPS(img, rate)
+          self.publish(self.imageTopic, img, timestamp)
+      except Exception as e:
+        self.log.error(f"Failed to publish image of camera {self.cameraid}: {e}")
+
+  def publish(self, topic, img, timestamp):
+    _, jpeg = cv2.imencode(".jpg", img, self.encodeParams)
+    imgdatadict = {'timestamp': timestamp, 'id': self.cameraid}
+    if self.binary:
+      imgdatadict.update({'encoding': 'jpeg', 'width': img.shape[1], 'height': img.shape[0]})
+      payload = json.dumps(imgdatadict).encode('utf-8') + b"\n" + jpeg.tobytes()
+    else:
+      imgdatadict['image'] = base64.b64encode(jpeg).decode('utf-8')
+      payload = json.dumps(imgdatadict)
+    self.client.publish(topic, payload)
+    return
+
+  def annotateObjects(self, img, objects):
+    scale = self.scale
+    for otype, objs in objects.items():
+      # annotation of pose not supported
+      color = CATEGORY_COLORS.get(otype, OBJECT_COLORS[2])
+      for obj in objs:
+        box = obj['bounding_box_px']
+        topleft_cv = (int(box['x'] * scale), int(box['y'] * scale))
+        bottomright_cv = (int((box['x'] + box['width']) * scale), int((box['y'] + box['height']) * scale))
+        cv2.rectangle(img, topleft_cv, bottomright_cv, color, max(int(4 * scale), 1))
+    return
+
+  def annotateFPS(self, img, fpsval):
+    # code snippet is taken from annotateFPS method in percebro/videoframe.py
+    fpsStr = f'FPS {fpsval:.1f}'
+    scale = int((img.shape[0] + 479) / 480)
+    cv2.putText(img, fpsStr, (0, 30 * scale), cv2.FONT_HERSHEY_SIMPLEX,
+            1 * scale, (0,0,0), 5 * scale)
+    cv2.putText(img, fpsStr, (0, 30 * scale), cv2.FONT_HERSHEY_SIMPLEX,
+            1 * scale, (255,255,255), 2 * scale)
+    return
+
 class PostInferenceDataPublish:
-  def __init__(self, cameraid, metadatagenpolicy='detectionPolicy', publish_image=False):
+  def __init__(self, cameraid, metadatagenpolicy='detectionPolicy', publish_image=False, record_metadata=None,
+               image_scale=1.0, jpeg_quality=95, binary_image=False):
+    # record_metadata: optional path, the gva metadata of every frame is appended to it
+    # as json lines, for replaying with bench_sscape_adapter.py
+    # image_scale, jpeg_quality: size and quality of the images published on getimage
+    # binary_image: publish images as a json header line followed by the JPEG bytes
     self.cameraid = cameraid
 
     self.is_publish_image = publish_image
@@ -137,6 +284,10 @@ class PostInferenceDataPublish:
     self.setupMQTT()
     self.metadatagenpolicy = metadatapolicies[metadatagenpolicy]
     self.frame_level_data = {'id': cameraid, 'debug_mac': getMACAddress()}
+    self.timestampFormatter = TimestampFormatter()
+    self.dataTopic = f"scenescape/data/camera/{cameraid}"
+    self.imagePublisher = ImagePublisher(self.client, cameraid, image_scale, jpeg_quality, binary_image)
+    self.recordFile = open(record_metadata, 'a') if record_metadata else None
     return
 
   def on_connect(self, client, userdata, flags, rc):
@@ -167,88 +318,52 @@ class PostInferenceDataPublish:
       self.is_publish_calibration_image = True
     return
 
-  def annotateObjects(self, img):
-    objColors = ((0, 0, 255), (255, 128, 128), (207, 83, 294), (31, 156, 238))
-    for otype, objects in self.frame_level_data['objects'].items():
-      if otype == "person":
-        cindex = 0
-        # annotation of pose not supported
-        #self.annotateHPE(frame, obj)
-      elif otype == "vehicle" or otype == "bicycle":
-        cindex = 1
-      else:
-        cindex = 2
-      for obj in objects:
-        topleft_cv = (int(obj['bounding_box_px']['x']), int(obj['bounding_box_px']['y']))
-        bottomright_cv = (int(obj['bounding_box_px']['x'] + obj['bounding_box_px']['width']),
-                        int(obj['bounding_box_px']['y'] + obj['bounding_box_px']['height']))
-        cv2.rectangle(img, topleft_cv, bottomright_cv, objColors[cindex], 4)
-    return
-
-  def annotateFPS(self, img, fpsval):
-    # code snippet is taken from annotateFPS method in percebro/videoframe.py
-    fpsStr = f'FPS {fpsval:.1f}'
-    scale = int((img.shape[0] + 479) / 480)
-    cv2.putText(img, fpsStr, (0, 30 * scale), cv2.FONT_HERSHEY_SIMPLEX,
-            1 * scale, (0,0,0), 5 * scale)
-    cv2.putText(img, fpsStr, (0, 30 * scale), cv2.FONT_HERSHEY_SIMPLEX,
-            1 * scale, (255,255,255), 2 * scale)
-    return
-
-  def buildImgData(self, imgdatadict, gvaframe, annotate):
-    imgdatadict.update({
-      'timestamp': self.frame_level_data['timestamp'],
-      'id': self.cameraid
-    })
-    with gvaframe.data() as image:
-      if annotate:
-        self.annotateObjects(image)
-        self.annotateFPS(image, self.frame_level_data['rate'])
-      _, jpeg = cv2.imencode(".jpg", image)
-    jpeg = base64.b64encode(jpeg).decode('utf-8')
-    imgdatadict['image'] = jpeg
-
-    return
-
   def buildObjData(self, gvadata):
     now = time.time()
     self.frame_level_data.update({
       'timestamp': gvadata['postdecode_timestamp'],
-      'debug_timestamp_end': f"{datetime.fromtimestamp(now, tz=timezone(TIMEZONE)).strftime(DATETIME_FORMAT)[:-3]}Z",
+      'debug_timestamp_end': self.timestampFormatter.format(now),
       'debug_processing_time': now - float(gvadata['timestamp_for_next_block']),
       'rate': float(gvadata['fps'])
     })
-    objects = defaultdict(list)
-    if 'objects' in gvadata and len(gvadata['objects']) > 0:
+    objects = {}
+    detections = gvadata.get('objects')
+    if detections:
       framewidth, frameheight = gvadata['resolution']['width'], gvadata['resolution']['height']
-      for det in gvadata['objects']:
+      policy = self.metadatagenpolicy
+      for det in detections:
         vaobj = {}
-        self.metadatagenpolicy(vaobj, det, framewidth, frameheight)
-        otype = vaobj['category']
-        vaobj['id'] = len(objects[otype]) + 1
-        objects[otype].append(vaobj)
+        policy(vaobj, det, framewidth, frameheight)
+        sameType = objects.setdefault(vaobj['category'], [])
+        vaobj['id'] = len(sameType) + 1
+        sameType.append(vaobj)
     self.frame_level_data['objects'] = objects
 
+  def publishObjData(self, frame):
+    # serialized once, for both the MQTT message and the frame metadata
+    data = json.dumps(self.frame_level_data)
+    self.client.publish(self.dataTopic, data)
+    frame.add_message(data)
+    return
+
   def processFrame(self, frame):
     if self.client.is_connected():
-      gvametadata, imgdatadict = {}, {}
+      gvametadata = {}
 
       utils.get_gva_meta_messages(frame, gvametadata)
-      gvametadata['gva_meta'] = utils.get_gva_meta_regions(frame)
+      if self.recordFile:
+        self.recordFile.write(json.dumps(gvametadata) + "\n")
 
       self.buildObjData(gvametadata)
 
-      if self.is_publish_image:
-        self.buildImgData(imgdatadict, frame, True)
-        self.client.publish(f"scenescape/image/camera/{self.cameraid}", json.dumps(imgdatadict))
-        self.is_publish_image = False
-
-      if self.is_publish_calibration_image:
-        if not imgdatadict:
-          self.buildImgData(imgdatadict, frame, False)
-        self.client.publish(f"scenescape/image/calibration/camera/{self.cameraid}", json.dumps(imgdatadict))
-        self.is_publish_calibration_image = False
+      image, calibration = self.is_publish_image, self.is_publish_calibration_image
+      if image or calibration:
+        # the frame is copied here, encoding and publishing happen on the image thread
+        if self.imagePublisher.submit(frame, self.frame_level_data, image, calibration):
+          if image:
+            self.is_publish_image = False
+          if calibration:
+            self.is_publish_calibration_image = False
 
-      self.client.publish(f"scenescape/data/camera/{self.cameraid}", json.dumps(self.frame_level_data))
-      frame.add_message(json.dumps(self.frame_level_data))
+      self.publishObjData(frame)
     return True
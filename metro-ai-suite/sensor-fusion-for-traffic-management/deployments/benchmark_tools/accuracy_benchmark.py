@@ -1,237 +1,280 @@
 import numpy as np
-import pickle
-import cv2
 import os
 import csv
+import json
 import argparse
-
-### plot gt and detection results in same image
-
-## compare the distance of center point
-def compare_center_distance(detections, gts):
-    num_frame = len(detections)
-
-    errors_percentages =[]
-
-    for i in range(num_frame):
-        frame_detection = detections[i]
-        frame_gt = gts[i]
-
-        print("frameId: ", frame_detection['frameId'])
-        print("detections: ", frame_detection['detections'])
-        print("gts: ", frame_gt['gts'])
-
-
-        # find gt for each detection and compute the nearst distance
-        
-        for detection in frame_detection['detections']:
-            radar_cx = detection['radar_cx']
-            radar_cy = detection['radar_cy']
-            group = detection['group']
-
-            distances =[]
-
-            ## remove useless frame_detection
-            if radar_cx == 0.0 and radar_cy == 0.0:
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+### compare radar tracking results with gt, frame by frame
+
+REPORT_FIELDS = ["sequence", "gt_frames", "tracking_frames", "joined_frames", "num_gt", "num_det",
+                 "tp", "fp", "fn", "precision", "recall", "mota", "motp",
+                 "center_error_mean", "center_error_median", "center_error_p90", "center_error_p95",
+                 "error_percent_mean", "nearest_error_percent_mean"]
+# written next to the tracking results by profile_tools/process_profiler.py --summary
+PROFILE_SUMMARY_FILE = "profile_summary.json"
+COST_FIELDS = ["cpu_percent_p50", "cpu_percent_p90", "cpu_percent_p99", "cpu_percent_max",
+               "rss_mb_p50", "rss_mb_max", "ctxt_switches_per_sec_p90", "read_mb_per_sec_p90"]
+
+
+def parse_number_column(values, group_size):
+    """Parse a column of number lists (one string per row) into a flat array and the group count of each row."""
+    rows = [np.array(value.split(), dtype=np.float64) for value in values]
+    sizes = np.array([row.size for row in rows], dtype=np.int64)
+    bad = sizes % group_size != 0
+    if bad.any():
+        print(f"Skip {bad.sum()} rows with a number of values not multiple of {group_size}")
+        rows = [row for row, is_bad in zip(rows, bad) if not is_bad]
+        sizes = sizes[~bad]
+    flat = np.concatenate(rows) if rows else np.empty(0)
+    return flat.reshape(-1, group_size), sizes // group_size, ~bad
+
+
+def read_columns(csv_file_path):
+    with open(csv_file_path, mode='r', newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        rows = [row for row in reader if row]
+    columns = list(zip(*rows)) if rows else [()] * len(header)
+    return header, columns
+
+
+def read_tracking(tracking_file_path):
+    """
+    Read radarResults.csv.
+
+    :return: frame ids, x, y of the tracked objects in gt orientation (one entry per object),
+             and the ids of all the tracking frames, with or without objects
+    """
+    header, columns = read_columns(tracking_file_path)
+    frame_ids = np.array(columns[0], dtype=np.int64)
+    # radarRoi: x y vx vy of each object, x y is the center of the radar box
+    rois, counts, valid = parse_number_column(columns[1], 4)
+    frames = np.repeat(frame_ids[valid], counts)
+    x, y = rois[:, 0], rois[:, 1]
+
+    ## remove useless detections
+    keep = (x != 0.0) | (y != 0.0)
+    return frames[keep], x[keep], y[keep], frame_ids
+
+
+def read_gt(gt_file_path):
+    """
+    Read radar_gt.csv written by read_GT_plot_multiple.py.
+
+    :return: frame ids, x, y of the gt boxes center in radar coordinates (one entry per box),
+             and the ids of all the gt frames, with or without boxes
+    """
+    header, columns = read_columns(gt_file_path)
+    frame_ids = np.array(columns[0], dtype=np.int64)
+    # radar_rois: [[x1, y1, x2, y2, xc, yc], ...]
+    cleaned = [value.replace('[', ' ').replace(']', ' ').replace(',', ' ') for value in columns[1]]
+    rois, counts, valid = parse_number_column(cleaned, 6)
+    frames = np.repeat(frame_ids[valid], counts)
+
+    ## change gt to radar coordinates: x forward, y to the left
+    x, y = rois[:, 5], rois[:, 4]
+    return frames, x, y, frame_ids
+
+
+def frame_slices(frames):
+    """Map each frame id to the slice of its entries, frames must be sorted."""
+    ids, starts, counts = np.unique(frames, return_index=True, return_counts=True)
+    return {frame: slice(start, start + count) for frame, start, count in zip(ids.tolist(), starts, counts)}
+
+
+def assign(cost, gate, method):
+    """
+    Match detections (rows) with gts (columns).
+
+    :param cost: pairwise distances
+    :param gate: pairs allowed to match
+    :return: matched row and column indices
+    """
+    if method == "hungarian":
+        rows, cols = linear_sum_assignment(np.where(gate, cost, 1e9))
+    else:
+        order = np.argsort(cost, axis=None)
+        order = order[gate.ravel()[order]]
+        used_rows = np.zeros(cost.shape[0], dtype=bool)
+        used_cols = np.zeros(cost.shape[1], dtype=bool)
+        rows, cols = [], []
+        for row, col in zip(*np.unravel_index(order, cost.shape)):
+            if used_rows[row] or used_cols[col]:
                 continue
-
-            for gt in frame_gt['gts']:
-                gt_cx = gt['gt_xc']
-                gt_cy = gt['gt_yc']
-
-                ## change gt , radar to same coordinates
-                temp = gt_cx
-                gt_cx = gt_cy
-                gt_cy= -temp
-                gt_group = gt['group']
-                
-                # compute the distance of nearest gt if exsit
-
-                distance = np.sqrt((radar_cx - gt_cx) ** 2 + (radar_cy - gt_cy) ** 2)
-                distances.append(distance)
-                print("frameId: ", i, "group: ", group, "gt_group: ", gt_group, "radar_cx: ", radar_cx, "radar_cy: ", radar_cy, "gt_cx: ", gt_cx, "gt_cy: ", gt_cy, "distance: ", distance)
-            
-            # find the nearest distance for each detection
-            min_dist_detction = min(distances)
-            print('**distance for detection**: ', "frameId: ", i, "radar_cx: ", radar_cx, "radar_cy: ", radar_cy, "min dist: ", min_dist_detction)
-            
-            error_percentage = min_dist_detction / (np.sqrt(radar_cx**2+radar_cy**2)) *100
-            print('error_percentage: ', error_percentage)
-
-            if error_percentage < 20:
-                errors_percentages.append(error_percentage)
-    
-    average_error = np.mean(errors_percentages)
-    print('average error: ', average_error)
-
-
-            
-
-        
-
-
-def accuracy_benchmark(img_dir, output_dir, gt_file_path, tracking_file_path):
-    # read tracking csv files 
-
-    frame_detections = []  # save radar detection results(tracking results)
-    frame_gts = [] # save gt results
-
-    with open(tracking_file_path, mode='r') as detection_file:
-        tracking_csv_reader = csv.reader(detection_file)
-
-        # skip the header
-        next(tracking_csv_reader)
-        for row in tracking_csv_reader:
-            print(row)
-            frameId = row[0]
-            radarRois = row[1]
-            radarSizes = row[2]
-            radarStates = row[3]
-            radarId = row[4]
-
-            # Clean and split the radarRois and radarSizes strings
-            parts = radarRois.split()
-            radarSize = radarSizes.split()
-
-            if len(parts) % 4 == 0:
-                num_groups = len(parts) // 4
-                frame_data = {
-                    'frameId': frameId,
-                    'detections': []
-                }
-                for i in range(num_groups):
-                    try:
-                        # radar_x, radar_y actually is the center coordinates of the radar box
-                        radar_x, radar_y, vx, vy = map(float, parts[i*4:(i+1)*4])
-                        w, h = map(float, radarSize[i*2:(i+1)*2])
-
-                        # align with garnet park demo
-                        radar_y = -radar_y  # for plot
-                        xSize = 4.2
-                        ySize = 1.7
-
-                        radar_x1 = radar_x + xSize / 2
-                        radar_y1 = radar_y - ySize / 2
-
-                        radar_x2 = radar_x - xSize / 2
-                        radar_y2 = radar_y + ySize / 2
-                        detection = {
-                            'group': i + 1,
-                            'radar_x1': radar_x1,
-                            'radar_y1': radar_y1,
-                            'radar_x2': radar_x2,
-                            'radar_y2': radar_y2,
-                            'radar_cx': radar_x,
-                            'radar_cy': radar_y
-                        }
-
-                        frame_data['detections'].append(detection)
-                        print("boxes left: ", (radar_x1, radar_y1), "boxes right: ", (radar_x2, radar_y2))
-                    except ValueError as e:
-                        print(f"Error converting to float: {e}")
-                        print(f"Problematic data: {parts[i*4:(i+1)*4]}")
-                frame_detections.append(frame_data)
-            else:
-                print(f"Invalid number of coordinates in radarRois: {radarRois}")
-
-    
-    with open(gt_file_path, mode='r') as gt_file:
-        gt_csv_reader = csv.reader(gt_file)
-
-        # skip the header
-        next(gt_csv_reader)
-        for row in gt_csv_reader:
-            print(row)
-            frameId = row[0]
-            radar_rois = row[1]
-            class_labels = row[2]
-
-            # Clean and split the radar_rois string
-            radar_rois_cleaned = radar_rois.replace('[', '').replace(']', '').replace(',', ' ')
-            parts_gt = radar_rois_cleaned.split()
-            # parts_gt = radar_rois.split()
-            labels_gt = class_labels.split()
-
-            if len(parts_gt) % 6 == 0:
-                num_groups_gt = len(parts_gt) // 6
-                frame_data = {
-                    'frameId': frameId,
-                    'gts': []
-                }
-                for i in range(num_groups_gt):
-                    try:
-                        gt_x1, gt_y1, gt_x2, gt_y2, gt_xc, gt_yc = map(float, parts_gt[i*6:(i+1)*6])
-                        ## compute center point of bounding box
-
-                        gt = {
-                            'group': i + 1,
-                            'gt_x1': gt_x1,
-                            'gt_y1': gt_y1,
-                            'gt_x2': gt_x2,
-                            'gt_y2': gt_y2,
-                            'gt_xc': gt_xc,
-                            'gt_yc': gt_yc
-                        }
-                        frame_data['gts'].append(gt)
-                        print("gt boxes left: ", (gt_x1, gt_y1), "gt boxes right: ", (gt_x2, gt_y2))
-                    except ValueError as e:
-                        print(f"Error converting to float: {e}")
-                        print(f"Problematic data: {parts_gt[i*4:(i+1)*4]}")
-                frame_gts.append(frame_data)
-            else:
-                print(f"Invalid number of coordinates in radar_rois: {radar_rois}")    
-
-
-        print('len detections: ', len(frame_detections))
-        print('len gts: ', len(frame_gts))
-
-        compare_center_distance(frame_detections, frame_gts)
-
-
-
-
-
-
-        
-
+            used_rows[row] = used_cols[col] = True
+            rows.append(row)
+            cols.append(col)
+            if len(rows) == min(cost.shape):
+                break
+        rows, cols = np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+    matched = gate[rows, cols]
+    return rows[matched], cols[matched]
+
+
+def evaluate_sequence(folder_path, frame_offset=None, max_error_percent=20.0, method="hungarian"):
+    """
+    Match tracking results with gt of a sequence folder, joined on frame id.
+
+    A detection matches a gt when their center distance is below max_error_percent of the detection range.
+
+    :param frame_offset: gt frame id of tracking frame 0, None to align the first frames
+    :return: metrics and center errors of the matches
+    """
+    det_frames, det_x, det_y, tracking_frame_ids = read_tracking(os.path.join(folder_path, 'radarResults.csv'))
+    gt_frames, gt_x, gt_y, gt_frame_ids = read_gt(os.path.join(folder_path, 'radar_gt.csv'))
+
+    if frame_offset is None:
+        # align the first frames of the files, the first frames may have no detection or no gt
+        frame_offset = (int(gt_frame_ids.min() - tracking_frame_ids.min())
+                        if tracking_frame_ids.size and gt_frame_ids.size else 0)
+    det_frames = det_frames + frame_offset
+
+    det_order, gt_order = np.argsort(det_frames, kind='stable'), np.argsort(gt_frames, kind='stable')
+    det_frames, det_x, det_y = det_frames[det_order], det_x[det_order], det_y[det_order]
+    gt_frames, gt_x, gt_y = gt_frames[gt_order], gt_x[gt_order], gt_y[gt_order]
+    det_slices, gt_slices = frame_slices(det_frames), frame_slices(gt_frames)
+
+    distances, percents, nearest_percents = [], [], []
+    tp = 0
+    for frame in det_slices.keys() & gt_slices.keys():
+        det, gt = det_slices[frame], gt_slices[frame]
+        dx = det_x[det, None] - gt_x[None, gt]
+        dy = det_y[det, None] - gt_y[None, gt]
+        cost = np.hypot(dx, dy)
+        det_range = np.hypot(det_x[det], det_y[det])[:, None]
+        percent = cost / det_range * 100
+        gate = percent < max_error_percent
+
+        # error to the nearest gt of each detection, as the previous version of the benchmark
+        nearest = percent.min(axis=1)
+        nearest_percents.append(nearest[nearest < max_error_percent])
+
+        rows, cols = assign(cost, gate, method)
+        tp += rows.size
+        distances.append(cost[rows, cols])
+        percents.append(percent[rows, cols])
+
+    distances = np.concatenate(distances) if distances else np.empty(0)
+    percents = np.concatenate(percents) if percents else np.empty(0)
+    nearest_percents = np.concatenate(nearest_percents) if nearest_percents else np.empty(0)
+    metrics = compute_metrics(gt_x.size, det_x.size, tp, distances, percents, nearest_percents)
+    metrics.update({
+        "sequence": folder_path,
+        "gt_frames": int(gt_frame_ids.size),
+        "tracking_frames": int(tracking_frame_ids.size),
+        "joined_frames": len(det_slices.keys() & gt_slices.keys()),
+    })
+    metrics.update(read_cost(folder_path))
+    return metrics, distances, percents, nearest_percents
+
+
+def read_cost(folder_path):
+    """Profile summary of the tracking run of a sequence, as cost_ fields, empty if it was not profiled."""
+    summary_path = os.path.join(folder_path, PROFILE_SUMMARY_FILE)
+    if not os.path.exists(summary_path):
+        return {}
+    with open(summary_path) as f:
+        summary = json.load(f)
+    return {f"cost_{name}": summary.get(name) for name in COST_FIELDS}
+
+
+def compute_metrics(num_gt, num_det, tp, distances, percents, nearest_percents):
+    """MOTA/MOTP-style counts, gt has no track ids so there are no id switches."""
+    def stat(values, function, *args):
+        return float(function(values, *args)) if values.size else None
+
+    fp, fn = num_det - tp, num_gt - tp
+    return {
+        "num_gt": int(num_gt),
+        "num_det": int(num_det),
+        "tp": int(tp),
+        "fp": int(fp),
+        "fn": int(fn),
+        "precision": tp / num_det if num_det else None,
+        "recall": tp / num_gt if num_gt else None,
+        "mota": 1 - (fn + fp) / num_gt if num_gt else None,
+        "motp": stat(distances, np.mean),
+        "center_error_mean": stat(distances, np.mean),
+        "center_error_median": stat(distances, np.median),
+        "center_error_p90": stat(distances, np.percentile, 90),
+        "center_error_p95": stat(distances, np.percentile, 95),
+        "error_percent_mean": stat(percents, np.mean),
+        "nearest_error_percent_mean": stat(nearest_percents, np.mean),
+    }
+
+
+def evaluate_sequences(folder_paths, frame_offset, max_error_percent, method, workers):
+    args = [(path, frame_offset, max_error_percent, method) for path in folder_paths]
+    if workers == 1 or len(folder_paths) == 1:
+        results = [evaluate_sequence(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(evaluate_sequence, *zip(*args)))
+
+    reports = [metrics for metrics, _, _, _ in results]
+    total = compute_metrics(
+        sum(m["num_gt"] for m in reports), sum(m["num_det"] for m in reports), sum(m["tp"] for m in reports),
+        *(np.concatenate([result[i] for result in results]) for i in (1, 2, 3)))
+    total.update({
+        "sequence": "total",
+        "gt_frames": sum(m["gt_frames"] for m in reports),
+        "tracking_frames": sum(m["tracking_frames"] for m in reports),
+        "joined_frames": sum(m["joined_frames"] for m in reports),
+    })
+    return reports + [total]
+
+
+def write_reports(reports, json_path=None, csv_path=None):
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(reports, f, indent=2)
+    if csv_path:
+        with open(csv_path, 'w', newline='') as f:
+            cost_fields = [f"cost_{name}" for name in COST_FIELDS]
+            fieldnames = REPORT_FIELDS + [name for name in cost_fields if any(name in report for report in reports)]
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(reports)
+
+    for report in reports:
+        print(f"{report['sequence']}: frames {report['joined_frames']}/{report['gt_frames']}, "
+              f"gt {report['num_gt']}, det {report['num_det']}, tp {report['tp']}, fp {report['fp']}, fn {report['fn']}, "
+              f"mota {format_value(report['mota'])}, motp {format_value(report['motp'])} m, "
+              f"p95 error {format_value(report['center_error_p95'])} m, "
+              f"average error {format_value(report['nearest_error_percent_mean'])} %"
+              + (f", cpu p90 {format_value(report['cost_cpu_percent_p90'])} %, "
+                 f"rss max {format_value(report['cost_rss_mb_max'])} MB" if 'cost_cpu_percent_p90' in report else ""))
+
+
+def format_value(value):
+    return "-" if value is None else f"{value:.3f}"
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Read radar gt and detection results and compute accuracy")
-    parser.add_argument("--folder_path", required=True, type=str, help="Path to the gt and tracking results")
-    
+    parser.add_argument("--folder_path", required=True, type=str, nargs='+',
+                        help="Path to the gt and tracking results, one per sequence")
+    parser.add_argument("--frame_offset", type=int, default=None,
+                        help="gt frame number of tracking frame 0, by default the first frames are aligned")
+    parser.add_argument("--max_error_percent", type=float, default=20.0,
+                        help="max center distance for a match, in percent of the detection range")
+    parser.add_argument("--assignment", choices=["hungarian", "greedy"], default="hungarian",
+                        help="matching of detections and gts in a frame, hungarian needs scipy")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to evaluate sequences")
+    parser.add_argument("--json", type=str, default=None, help="Path of the json report")
+    parser.add_argument("--csv", type=str, default=None, help="Path of the csv report")
+
     args = parser.parse_args()
-    folder_path = args.folder_path
-
-    ### params
-    ## birdview shape
-    resolution = 100/512
-    width = 512
-    height = 256
-
-    ## original image shape
-    ori_img_width = 640
-    ori_img_height = 480
-
-    ## origin coordinates
-    x_min = 0.0
-    x_min_pixel = x_min/resolution
-    origin_row = int(height + x_min_pixel)
-    origin_col = int(width/2)
-    print("origin_row: ", origin_row)
-    print("origin_col: ", origin_col)
-
-    # Define the directories containing the ground truth and images
-    gt_dir = os.path.join(folder_path, "gt")
-    img_dir = os.path.join(folder_path, "left")
-    output_dir = os.path.join(folder_path, "gt_images") # new directory for saving gt images
-
-    # Create the output directory if it does not exist
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    # CSV file setup
-    gt_file_path = os.path.join(folder_path, 'radar_gt.csv')
-    tracking_file_path = os.path.join(folder_path, 'radarResults.csv')
-
-    accuracy_benchmark(img_dir, output_dir, gt_file_path, tracking_file_path)
+    method = args.assignment
+    if method == "hungarian" and linear_sum_assignment is None:
+        print("scipy is not installed, using greedy assignment")
+        method = "greedy"
+
+    reports = evaluate_sequences(args.folder_path, args.frame_offset, args.max_error_percent, method, args.workers)
+    write_reports(reports, args.json, args.csv)
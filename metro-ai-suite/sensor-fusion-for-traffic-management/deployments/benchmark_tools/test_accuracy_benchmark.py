@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from accuracy_benchmark import evaluate_sequence
+
+
+def write_sequence(folder, frames, empty_tracking_frames):
+    """One object per frame moving away from the radar, tracked exactly except in the empty frames."""
+    with open(os.path.join(folder, 'radar_gt.csv'), 'w') as f:
+        f.write("frame,radar_rois\n")
+        for frame in range(frames):
+            # gt boxes are [x1, y1, x2, y2, xc, yc] with xc to the left and yc forward
+            f.write(f'{frame},"[[0, 0, 0, 0, 1.0, {10.0 + frame}]]"\n')
+    with open(os.path.join(folder, 'radarResults.csv'), 'w') as f:
+        f.write("frame,radarRoi\n")
+        for frame in range(frames):
+            roi = "0 0 0 0" if frame < empty_tracking_frames else f"{10.0 + frame} 1.0 0 0"
+            f.write(f"{frame},{roi}\n")
+
+
+@pytest.mark.parametrize("method", ["hungarian", "greedy"])
+def test_exact_tracking(tmp_path, method):
+    write_sequence(tmp_path, 10, 0)
+    metrics, _, _, _ = evaluate_sequence(str(tmp_path), method=method)
+    assert metrics["tp"] == 10
+    assert metrics["fp"] == metrics["fn"] == 0
+    assert metrics["motp"] == pytest.approx(0.0)
+
+
+def test_leading_empty_tracking_frames_keep_alignment(tmp_path):
+    write_sequence(tmp_path, 10, 2)
+    metrics, _, _, _ = evaluate_sequence(str(tmp_path), method="greedy")
+    assert metrics["tracking_frames"] == metrics["gt_frames"] == 10
+    assert metrics["joined_frames"] == 8
+    assert metrics["tp"] == 8
+    assert metrics["fn"] == 2
+    assert metrics["motp"] == pytest.approx(0.0)
+    assert metrics["nearest_error_percent_mean"] == pytest.approx(0.0)
+    assert metrics == evaluate_sequence(str(tmp_path), frame_offset=0, method="greedy")[0]
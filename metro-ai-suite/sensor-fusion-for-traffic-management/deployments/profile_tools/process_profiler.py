@@ -0,0 +1,298 @@
+import os
+import csv
+import gzip
+import json
+import time
+import signal
+import argparse
+import threading
+import subprocess
+
+import numpy as np
+
+### sampling profiler of a process tree, reads /proc directly
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+CSV_FIELDS = ["time", "pid", "tid", "comm", "cpu_percent", "rss_kb", "voluntary_ctxt_switches",
+              "nonvoluntary_ctxt_switches", "rchar", "wchar", "read_bytes", "write_bytes"]
+SUMMARY_PERCENTILES = (50, 90, 99)
+
+
+def read_proc(path):
+    """Content of a /proc file, None if the process or thread is gone or not readable."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+
+
+def parse_stat(data):
+    """
+    :return: comm, ppid, utime + stime in clock ticks, rss in pages
+    """
+    # comm may contain spaces and parentheses, the other fields start after the last ')'
+    end = data.rindex(b')')
+    comm = data[data.index(b'(') + 1:end].decode(errors='replace')
+    fields = data[end + 2:].split()
+    # fields[0] is field 3 (state) of proc(5)
+    return comm, int(fields[1]), int(fields[11]) + int(fields[12]), int(fields[21])
+
+
+def parse_ctxt_switches(data):
+    voluntary = nonvoluntary = 0
+    for line in data.splitlines():
+        if line.startswith(b'voluntary_ctxt_switches:'):
+            voluntary = int(line.split()[1])
+        elif line.startswith(b'nonvoluntary_ctxt_switches:'):
+            nonvoluntary = int(line.split()[1])
+    return voluntary, nonvoluntary
+
+
+def parse_io(data):
+    """:return: rchar, wchar, read_bytes, write_bytes"""
+    values = dict(line.split(b':') for line in data.splitlines() if b':' in line)
+    return tuple(int(values.get(key, 0)) for key in (b'rchar', b'wchar', b'read_bytes', b'write_bytes'))
+
+
+def list_processes():
+    """:return: {pid: (ppid, comm)} of all the processes"""
+    processes = {}
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        data = read_proc(f'/proc/{entry.name}/stat')
+        if data:
+            comm, ppid, _, _ = parse_stat(data)
+            processes[int(entry.name)] = (ppid, comm)
+    return processes
+
+
+def process_tree(root_pids, processes):
+    """The root processes and all their descendants."""
+    children = {}
+    for pid, (ppid, _) in processes.items():
+        children.setdefault(ppid, []).append(pid)
+    tree, stack = set(), [pid for pid in root_pids if pid in processes]
+    while stack:
+        pid = stack.pop()
+        if pid not in tree:
+            tree.add(pid)
+            stack.extend(children.get(pid, []))
+    return sorted(tree)
+
+
+class ProcessProfiler(threading.Thread):
+    """
+    Samples CPU, RSS, context switches and I/O of process trees on a background thread.
+
+    Per-thread CPU and context switches and per-process RSS and I/O are written to a csv
+    time series (gzip compressed if the path ends with .gz). The tree totals of every sample
+    are kept in memory for summary().
+    """
+
+    def __init__(self, pids=None, process_name=None, interval=0.2, output=None, rescan_interval=1.0, threads=True):
+        """
+        :param pids: root processes to profile, with their descendants
+        :param process_name: profile the processes whose name contains it, with their descendants
+        :param interval: sampling interval in seconds
+        :param output: path of the csv time series, None to only keep the totals
+        :param rescan_interval: seconds between two searches of new processes in the tree
+        :param threads: record a row per thread, otherwise a row per process
+        """
+        super(ProcessProfiler, self).__init__(daemon=True)
+        self.root_pids = list(pids or [])
+        self.process_name = process_name
+        self.interval = interval
+        self.rescan_interval = rescan_interval
+        self.threads = threads
+        self.output = output
+        self.stopped = threading.Event()
+
+        self.pids = []
+        self.last_rescan = None
+        # previous counters by (pid, tid), tid 0 for the process
+        self.previous = {}
+        self.previous_time = None
+        # tree totals per sample: time, cpu percent, rss bytes, context switches/s, read bytes/s, write bytes/s
+        self.totals = []
+        self.max_processes = 0
+        self.max_threads = 0
+        self.start_time = None
+        self.sampling_time = 0.0
+
+    def rescan(self, now):
+        processes = list_processes()
+        roots = set(self.root_pids)
+        if self.process_name:
+            roots.update(pid for pid, (_, comm) in processes.items() if self.process_name in comm)
+        self.pids = process_tree(roots, processes)
+        self.last_rescan = now
+
+    def sample(self, writer=None):
+        """Read the counters of the tree once, write the rows and append the totals."""
+        now = time.monotonic()
+        if self.last_rescan is None or now - self.last_rescan >= self.rescan_interval:
+            self.rescan(now)
+        dt = now - self.previous_time if self.previous_time is not None else None
+        wall_time = time.time()
+
+        current = {}
+        total_cpu = total_rss = total_ctxt = total_read = total_write = 0
+        thread_count = 0
+        for pid in self.pids:
+            stat = read_proc(f'/proc/{pid}/stat')
+            if stat is None:
+                continue
+            comm, _, ticks, rss_pages = parse_stat(stat)
+            io = read_proc(f'/proc/{pid}/io')
+            io = parse_io(io) if io else (0, 0, 0, 0)
+
+            # threads
+            ctxt = [0, 0]
+            try:
+                tids = [int(tid) for tid in os.listdir(f'/proc/{pid}/task')]
+            except FileNotFoundError:
+                tids = []
+            thread_count += len(tids)
+            for tid in tids:
+                thread_stat = read_proc(f'/proc/{pid}/task/{tid}/stat')
+                thread_status = read_proc(f'/proc/{pid}/task/{tid}/status')
+                if thread_stat is None or thread_status is None:
+                    continue
+                thread_comm, _, thread_ticks, _ = parse_stat(thread_stat)
+                voluntary, nonvoluntary = parse_ctxt_switches(thread_status)
+                ctxt[0] += voluntary
+                ctxt[1] += nonvoluntary
+                key = (pid, tid)
+                current[key] = (thread_ticks, voluntary, nonvoluntary)
+                previous = self.previous.get(key)
+                if self.threads and writer and previous is not None and dt:
+                    writer.writerow([f"{wall_time:.3f}", pid, tid, thread_comm,
+                                     f"{(thread_ticks - previous[0]) / CLK_TCK / dt * 100:.1f}", "",
+                                     voluntary - previous[1], nonvoluntary - previous[2], "", "", "", ""])
+
+            # process, counters of the threads that exited stay in the process cpu time
+            key = (pid, 0)
+            current[key] = (ticks, ctxt[0], ctxt[1]) + io
+            previous = self.previous.get(key)
+            rss = rss_pages * PAGE_SIZE
+            total_rss += rss
+            if previous is not None and dt:
+                cpu = (ticks - previous[0]) / CLK_TCK / dt * 100
+                # thread context switches are summed, they can go down when threads exit
+                voluntary, nonvoluntary = max(ctxt[0] - previous[1], 0), max(ctxt[1] - previous[2], 0)
+                io_delta = [value - before for value, before in zip(io, previous[3:])]
+                total_cpu += cpu
+                total_ctxt += voluntary + nonvoluntary
+                total_read += io_delta[0]
+                total_write += io_delta[1]
+                if writer:
+                    writer.writerow([f"{wall_time:.3f}", pid, 0, comm, f"{cpu:.1f}", rss // 1024,
+                                     voluntary, nonvoluntary] + io_delta)
+
+        if dt:
+            self.totals.append((wall_time, total_cpu, total_rss, total_ctxt / dt, total_read / dt, total_write / dt))
+        self.max_processes = max(self.max_processes, len(self.pids))
+        self.max_threads = max(self.max_threads, thread_count)
+        self.previous = current
+        self.previous_time = now
+
+    def run(self):
+        f = None
+        writer = None
+        if self.output:
+            f = gzip.open(self.output, 'wt', newline='') if self.output.endswith('.gz') else open(self.output, 'w', newline='')
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+
+        self.start_time = time.monotonic()
+        next_sample = self.start_time
+        try:
+            while not self.stopped.is_set():
+                sampling_start = time.thread_time()
+                self.sample(writer)
+                self.sampling_time += time.thread_time() - sampling_start
+                next_sample += self.interval
+                self.stopped.wait(max(next_sample - time.monotonic(), 0))
+        finally:
+            if f:
+                f.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def summary(self):
+        """Percentiles of the tree totals, and the cpu used by the profiler itself."""
+        duration = time.monotonic() - self.start_time if self.start_time is not None else 0.0
+        summary = {
+            "duration": duration,
+            "samples": len(self.totals),
+            "interval": self.interval,
+            "max_processes": self.max_processes,
+            "max_threads": self.max_threads,
+            "profiler_cpu_percent": self.sampling_time / duration * 100 if duration else None,
+        }
+        totals = np.array(self.totals).reshape(-1, 6)
+        series = {
+            "cpu_percent": totals[:, 1],
+            "rss_mb": totals[:, 2] / 2**20,
+            "ctxt_switches_per_sec": totals[:, 3],
+            "read_mb_per_sec": totals[:, 4] / 2**20,
+            "write_mb_per_sec": totals[:, 5] / 2**20,
+        }
+        for name, values in series.items():
+            summary[f"{name}_mean"] = float(values.mean()) if values.size else None
+            for percentile in SUMMARY_PERCENTILES:
+                summary[f"{name}_p{percentile}"] = float(np.percentile(values, percentile)) if values.size else None
+            summary[f"{name}_max"] = float(values.max()) if values.size else None
+        return summary
+
+
+def write_summary(summary, path):
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Profile a process tree from /proc. Profiles the command given after -- until it exits, '
+                    'otherwise the processes given by --pid or --process_name until --duration or ctrl-c.')
+    parser.add_argument('-p', '--process_name', default=None, type=str, help='profile the processes whose name contains it')
+    parser.add_argument('--pid', type=int, nargs='*', default=[], help='pids of the processes to profile')
+    parser.add_argument('--interval', type=float, default=0.2, help='sampling interval in seconds')
+    parser.add_argument('--duration', type=float, default=None, help='seconds to profile')
+    parser.add_argument('--output', type=str, default='profile.csv', help='csv time series, .csv.gz to compress it')
+    parser.add_argument('--summary', type=str, default=None,
+                        help='json summary, save it as profile_summary.json in the accuracy benchmark folder '
+                             'to report it with the accuracy')
+    parser.add_argument('--no_threads', action='store_true', help='record one row per process instead of per thread')
+    parser.add_argument('command', nargs=argparse.REMAINDER, help='-- command to run and profile')
+    args = parser.parse_args()
+
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    process = subprocess.Popen(command) if command else None # nosec
+    pids = args.pid + ([process.pid] if process else [])
+    if not pids and not args.process_name:
+        parser.error('give a command, --pid or --process_name')
+
+    profiler = ProcessProfiler(pids, args.process_name, args.interval, args.output, threads=not args.no_threads)
+    profiler.start()
+    try:
+        if process:
+            process.wait(timeout=args.duration)
+        elif args.duration:
+            time.sleep(args.duration)
+        else:
+            signal.pause()
+    except (KeyboardInterrupt, subprocess.TimeoutExpired):
+        pass
+    profiler.stop()
+
+    summary = profiler.summary()
+    if args.summary:
+        write_summary(summary, args.summary)
+    print(json.dumps(summary, indent=2))
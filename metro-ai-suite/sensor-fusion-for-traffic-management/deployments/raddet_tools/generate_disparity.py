@@ -1,26 +1,12 @@
 import os
+import time
 import cv2
 from glob import glob
 import numpy as np
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import argparse
 
-parser = argparse.ArgumentParser(description="")
-parser.add_argument(
-    "--stereo_image_folder",
-    required=True,
-    type=str,
-    help="stereo image folder.",
-)
-parser.add_argument(
-    "--sensors_para_folder",
-    required=True,
-    type=str,
-    help="sensors parameter folder.",
-)
-
-args = parser.parse_args()
-
 
 def checkoutDir(dir_name: str):
     """
@@ -58,17 +44,13 @@ class Config(object):
         self.save_disparity = True
 
 
-def SBGMBuildDisparity(Left_Remap, Right_Remap):
+def createSGBMMatchers():
     """
     Functionality:
-        Build the disparity using Semi-Global Block Matching
-
-    Inputs:
-        left_maps                           ->          calibration and rectification remap parameter of left images
-        right_maps                          ->          calibration and rectification remap parameter of right images
+        Create the Semi-Global Block Matching matchers and the WLS filter, they can be reused for all the frames
 
     Outputs:
-        disparity                           ->          disparity maps
+        left_matcher, right_matcher, wls_filter
     """
     win_size = 7
     min_disp = 0
@@ -101,6 +83,24 @@ def SBGMBuildDisparity(Left_Remap, Right_Remap):
     wls_filter.setLambda(lmbda)
     wls_filter.setSigmaColor(sigma)
 
+    return left_matcher, right_matcher, wls_filter
+
+
+def SBGMBuildDisparity(Left_Remap, Right_Remap, matchers=None):
+    """
+    Functionality:
+        Build the disparity using Semi-Global Block Matching
+
+    Inputs:
+        left_maps                           ->          calibration and rectification remap parameter of left images
+        right_maps                          ->          calibration and rectification remap parameter of right images
+        matchers                            ->          matchers from createSGBMMatchers, created if None
+
+    Outputs:
+        disparity                           ->          disparity maps
+    """
+    left_matcher, right_matcher, wls_filter = matchers or createSGBMMatchers()
+
     ############ left_matcher is the traditional matcher (default) #############
     disparity_left = left_matcher.compute(Left_Remap, Right_Remap)
     disparity_right = right_matcher.compute(Right_Remap, Left_Remap)
@@ -123,7 +123,7 @@ def DisparityNormalization(disparity_map):
     return disparity_map
 
 
-def DisparityBuilding(image_path: str, config: Config):
+def DisparityBuilding(image_path: str, config: Config, matchers=None):
     """
     Functionality:
         Using StereoBM and StereoSGBM for building disparity map with sepecific frames.
@@ -150,7 +150,7 @@ def DisparityBuilding(image_path: str, config: Config):
     # disparity of BM
     # disparity_map_sec = BMBuildDisparity(left_rect_gray, right_rect_gray, roiL, roiR)
     # disparity of SGBM
-    disparity_map = SBGMBuildDisparity(left_rect, right_rect)
+    disparity_map = SBGMBuildDisparity(left_rect, right_rect, matchers)
 
     return disparity_map, left_rect
 
@@ -162,7 +162,7 @@ def convert2bin(sensors_para_folder: str):
 
     registration_matrix = config.registration_matrix.astype(np.float32)
     left_maps = config.left_maps.astype(np.float32)
-    right_maps = config.left_maps.astype(np.float32)
+    right_maps = config.right_maps.astype(np.float32)
     proj_left = config.proj_left.astype(np.float32)
     proj_right = config.proj_right.astype(np.float32)
     roi_l = np.array(config.roi_l).astype(np.int32)
@@ -180,8 +180,86 @@ def convert2bin(sensors_para_folder: str):
     q.tofile(os.path.join(stereo_para_folder, "Q.bin"))
 
 
-def stereo_reconstruct(stereo_image_folder: str, sensors_para_folder: str):
-    config = Config(sensors_para_folder)
+# state of a worker process, created once by _init_worker and reused for all its frames
+_worker_config = None
+_worker_matchers = None
+
+
+def _init_worker(sensors_para_folder: str, disparity: bool):
+    global _worker_config, _worker_matchers
+    # one opencv thread per process, the frames are spread over the processes
+    cv2.setNumThreads(1)
+    _worker_config = Config(sensors_para_folder)
+    _worker_matchers = createSGBMMatchers() if disparity else None
+
+
+def output_paths(image_path: str, disparity: bool):
+    paths = [image_path.replace("stereo_image", "left")]
+    if disparity:
+        paths.append(image_path.replace("stereo_image", "disparity").replace(".jpg", ".tif"))
+    return paths
+
+
+def stereo_params_mtime(sensors_para_folder: str):
+    """
+    Newest modification time of the stereo calibration, outputs older than it were rectified
+    with previous maps. Only the .npy files count, the .bin files are rewritten by every run.
+    """
+    params = Path(sensors_para_folder).joinpath("stereo_para").glob("*.npy")
+    return max((os.path.getmtime(path) for path in params), default=0.0)
+
+
+def is_up_to_date(image_path: str, paths: list, params_mtime: float = 0.0):
+    """All outputs exist and are newer than the stereo image and the stereo calibration."""
+    input_mtime = max(os.path.getmtime(image_path), params_mtime)
+    return all(os.path.exists(path) and os.path.getmtime(path) >= input_mtime for path in paths)
+
+
+def write_image(path: str, image):
+    """
+    Write an image through a temporary file in the same folder, so an interrupted run
+    never leaves a truncated output that is_up_to_date takes for a complete one.
+    """
+    ok, data = cv2.imencode(os.path.splitext(path)[1], image)
+    if not ok:
+        raise RuntimeError(f"Could not encode {path}")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data.tobytes())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _process_frame(image_path: str):
+    config = _worker_config
+    if _worker_matchers is not None:
+        disparity_map, left_rect = DisparityBuilding(image_path, config, _worker_matchers)
+        disparity_image_path = image_path.replace("stereo_image", "disparity").replace(".jpg", ".tif")
+        write_image(disparity_image_path, disparity_map)
+    else:
+        # read left and right images
+        image = cv2.imread(image_path)
+        image_left = image[0 : config.roi_l[3], 0 : config.roi_l[2]]
+        # using the parameters to undistort and rectify the images (transfer to gray for better disparity)
+        left_rect = cv2.remap(image_left, config.left_maps[0], config.left_maps[1], cv2.INTER_LINEAR)
+
+    left_image_path = image_path.replace("stereo_image", "left")
+    write_image(left_image_path, left_rect)
+    return image_path
+
+
+def stereo_reconstruct(stereo_image_folder: str, sensors_para_folder: str, disparity: bool = False,
+                       force: bool = False, workers: int = None):
+    """
+    Functionality:
+        Write the rectified left image (and the disparity map) of every stereo image in the sub folders.
+        Frames are processed on a process pool, each worker creates the matchers once.
+        Frames whose outputs are newer than the stereo image and the stereo calibration are skipped,
+        unless force is set.
+    """
     items = os.listdir(stereo_image_folder)
     items = sorted(items)
     folders = []
@@ -189,32 +267,72 @@ def stereo_reconstruct(stereo_image_folder: str, sensors_para_folder: str):
         if not os.path.isfile(os.path.join(stereo_image_folder, item)):
             folders.append(item)
 
+    frames = []
+    skipped = 0
+    params_mtime = stereo_params_mtime(sensors_para_folder)
     for folder in folders:
         stereo_image_folder2 = Path(stereo_image_folder).joinpath(folder)
-        # disparity_image_folder = str(stereo_image_folder2).replace("stereo_image", "disparity")
-        # checkoutDir(disparity_image_folder)
-
-        left_image_folder = str(stereo_image_folder2).replace("stereo_image", "left")
-        checkoutDir(left_image_folder)
+        output_folders = [str(stereo_image_folder2).replace("stereo_image", "left")]
+        if disparity:
+            output_folders.append(str(stereo_image_folder2).replace("stereo_image", "disparity"))
+        for output_folder in output_folders:
+            if force:
+                checkoutDir(output_folder)
+            else:
+                os.makedirs(output_folder, exist_ok=True)
 
         stereo_images = sorted(list(Path(stereo_image_folder2).glob("*.jpg")))
-        for image_path in stereo_images:
-            # disparity_map, left_rect = DisparityBuilding(str(image_path), config)
-
-            # read left and right images
-            image = cv2.imread(image_path)
-            image_left = image[0 : config.roi_l[3], 0 : config.roi_l[2]]
-            # using the parameters to undistort and rectify the images (transfer to gray for better disparity)
-            left_rect = cv2.remap(image_left, config.left_maps[0], config.left_maps[1], cv2.INTER_LINEAR)
+        for image_path in map(str, stereo_images):
+            if not force and is_up_to_date(image_path, output_paths(image_path, disparity), params_mtime):
+                skipped += 1
+            else:
+                frames.append(image_path)
 
-            # disparity_image_path = str(image_path).replace("stereo_image", "disparity")
-            # disparity_image_path = disparity_image_path.replace(".jpg", ".tif")
-            # cv2.imwrite(disparity_image_path, disparity_map)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(sensors_para_folder, disparity)) as executor:
+        # results come back in the order of the frames
+        for i, image_path in enumerate(executor.map(_process_frame, frames, chunksize=8)):
+            if (i + 1) % 500 == 0:
+                print(f"{i + 1}/{len(frames)} frames, last: {image_path}")
+    elapsed = time.perf_counter() - start
 
-            left_image_path = str(image_path).replace("stereo_image", "left")
-            cv2.imwrite(left_image_path, left_rect)
+    fps = len(frames) / elapsed if elapsed > 0 else 0.0
+    print(f"{len(frames)} frames processed in {elapsed:.1f}s ({fps:.1f} frames/s), {skipped} up to date skipped")
 
 
 if __name__ == "__main__":
-    stereo_reconstruct(args.stereo_image_folder, args.sensors_para_folder)
+    parser = argparse.ArgumentParser(description="")
+    parser.add_argument(
+        "--stereo_image_folder",
+        required=True,
+        type=str,
+        help="stereo image folder.",
+    )
+    parser.add_argument(
+        "--sensors_para_folder",
+        required=True,
+        type=str,
+        help="sensors parameter folder.",
+    )
+    parser.add_argument(
+        "--disparity",
+        action="store_true",
+        help="also write the disparity maps (.tif) in the disparity folder.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="clear the output folders and process all the frames, not only the ones not up to date.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes, the number of cpus by default.",
+    )
+
+    args = parser.parse_args()
+
+    stereo_reconstruct(args.stereo_image_folder, args.sensors_para_folder, args.disparity, args.force, args.workers)
     convert2bin(args.sensors_para_folder)
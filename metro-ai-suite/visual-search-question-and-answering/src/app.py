@@ -24,7 +24,8 @@ import tempfile
 import copy
 from openai import OpenAI
 
-from utils import image_to_url, video_to_url
+from dedup import EXACT_PIN_TOLERANCE, deduplicate_results
+from media_cache import MediaCache, image_data_url
 
 PROMPT_LENGTH_LIMIT = 1024
 ROLE_SYSTEM = "system"
@@ -52,6 +53,16 @@ DEFAULT_NUM_SEARCH_RESULTS = int(os.getenv('DEFAULT_NUM_SEARCH_RESULTS', 10))
 SHOW_RESULT_PER_ROW = int(os.getenv('SHOW_RESULT_PER_ROW', 5))
 
 DEFAULT_MAX_PIXELS_TO_VLM = "360*420"
+
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "visual-search-qa-media"))
+MEDIA_CACHE_MAX_MB = int(os.getenv("MEDIA_CACHE_MAX_MB", 1024))
+RESULT_IMAGE_WIDTH = 480
+VLM_IMAGE_MAX_WIDTH = int(os.getenv("VLM_IMAGE_MAX_WIDTH", 1280))
+# "frames" sends pre-extracted keyframes of videos to the VLM, "video" sends the whole video
+VLM_VIDEO_INPUT = os.getenv("VLM_VIDEO_INPUT", "frames").lower()
+VLM_VIDEO_FRAMES = int(os.getenv("VLM_VIDEO_FRAMES", 8))
+VLM_VIDEO_WINDOW_SEC = float(os.getenv("VLM_VIDEO_WINDOW_SEC", 8))
+VLM_VIDEO_FRAME_WIDTH = int(os.getenv("VLM_VIDEO_FRAME_WIDTH", 480))
     
 logger = logging.getLogger('visual_search_qa')
 logging.basicConfig(
@@ -60,46 +71,56 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
-def encode_base64_content_from_url(content_url: str) -> str:
-    """Encode a content retrieved from a remote url to base64 format."""
-    with requests.get(content_url) as response:
-        response.raise_for_status()
-        result = base64.b64encode(response.content).decode('utf-8')
-
-    return result
+@st.cache_resource
+def get_media_cache():
+    return MediaCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_MB * 1024 * 1024)
 
-def video_url_to_base64(video_url):
+def keyframe_times(duration, pin_second=None):
     """
-    Convert a video from a URL to a Base64-encoded string.
-
-    Args:
-        video_url (str): The URL of the video.
+    Times in seconds of the keyframes sent to the VLM instead of a whole video.
 
-    Returns:
-        str: The Base64-encoded video content with the MIME type.
+    Frames are spread over a window centered on the search hit for results,
+    or over the whole video for uploads.
     """
-    try:
-        # Download the video from the URL
-        response = requests.get(video_url, stream=True)
-        response.raise_for_status()  # Raise an error for bad responses (4xx, 5xx)
-
-        # Read the video content
-        video_content = response.content
-
-        # Encode the video content in Base64
-        base64_video = base64.b64encode(video_content).decode('utf-8')
-
-        # Format the Base64 string with the MIME type
-        base64_video_with_mime = f"data:video/mp4;base64,{base64_video}"
-
-        return base64_video_with_mime
-
-    except Exception as e:
-        print(f"Error converting video to Base64: {e}")
-        return None
-
-def compose_media_url(id, type):
-    return f"http://{HOST_IP_IDDRESS}:{VISUAL_SEARCH_QA_UI_PORT}/media/{id}{type}"
+    if pin_second is None:
+        start, end = 0.0, duration
+    else:
+        start = max(0.0, float(pin_second) - VLM_VIDEO_WINDOW_SEC / 2)
+        end = start + VLM_VIDEO_WINDOW_SEC
+        if duration > 0:
+            end = min(end, duration)
+    count = max(1, VLM_VIDEO_FRAMES)
+    step = (end - start) / count
+    return [start + step * (i + 0.5) for i in range(count)]
+
+def image_content(image_path, width):
+    image_url = image_data_url(get_media_cache().thumbnail(image_path, width=width))
+    return [{
+        "type": "image_url",
+        "image_url": {
+            "url": image_url
+        }
+    }]
+
+def video_content(video_path, pin_second=None):
+    media_cache = get_media_cache()
+    if VLM_VIDEO_INPUT == "video":
+        return [{
+            "type": "video_url",
+            "video_url": {
+                "url": media_cache.video_data_url(video_path)
+            },
+            "max_pixels": DEFAULT_MAX_PIXELS_TO_VLM,
+            "fps": 1
+        }]
+    duration = media_cache.video_duration(video_path)
+    frames = media_cache.keyframes(video_path, keyframe_times(duration, pin_second), width=VLM_VIDEO_FRAME_WIDTH)
+    return [{
+        "type": "image_url",
+        "image_url": {
+            "url": image_data_url(frame)
+        }
+    } for frame in frames]
 
 def helper_map2host(file_path: str):
     """
@@ -123,38 +144,8 @@ def filter_output(results, de_duplicate=False):
     logger.info("Filtering output")
     # results is a list of dictionaries, each containing "id" and "distance" and "meta"
     # each "meta" contains "file_path", "type", "timestamp", "video_pin_second"(for video) and other fields
-    filtered_results = []
-    keep = [True] * len(results)
-    for i in range(len(results)):
-        if not keep[i]:
-            continue
-        if "video" not in results[i]["meta"]["type"]:
-            # image file, deduplicate by file name
-            target_file_path = results[i]["meta"].get("file_path")
-            for j in range(i+1, len(results)):
-                if not keep[j]:
-                    continue
-                cur_file_path = results[j]["meta"].get("file_path")
-                if target_file_path == cur_file_path:
-                    keep[j] = False
-        else:
-            # video file, deduplicate by video file name and timestamp
-            target_file_path = results[i]["meta"].get("file_path")
-            target_pin = results[i]["meta"].get("video_pin_second")
-            for j in range(i+1, len(results)):
-                cur_file_path = results[j]["meta"].get("file_path")
-                cur_pin = results[j]["meta"].get("video_pin_second")
-                if de_duplicate:
-                    if target_file_path == cur_file_path and abs(float(target_pin)-float(cur_pin)) < st.session_state.threshold:
-                        keep[j] = False
-                else:
-                    if target_file_path == cur_file_path and abs(float(target_pin)-float(cur_pin)) < 1e-8:
-                        keep[j] = False
-
-    for i in range(len(results)):
-        if keep[i]:
-            filtered_results.append(results[i])
-    return filtered_results
+    threshold = st.session_state.threshold if de_duplicate else EXACT_PIN_TOLERANCE
+    return deduplicate_results(results, threshold)
 
 
 def send_query_request(text: str = "", image_base64: str = "", k: int = 10, filter: dict = {}):
@@ -227,45 +218,16 @@ def get_vqa_msg(prompt):
     #Add uploads
     if st.session_state.uploaded_file is not None:
         if "image" in st.session_state.uploaded_file.type:
-            image = Image.open(st.session_state.uploaded_file)
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            img_b64_str = base64.b64encode(buffered.getvalue()).decode()
-            st.session_state.upload_img = f"data:image/jpeg;base64,{img_b64_str}"
-            
-            user_msg["content"].append({
-                "type": "image_url",
-                "image_url": {
-                    "url": st.session_state.upload_img
-                }
-            })
-            
-            st.session_state.upload_img = None
+            _, extension = os.path.splitext(st.session_state.uploaded_file.name)
+            image_path = get_media_cache().store_bytes(st.session_state.uploaded_file.getvalue(), extension or ".img")
+            user_msg["content"].extend(image_content(image_path, VLM_IMAGE_MAX_WIDTH))
         elif "video" in st.session_state.uploaded_file.type:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp:
-                   file_id, mimetype = video_to_url(st.session_state.uploaded_file.getvalue(), "mp4")
-                   video_url = compose_media_url(file_id, ".mp4")
-                   video_url_b64 = video_url_to_base64(video_url)
-                   user_msg["content"].append({
-                        "type": "video_url",
-                        "video_url": {"url": video_url_b64},
-                        "max_pixels": DEFAULT_MAX_PIXELS_TO_VLM,
-                        "fps": 1
-                   })
+            video_path = get_media_cache().store_bytes(st.session_state.uploaded_file.getvalue(), ".mp4")
+            user_msg["content"].extend(video_content(video_path))
 
     if st.session_state.uploaded_url:
-        image = Image.open(requests.get(st.session_state.uploaded_url, stream=True, timeout=3000).raw)
-        buffered = BytesIO()
-        image.save(buffered, format="PNG")
-        img_b64_str = base64.b64encode(buffered.getvalue()).decode()
-        st.session_state.upload_img = f"data:image/jpeg;base64,{img_b64_str}"
-        user_msg["content"].append({
-            "type": "image_url",
-            "image_url": {
-                "url": st.session_state.upload_img
-            }
-        })
-        st.session_state.upload_img = None
+        image_path = get_media_cache().fetch_url(st.session_state.uploaded_url)
+        user_msg["content"].extend(image_content(image_path, VLM_IMAGE_MAX_WIDTH))
 
     # add selected
     if st.session_state.selectbox_keys_cache != st.session_state.selectbox_keys:
@@ -277,32 +239,9 @@ def get_vqa_msg(prompt):
         for selected_media in selected_medias:
             file_path = selected_media["meta"]["file_path"]            
             if file_path.lower().endswith(('.mp4')):
-                video_file = open(file_path, "rb")
-                video_bytes = video_file.read()
-                file_id, mimetype = video_to_url(video_bytes, "mp4")
-                video_url = compose_media_url(file_id, ".mp4")
-                video_url_b64 = video_url_to_base64(video_url)
-                user_msg["content"].append({
-                    "type": "video_url",
-                    "video_url": {
-                        "url": video_url_b64
-                    },
-                    "max_pixels": DEFAULT_MAX_PIXELS_TO_VLM,
-                    "fps": 1
-                })
+                user_msg["content"].extend(video_content(file_path, selected_media["meta"].get("video_pin_second")))
             else:
-                image = Image.open(file_path)
-                file_id, mimetype  = image_to_url(image, "auto", width=480)
-                _, extension = os.path.splitext(file_path)
-                image_url = compose_media_url(file_id, extension)
-                img_b64_str = encode_base64_content_from_url(image_url)
-                image_url_b64 = f"data:image/jpeg;base64,{img_b64_str}"
-                user_msg["content"].append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": image_url_b64
-                    }
-                })
+                user_msg["content"].extend(image_content(file_path, RESULT_IMAGE_WIDTH))
         
 
     vqa_msg = []
@@ -566,12 +505,10 @@ def show_media():
                         if not os.path.exists(target_path):
                             st.error(f"{target_path} is invalid")
                             continue
-                        video_file = open(target_path, "rb")
-                        video_bytes = video_file.read()
                         if f"{index}v" not in st.session_state.selectbox_keys:
                             st.session_state.selectbox_keys[f"{index}v"] = False
                         st.session_state.selectbox_keys[f"{index}v"] = col2.checkbox("",key= f"{index}v",on_change=checkbox_change,label_visibility="visible")
-                        st.video(video_bytes,start_time=int(target["meta"]["video_pin_second"]))
+                        st.video(target_path,start_time=int(target["meta"]["video_pin_second"]))
                     else:
                         if not os.path.exists(target_path):
                             st.error(f"{target_path} is invalid")
@@ -580,8 +517,7 @@ def show_media():
                         if f"{index}i" not in st.session_state.selectbox_keys:
                             st.session_state.selectbox_keys[f"{index}i"] = False
                         st.session_state.selectbox_keys[f"{index}i"] = col2.checkbox("",key= f"{index}i",on_change=checkbox_change,label_visibility="visible")
-                        image = Image.open(target_path)
-                        st.image(image, width=480)
+                        st.image(str(get_media_cache().thumbnail(target_path, width=RESULT_IMAGE_WIDTH)), width=RESULT_IMAGE_WIDTH)
                         
                     css = f"""<style>
                                 .st-key-media_display .e6rk8up0:nth-of-type({i+1}) .e6rk8up2:nth-of-type({j+1}){{
@@ -0,0 +1,97 @@
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+De-duplication of retrieval results.
+
+This module has no UI dependencies so it can also be used by the retrieval
+backend to de-duplicate results before they are sent to the UI.
+"""
+
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+import numpy as np
+
+# Two video results of the same file are considered the same frame below this
+# pin time difference, used when de-duplication by threshold is disabled
+EXACT_PIN_TOLERANCE = 1e-8
+
+
+def _is_video(result):
+    return "video" in result["meta"]["type"]
+
+
+def _pins_all_separated(pins, threshold):
+    """
+    Check whether no two pin times are closer than the threshold, in which
+    case every result of the file is kept and the greedy sweep can be skipped.
+    """
+    if len(pins) < 2:
+        return True
+    return bool(np.diff(np.sort(np.asarray(pins, dtype=np.float64))).min() >= threshold)
+
+
+def _sweep(pins, threshold):
+    """
+    Greedy, rank-ordered suppression of close pin times.
+
+    A pin is kept if it is at least ``threshold`` away from every pin kept
+    before it. Kept pins are held sorted so only the two neighbours of the
+    insertion point have to be checked.
+
+    Returns:
+        list[bool]: Keep flag for each pin, in input order.
+    """
+    kept_pins = []
+    keep = []
+    for pin in pins:
+        pos = bisect_left(kept_pins, pin)
+        close = (pos < len(kept_pins) and kept_pins[pos] - pin < threshold) or (
+            pos > 0 and pin - kept_pins[pos - 1] < threshold
+        )
+        keep.append(not close)
+        if not close:
+            insort(kept_pins, pin)
+    return keep
+
+
+def deduplicate_results(results, threshold=EXACT_PIN_TOLERANCE):
+    """
+    Remove duplicate results while preserving ranking order.
+
+    Image results are de-duplicated by file path, keeping the best ranked
+    one. Video results are de-duplicated per file path by ``video_pin_second``:
+    walking the results in rank order, a result is dropped if its pin time is
+    closer than ``threshold`` to an already kept result of the same video.
+
+    Args:
+        results (list[dict]): Ranked results, each with a "meta" dict holding
+            "file_path", "type" and, for videos, "video_pin_second".
+        threshold (float): Pin time difference in seconds below which two
+            video results are duplicates.
+
+    Returns:
+        list[dict]: The kept results, in their original order.
+    """
+    # Group result indices by file path, each group stays in rank order
+    groups = defaultdict(list)
+    for index, result in enumerate(results):
+        groups[result["meta"].get("file_path")].append(index)
+
+    keep = [False] * len(results)
+    for indices in groups.values():
+        first = results[indices[0]]
+        if not _is_video(first):
+            # The best ranked image of a file hides every other result of that file
+            keep[indices[0]] = True
+            continue
+        pins = [float(results[index]["meta"].get("video_pin_second")) for index in indices]
+        if _pins_all_separated(pins, threshold):
+            flags = [True] * len(pins)
+        else:
+            flags = _sweep(pins, threshold)
+        for index, flag in zip(indices, flags):
+            keep[index] = flag
+
+    return [result for result, flag in zip(results, keep) if flag]
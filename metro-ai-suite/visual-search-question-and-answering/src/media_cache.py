@@ -0,0 +1,257 @@
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Local cache of derived media (thumbnails, keyframes, encoded videos).
+
+Entries are keyed by the content hash of their source media, so the same
+result is only decoded, resized and encoded once, no matter how often it is
+rendered or sent to the VLM. The cache lives on disk and is bounded in size
+with least-recently-used eviction.
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import requests
+from PIL import Image
+
+logger = logging.getLogger('visual_search_qa')
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def _sha224():
+    return hashlib.new("sha224", usedforsecurity=False)
+
+
+def bytes_key(data: bytes) -> str:
+    filehash = _sha224()
+    filehash.update(data)
+    return filehash.hexdigest()
+
+
+def to_data_url(data: bytes, mimetype: str) -> str:
+    return f"data:{mimetype};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+class MediaCache:
+    def __init__(self, root: str, max_bytes: int):
+        """
+        Args:
+            root (str): Directory holding the cached files.
+            max_bytes (int): Total size above which least recently used
+                entries are evicted.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # (path, size, mtime) -> content hash, so unchanged files are hashed once
+        self._fingerprints = {}
+        # url -> content hash of the downloaded media
+        self._urls = {}
+        # keyframe names that could not be decoded, so the video is not read again for them
+        self._undecodable = set()
+        # entry name -> size in bytes, least recently used first
+        self._entries = OrderedDict()
+        self._total = 0
+        existing = sorted(self.root.iterdir(), key=lambda p: p.stat().st_atime)
+        for path in existing:
+            if path.is_file() and not path.name.endswith(".tmp"):
+                self._entries[path.name] = path.stat().st_size
+                self._total += self._entries[path.name]
+        self._evict()
+
+    # Keys
+
+    def file_key(self, path: str) -> str:
+        """
+        Return the content hash of a file, computed once per file version.
+        """
+        stat = os.stat(path)
+        fingerprint = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            key = self._fingerprints.get(fingerprint)
+        if key is None:
+            filehash = _sha224()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                    filehash.update(chunk)
+            key = filehash.hexdigest()
+            with self._lock:
+                self._fingerprints[fingerprint] = key
+        return key
+
+    # Entries
+
+    def _get(self, name: str):
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = self.root / name
+        if not path.exists():
+            with self._lock:
+                self._total -= self._entries.pop(name, 0)
+            return None
+        return path
+
+    def _put(self, name: str, data: bytes) -> Path:
+        path = self.root / name
+        tmp_path = self.root / f"{name}.{threading.get_ident()}.tmp"
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._evict(keep=name)
+        return path
+
+    def _evict(self, keep: str = None):
+        while self._total > self.max_bytes and self._entries:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(name)
+                continue
+            self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                (self.root / name).unlink()
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for name in self._entries:
+                try:
+                    (self.root / name).unlink()
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._total = 0
+
+    @property
+    def size(self) -> int:
+        return self._total
+
+    # Media
+
+    def store_bytes(self, data: bytes, extension: str) -> Path:
+        """
+        Store source media held in memory (e.g. an upload) and return its path.
+        """
+        name = f"{bytes_key(data)}{extension}"
+        return self._get(name) or self._put(name, data)
+
+    def fetch_url(self, url: str, timeout: float = 30) -> Path:
+        """
+        Download media from a URL once and return the cached copy.
+        """
+        with self._lock:
+            name = self._urls.get(url)
+        path = self._get(name) if name else None
+        if path is None:
+            with requests.get(url, timeout=timeout) as response:
+                response.raise_for_status()
+                data = response.content
+            extension = os.path.splitext(url.split("?")[0])[1].lower() or ".bin"
+            path = self.store_bytes(data, extension)
+            with self._lock:
+                self._urls[url] = path.name
+        return path
+
+    def thumbnail(self, path: str, width: int = 480) -> Path:
+        """
+        Return a JPEG of the image scaled down to at most ``width`` pixels wide.
+        """
+        name = f"{self.file_key(path)}.w{width}.jpg"
+        cached = self._get(name)
+        if cached is not None:
+            return cached
+        with Image.open(path) as image:
+            image = image.convert("RGB")
+            if image.width > width:
+                image = image.resize((width, int(image.height * width / image.width)), Image.BILINEAR)
+            buffered = io.BytesIO()
+            image.save(buffered, format="JPEG", quality=90)
+        return self._put(name, buffered.getvalue())
+
+    def keyframes(self, path: str, times: list, width: int = 480) -> list:
+        """
+        Return JPEG keyframes of a video at the given times in seconds.
+
+        Frames that cannot be decoded (e.g. past the end of the video) are skipped,
+        and remembered so later calls do not read the video again for them.
+        """
+        key = self.file_key(path)
+        names = [f"{key}.t{int(round(t * 1000))}.w{width}.jpg" for t in times]
+        cached = [self._get(name) for name in names]
+        with self._lock:
+            missing = [hit is None and name not in self._undecodable for name, hit in zip(names, cached)]
+        if not any(missing):
+            return [hit for hit in cached if hit is not None]
+
+        import cv2
+
+        frames = []
+        capture = cv2.VideoCapture(str(path))
+        try:
+            for t, name, hit, miss in zip(times, names, cached, missing):
+                if hit is not None:
+                    frames.append(hit)
+                    continue
+                if not miss:
+                    continue
+                capture.set(cv2.CAP_PROP_POS_MSEC, max(t, 0.0) * 1000.0)
+                ok, frame = capture.read()
+                if not ok:
+                    with self._lock:
+                        self._undecodable.add(name)
+                    continue
+                height = frame.shape[0] * width // frame.shape[1]
+                if frame.shape[1] > width:
+                    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+                if ok:
+                    frames.append(self._put(name, encoded.tobytes()))
+        finally:
+            capture.release()
+        return frames
+
+    def video_duration(self, path: str) -> float:
+        import cv2
+
+        capture = cv2.VideoCapture(str(path))
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+            count = capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0
+        finally:
+            capture.release()
+        return count / fps if fps > 0 else 0.0
+
+    def video_data_url(self, path: str) -> str:
+        """
+        Return the whole video as a base64 data URL, encoded once per content.
+        """
+        name = f"{self.file_key(path)}.mp4.b64"
+        cached = self._get(name)
+        if cached is not None:
+            return cached.read_text()
+        with open(path, "rb") as f:
+            data_url = to_data_url(f.read(), "video/mp4")
+        self._put(name, data_url.encode("utf-8"))
+        return data_url
+
+
+def image_data_url(path) -> str:
+    with open(path, "rb") as f:
+        return to_data_url(f.read(), "image/jpeg")
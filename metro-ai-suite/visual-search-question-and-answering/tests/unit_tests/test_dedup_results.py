@@ -0,0 +1,43 @@
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+from dedup import deduplicate_results
+
+
+def video(id, file_path, pin):
+    return {"id": id, "meta": {"type": "video", "file_path": file_path, "video_pin_second": str(pin)}}
+
+
+def image(id, file_path):
+    return {"id": id, "meta": {"type": "image", "file_path": file_path}}
+
+
+def ids(results):
+    return [result["id"] for result in results]
+
+
+def test_images_deduplicated_by_file_path():
+    results = [image(0, "a.jpg"), image(1, "b.jpg"), image(2, "a.jpg")]
+    assert ids(deduplicate_results(results)) == [0, 1]
+
+
+def test_exact_video_duplicates_removed_without_threshold():
+    results = [video(0, "v.mp4", 3.0), video(1, "v.mp4", 3.0), video(2, "v.mp4", 3.5)]
+    assert ids(deduplicate_results(results)) == [0, 2]
+
+
+def test_video_threshold_keeps_ranking_order():
+    # 1 is within 5s of 0, 2 is far from 0 and kept, 3 is within 5s of 2 only
+    results = [video(0, "v.mp4", 10), video(1, "v.mp4", 13), video(2, "v.mp4", 20), video(3, "v.mp4", 16)]
+    assert ids(deduplicate_results(results, threshold=5.0)) == [0, 2]
+
+
+def test_suppressed_result_does_not_suppress_others():
+    # 1 is dropped by 0, so 2 is only compared against 0 and kept
+    results = [video(0, "v.mp4", 0), video(1, "v.mp4", 4), video(2, "v.mp4", 8)]
+    assert ids(deduplicate_results(results, threshold=5.0)) == [0, 2]
+
+
+def test_videos_compared_per_file():
+    results = [video(0, "a.mp4", 1), video(1, "b.mp4", 1), video(2, "a.mp4", 1.5)]
+    assert ids(deduplicate_results(results, threshold=5.0)) == [0, 1]
@@ -0,0 +1,85 @@
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+from PIL import Image
+
+from media_cache import MediaCache
+
+
+def make_image(path, size=(960, 540)):
+    Image.new("RGB", size, color="red").save(path)
+    return str(path)
+
+
+def test_thumbnail_served_from_cache(tmp_path):
+    cache = MediaCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    image_path = make_image(tmp_path / "a.png")
+
+    thumbnail = cache.thumbnail(image_path, width=480)
+    mtime = os.stat(thumbnail).st_mtime_ns
+
+    assert Image.open(thumbnail).size == (480, 270)
+    assert cache.thumbnail(image_path, width=480) == thumbnail
+    assert os.stat(thumbnail).st_mtime_ns == mtime
+
+
+def test_same_content_shares_key(tmp_path):
+    cache = MediaCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    first = make_image(tmp_path / "a.png")
+    second = make_image(tmp_path / "b.png")
+
+    assert cache.file_key(first) == cache.file_key(second)
+    assert cache.thumbnail(first) == cache.thumbnail(second)
+
+
+def test_lru_eviction_bounds_size(tmp_path):
+    cache = MediaCache(tmp_path / "cache", max_bytes=2500)
+    cache.store_bytes(b"a" * 1000, ".bin")
+    second = cache.store_bytes(b"b" * 1000, ".bin")
+    # Touch the second entry so the first one is the least recently used
+    cache.store_bytes(b"b" * 1000, ".bin")
+    cache.store_bytes(b"c" * 1000, ".bin")
+
+    assert cache.size <= 2500
+    assert second.exists()
+    assert len(os.listdir(tmp_path / "cache")) == 2
+
+
+def test_cache_reloaded_from_disk(tmp_path):
+    cache = MediaCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    stored = cache.store_bytes(b"payload", ".bin")
+
+    reloaded = MediaCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+
+    assert reloaded.size == len(b"payload")
+    assert reloaded.store_bytes(b"payload", ".bin") == stored
+
+
+def make_video(path, frames=10, fps=10):
+    import cv2
+    import numpy as np
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def test_undecodable_keyframes_not_read_again(tmp_path, monkeypatch):
+    import cv2
+
+    cache = MediaCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    video_path = make_video(tmp_path / "a.avi")
+
+    # the second time is past the end of the 1 s video
+    frames = cache.keyframes(video_path, [0.5, 5.0], width=32)
+    assert len(frames) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("video opened again")
+
+    monkeypatch.setattr(cv2, "VideoCapture", fail)
+    assert cache.keyframes(video_path, [0.5, 5.0], width=32) == frames